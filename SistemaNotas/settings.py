@@ -198,6 +198,12 @@ CACHES = {
     }
 }
 
+# Geração de boletins em lote: processos do pool (0 = número de CPUs, até 4)
+BOLETIM_WORKERS = int(os.getenv('BOLETIM_WORKERS', '0'))
+
+# Cache de boletins renderizados (MEDIA_ROOT/boletins/cache); 0 MB desativa o cache
+BOLETIM_CACHE_MAX_MB = int(os.getenv('BOLETIM_CACHE_MAX_MB', '500'))
+
 # Session Configuration
 SESSION_COOKIE_AGE = 3600  # 1 hora
 SESSION_EXPIRE_AT_BROWSER_CLOSE = True
@@ -136,7 +136,7 @@ class CustomAdminSite(AdminSite):
 admin_site = CustomAdminSite(name='custom_admin')
 
 # Registrar todos os modelos do core.admin.py no admin customizado
-from core.admin import ProfessorUserAdmin, TipoTurmaAdmin, TurmaAdmin, ProblemaRelatadoAdmin, AuditLogAdmin, SystemMetricsAdmin
+from core.admin import ProfessorUserAdmin, TipoTurmaAdmin, TurmaAdmin, LancamentoDeNotaAdmin, ProblemaRelatadoAdmin, AuditLogAdmin, SystemMetricsAdmin
 from core.models import AuditLog, SystemMetrics
 
 # Registrar User com customização
@@ -148,7 +148,7 @@ admin_site.register(Turma, TurmaAdmin)
 admin_site.register(Professor)
 admin_site.register(Aluno)
 admin_site.register(Competencia)
-admin_site.register(LancamentoDeNota)
+admin_site.register(LancamentoDeNota, LancamentoDeNotaAdmin)
 admin_site.register(ConfiguracaoSistema)
 admin_site.register(ProblemaRelatado, ProblemaRelatadoAdmin)
 
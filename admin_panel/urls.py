@@ -84,9 +84,40 @@ urlpatterns = [
         views.gerar_boletins_turma,
         name='gerar_boletins_turma'
     ),
+    path(
+        'boletim/turma/<int:turma_id>/pdf/',
+        views.gerar_boletins_turma_pdf,
+        name='gerar_boletins_turma_pdf'
+    ),
     path(
         'api/verificar-notas-turma/<int:turma_id>/',
         views.verificar_notas_turma,
         name='verificar_notas_turma'
     ),
+    # Exportação de boletins de várias turmas
+    path(
+        'boletins/exportacoes/',
+        views.exportacoes_boletins_view,
+        name='exportacoes_boletins'
+    ),
+    path(
+        'boletins/exportacoes/<int:exportacao_id>/',
+        views.exportacao_boletins_status_view,
+        name='exportacao_boletins_status'
+    ),
+    path(
+        'boletins/exportacoes/<int:exportacao_id>/retomar/',
+        views.exportacao_boletins_retomar_view,
+        name='exportacao_boletins_retomar'
+    ),
+    path(
+        'boletins/exportacoes/<int:exportacao_id>/download/',
+        views.exportacao_boletins_download_view,
+        name='exportacao_boletins_download'
+    ),
+    path(
+        'api/exportacoes/<int:exportacao_id>/status/',
+        views.exportacao_boletins_status_data_view,
+        name='exportacao_boletins_status_data'
+    ),
 ]
\ No newline at end of file
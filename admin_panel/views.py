@@ -2,14 +2,23 @@ import pandas as pd # Para processar arquivos CSV/Excel
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.admin.views.decorators import staff_member_required # Garante que apenas administradores acessem
 from django.contrib import messages
-from django.http import JsonResponse, HttpResponse
-from core.models import Turma, Aluno, Professor, Competencia, LancamentoDeNota, TipoTurma, ConfiguracaoSistema
-from core.utils import BoletimGenerator
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse
+from django.db.models import Count, Max
+from core.models import Turma, Aluno, Professor, Competencia, LancamentoDeNota, TipoTurma, ConfiguracaoSistema, AnalyticsSnapshot, ExportacaoBoletins
+from core.batch import BoletimBatchRenderer, stream_zip
+from core.boletim_data import BoletimDataLoader
+from core.export import ExportacaoService
+from core.pdf import BoletimPdfRenderer, PdfIndisponivelError
+from core.progress import ProgressEngine, ProgressStore
+from core.analytics import AnalyticsEngine
+from core.conditional import conditional_on_data_version
+from core.catalog import CompetenciaRegistry
 from .decorators import group_required, admin_only, coordinador_or_admin, secretaria_or_above
 import io
 import re
 import unicodedata
 from datetime import date, datetime
+from django.utils import timezone
 from django.template.loader import render_to_string
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import letter, A4
@@ -256,37 +265,26 @@ def analisar_problemas_sistema():
     
     return estatisticas
 
+def _versao_dashboard_admin(request):
+    """Dados do dashboard administrativo além de turmas, alunos e notas"""
+    from core.models import ProblemaRelatado
+    # Não usa data_atualizacao: a detecção automática de problemas a renova a cada visita
+    return [
+        list(ProblemaRelatado.objects.order_by('status').values('status').annotate(total=Count('pk'), ultimo=Max('pk'))),
+        Professor.objects.count(),
+    ]
+
 @coordinador_or_admin
+@conditional_on_data_version(extra=_versao_dashboard_admin)
 def dashboard_admin_view(request):
     """Dashboard administrativo com visão geral de todas as turmas e progresso."""
     
-    # Busca todas as turmas ordenadas por tipo e identificador
+    # Busca todas as turmas ordenadas por tipo e identificador, já com o progresso pré-agregado
     turmas = Turma.objects.all().order_by('tipo_turma__nome', 'identificador_turma')
     
     turmas_com_progresso = []
-    for turma in turmas:
-        # Busca alunos da turma
-        alunos_da_turma = Aluno.objects.filter(turma=turma)
-        total_alunos = alunos_da_turma.count()
-        
-        # Busca competências da turma através do tipo de turma
-        competencias_da_turma = turma.competencias.all() if turma.competencias else []
-        total_competencias = len(competencias_da_turma)
-        
-        # Calcula o total de notas possíveis (alunos × competências)
-        total_notas_possiveis = total_alunos * total_competencias
-        
-        # Conta quantas notas já foram lançadas
-        notas_lancadas = LancamentoDeNota.objects.filter(
-            aluno__turma=turma,
-            competencia__in=competencias_da_turma
-        ).count()
-        
-        # Calcula a porcentagem geral da turma
-        if total_notas_possiveis > 0:
-            progresso_turma = int((notas_lancadas / total_notas_possiveis) * 100)
-        else:
-            progresso_turma = 0
+    for info in ProgressStore.progresso_turmas(turmas):
+        turma = info['turma']
         
         # Informações do professor responsável
         if turma.professor_responsavel:
@@ -297,11 +295,11 @@ def dashboard_admin_view(request):
         
         turmas_com_progresso.append({
             'turma': turma,
-            'total_alunos': total_alunos,
-            'total_competencias': total_competencias,
-            'notas_lancadas': notas_lancadas,
-            'total_notas_possiveis': total_notas_possiveis,
-            'progresso_turma': progresso_turma,
+            'total_alunos': info['total_alunos'],
+            'total_competencias': info['total_competencias'],
+            'notas_lancadas': info['notas_lancadas'],
+            'total_notas_possiveis': info['total_notas_possiveis'],
+            'progresso_turma': info['progresso_turma'],
             'professor_nome': professor_nome,
         })
     
@@ -337,7 +335,7 @@ def dashboard_admin_view(request):
     
     context = {
         'turmas_com_progresso': turmas_com_progresso,
-        'total_turmas': turmas.count(),
+        'total_turmas': len(turmas_com_progresso),
         'total_alunos_geral': sum(t['total_alunos'] for t in turmas_com_progresso),
         'total_notas_lancadas_geral': sum(t['notas_lancadas'] for t in turmas_com_progresso),
         'total_notas_possiveis_geral': sum(t['total_notas_possiveis'] for t in turmas_com_progresso),
@@ -361,7 +359,7 @@ def detalhes_turma_view(request, turma_id):
     alunos_da_turma = Aluno.objects.filter(turma=turma).order_by('nome_completo')
     
     # Busca competências da turma através do tipo de turma
-    competencias_da_turma = turma.competencias.all() if turma.competencias else []
+    competencias_da_turma = list(turma.competencias)
     total_competencias_turma = len(competencias_da_turma)
     
     # Calcula progresso detalhado de cada aluno
@@ -643,6 +641,8 @@ def gerenciar_competencias_view(request):
             except Exception as e:
                 messages.error(request, f'Erro ao deletar competência: {str(e)}')
         
+        # Competências alteradas: o catálogo por boletim é recarregado no próximo acesso
+        CompetenciaRegistry.invalidar()
         return redirect('admin_panel:gerenciar_competencias')
     
     # Preparar informações adicionais sobre cada competência
@@ -725,218 +725,39 @@ def gerenciar_tipos_turma_view(request):
     return render(request, 'admin_panel/gerenciar_tipos_turma.html', context)
 
 
-@coordinador_or_admin
-def dashboard_analytics_data_view(request):
-    """View que retorna dados JSON para gráficos do dashboard"""
-    
-    # 1. Dados de progresso por tipo de turma (melhorado)
-    tipos_progresso = []
-    for tipo in TipoTurma.objects.all():
-        turmas_do_tipo = Turma.objects.filter(tipo_turma=tipo)
-        if turmas_do_tipo.exists():
-            total_notas_possiveis = 0
-            total_notas_lancadas = 0
-            total_alunos = 0
-            
-            for turma in turmas_do_tipo:
-                alunos_count = Aluno.objects.filter(turma=turma).count()
-                total_alunos += alunos_count
-                competencias_count = turma.competencias.count() if turma.competencias else 0
-                notas_possiveis = alunos_count * competencias_count
-                
-                if turma.competencias and competencias_count > 0:
-                    notas_lancadas = LancamentoDeNota.objects.filter(
-                        aluno__turma=turma,
-                        competencia__in=turma.competencias.all()
-                    ).count()
-                else:
-                    notas_lancadas = 0
-                
-                total_notas_possiveis += notas_possiveis
-                total_notas_lancadas += notas_lancadas
-            
-            progresso = int((total_notas_lancadas / total_notas_possiveis) * 100) if total_notas_possiveis > 0 else 0
-            
-            tipos_progresso.append({
-                'nome': tipo.nome,
-                'progresso': progresso,
-                'notas_lancadas': total_notas_lancadas,
-                'notas_possiveis': total_notas_possiveis,
-                'turmas_count': turmas_do_tipo.count(),
-                'alunos_count': total_alunos
-            })
-
-    # 2. Dados simplificados de desempenho por tipo de turma
-    tipos_desempenho = []
-    for tipo in TipoTurma.objects.all():
-        turmas_do_tipo = Turma.objects.filter(tipo_turma=tipo)
-        
-        if turmas_do_tipo.exists():
-            todas_notas = []
-            total_alunos = 0
-            
-            for turma in turmas_do_tipo:
-                total_alunos += Aluno.objects.filter(turma=turma).count()
-                
-                # Buscar todas as notas numéricas desta turma
-                notas_turma = LancamentoDeNota.objects.filter(
-                    aluno__turma=turma,
-                    competencia__tipo_nota='NUM'
-                )
-                
-                for nota in notas_turma:
-                    try:
-                        valor = float(nota.nota_valor)
-                        todas_notas.append(valor)
-                    except ValueError:
-                        pass
-            
-            if todas_notas:
-                media_tipo = sum(todas_notas) / len(todas_notas)
-                tipos_desempenho.append({
-                    'nome': tipo.nome,
-                    'media': round(media_tipo, 1),
-                    'total_notas': len(todas_notas),
-                    'total_alunos': total_alunos,
-                    'turmas_count': turmas_do_tipo.count()
-                })
-    
-    # Ordenar por média decrescente
-    tipos_desempenho.sort(key=lambda x: x['media'], reverse=True)
-
-    # 3. Progresso individual dos professores (mais detalhado)
-    professores_detalhados = []
-    for professor in Professor.objects.all():
-        turmas_prof = Turma.objects.filter(professor_responsavel=professor)
-        
-        if turmas_prof.exists():
-            progresso_por_turma = []
-            total_notas_lancadas = 0
-            total_notas_possiveis = 0
-            
-            for turma in turmas_prof:
-                alunos_count = Aluno.objects.filter(turma=turma).count()
-                competencias_count = turma.competencias.count() if turma.competencias else 0
-                notas_possiveis = alunos_count * competencias_count
-                
-                if turma.competencias and competencias_count > 0:
-                    notas_lancadas = LancamentoDeNota.objects.filter(
-                        aluno__turma=turma,
-                        competencia__in=turma.competencias.all()
-                    ).count()
-                else:
-                    notas_lancadas = 0
-                
-                progresso_turma = int((notas_lancadas / notas_possiveis) * 100) if notas_possiveis > 0 else 0
-                
-                progresso_por_turma.append({
-                    'turma': turma.identificador_turma,
-                    'progresso': progresso_turma,
-                    'alunos': alunos_count,
-                    'notas_lancadas': notas_lancadas,
-                    'notas_possiveis': notas_possiveis
-                })
-                
-                total_notas_lancadas += notas_lancadas
-                total_notas_possiveis += notas_possiveis
-            
-            progresso_geral = int((total_notas_lancadas / total_notas_possiveis) * 100) if total_notas_possiveis > 0 else 0
-            
-            professores_detalhados.append({
-                'nome': professor.user.get_full_name() or professor.user.username,
-                'progresso_geral': progresso_geral,
-                'turmas': progresso_por_turma,
-                'total_alunos': sum(t['alunos'] for t in progresso_por_turma),
-                'total_notas_lancadas': total_notas_lancadas,
-                'total_notas_possiveis': total_notas_possiveis
-            })
-
-    # 4. Análise de desempenho por competência (ranking)
-    ranking_competencias = []
-    for competencia in Competencia.objects.filter(tipo_nota='NUM'):
-        notas = LancamentoDeNota.objects.filter(competencia=competencia)
-        
-        if notas.exists():
-            notas_numericas = []
-            for nota in notas:
-                try:
-                    valor = float(nota.nota_valor)
-                    notas_numericas.append(valor)
-                except ValueError:
-                    pass
-            
-            if notas_numericas:
-                media = sum(notas_numericas) / len(notas_numericas)
-                ranking_competencias.append({
-                    'nome': competencia.nome,
-                    'media': round(media, 1),
-                    'total_avaliacoes': len(notas_numericas),
-                    'min_nota': min(notas_numericas),
-                    'max_nota': max(notas_numericas)
-                })
-    
-    # Ordenar por média decrescente
-    ranking_competencias.sort(key=lambda x: x['media'], reverse=True)
+def _versao_analytics(request):
+    """O endpoint de analytics também muda quando um novo snapshot é gerado"""
+    return [AnalyticsSnapshot.objects.aggregate(ultimo=Max('pk'))['ultimo']]
 
-    # 5. Distribuição de notas por faixa de desempenho
-    distribuicao_notas = {
-        'Insuficiente (0-40)': 0,
-        'Regular (41-60)': 0, 
-        'Bom (61-80)': 0,
-        'Excelente (81-100)': 0
-    }
-    
-    # Buscar todas as notas numéricas
-    notas_numericas = LancamentoDeNota.objects.filter(
-        competencia__tipo_nota='NUM'
-    )
-    
-    total_notas_numericas = 0
-    for nota in notas_numericas:
-        try:
-            valor = float(nota.nota_valor)
-            total_notas_numericas += 1
-            
-            if valor <= 40:
-                distribuicao_notas['Insuficiente (0-40)'] += 1
-            elif valor <= 60:
-                distribuicao_notas['Regular (41-60)'] += 1
-            elif valor <= 80:
-                distribuicao_notas['Bom (61-80)'] += 1
-            else:
-                distribuicao_notas['Excelente (81-100)'] += 1
-        except ValueError:
-            continue
-    
-    # Converter para percentuais
-    if total_notas_numericas > 0:
-        distribuicao_percentual = {
-            faixa: round((count / total_notas_numericas) * 100, 1)
-            for faixa, count in distribuicao_notas.items()
-        }
-    else:
-        distribuicao_percentual = {faixa: 0 for faixa in distribuicao_notas.keys()}
 
-    data = {
-        'tipos_progresso': tipos_progresso,
-        'tipos_desempenho': tipos_desempenho,
-        'professores_detalhados': professores_detalhados,
-        'ranking_competencias': ranking_competencias,
-        'distribuicao_notas': distribuicao_percentual,
-        'total_notas_numericas': total_notas_numericas,
-        'resumo': {
-            'total_turmas': Turma.objects.count(),
-            'total_alunos': Aluno.objects.count(),
-            'total_notas': LancamentoDeNota.objects.count(),
-            'total_professores': Professor.objects.count(),
-            'total_competencias': Competencia.objects.count(),
-            'media_geral': round(
-                sum(item['media'] for item in ranking_competencias) / len(ranking_competencias), 1
-            ) if ranking_competencias else 0
-        }
-    }
-    
-    return JsonResponse(data)
+@coordinador_or_admin
+@conditional_on_data_version(extra=_versao_analytics)
+def dashboard_analytics_data_view(request):
+    """
+    View que retorna dados JSON para gráficos do dashboard.
+    Serve o último snapshot materializado; ?fresh=1 calcula os dados ao vivo.
+    Aceita ?tipo_turma=<id> ou ?professor=<id> para restringir o escopo.
+    """
+    tipo_turma = None
+    professor = None
+    escopo, referencia_id = 'GERAL', None
+    if request.GET.get('tipo_turma', '').isdigit():
+        tipo_turma = get_object_or_404(TipoTurma, pk=request.GET['tipo_turma'])
+        escopo, referencia_id = 'TIPO_TURMA', tipo_turma.pk
+    elif request.GET.get('professor', '').isdigit():
+        professor = get_object_or_404(Professor, pk=request.GET['professor'])
+        escopo, referencia_id = 'PROFESSOR', professor.pk
+    
+    if request.GET.get('fresh') != '1':
+        snapshot = AnalyticsSnapshot.ultimo(escopo, referencia_id)
+        if snapshot is not None:
+            response = JsonResponse(snapshot.dados)
+            response['X-Analytics-Gerado-Em'] = snapshot.data_geracao.isoformat()
+            return response
+    
+    response = JsonResponse(AnalyticsEngine.dados_dashboard(tipo_turma=tipo_turma, professor=professor))
+    response['X-Analytics-Gerado-Em'] = timezone.now().isoformat()
+    return response
 
 
 @coordinador_or_admin
@@ -1067,7 +888,7 @@ def configurar_turma_view(request, turma_id):
         'title': f'Configurar {turma.nome}',
         'turma': turma,
         'total_alunos': turma.alunos.count(),
-        'competencias': turma.competencias.all() if turma.competencias else [],
+        'competencias': list(turma.competencias),
     }
     return render(request, 'admin_panel/configurar_turma.html', context)
 
@@ -1082,17 +903,17 @@ def visualizar_boletim_markdown(request, aluno_id):
     aluno = get_object_or_404(Aluno, id=aluno_id)
     
     try:
-        # Gerar boletim em Word usando os novos templates
-        boletim_doc = BoletimGenerator.gerar_boletim(aluno)
+        # Gerar boletim em Word usando os novos templates (ou servido do cache de boletins)
+        resultado = BoletimBatchRenderer.renderizar([aluno], workers=1)[0]
+        if resultado['erro'] is not None:
+            raise ValueError(resultado['erro'])
         
         # Criar resposta HTTP com o arquivo Word
         response = HttpResponse(
+            resultado['conteudo'],
             content_type='application/vnd.openxmlformats-officedocument.wordprocessingml.document'
         )
-        response['Content-Disposition'] = f'attachment; filename="boletim_{aluno.nome_completo.replace(" ", "_")}.docx"'
-        
-        # Salvar o documento na resposta
-        boletim_doc.save(response)
+        response['Content-Disposition'] = f'attachment; filename="{resultado["arquivo"]}"'
         
         return response
     
@@ -1111,20 +932,17 @@ def gerar_boletim_individual(request, aluno_id):
         return redirect('admin_panel:detalhes_turma', turma_id=aluno.turma.id)
     
     try:
-        # Gerar boletim usando template Word da pasta boletins
-        boletim_doc = BoletimGenerator.gerar_boletim(aluno)
-        
-        # Criar buffer temporário para salvar o documento
-        buffer = io.BytesIO()
-        boletim_doc.save(buffer)
-        buffer.seek(0)
+        # Gerar boletim usando template Word da pasta boletins (ou servido do cache de boletins)
+        resultado = BoletimBatchRenderer.renderizar([aluno], workers=1)[0]
+        if resultado['erro'] is not None:
+            raise ValueError(resultado['erro'])
         
         # Criar resposta HTTP com arquivo Word
         response = HttpResponse(
-            buffer.read(),
+            resultado['conteudo'],
             content_type='application/vnd.openxmlformats-officedocument.wordprocessingml.document'
         )
-        response['Content-Disposition'] = f'attachment; filename="boletim_{aluno.nome_completo.replace(" ", "_")}.docx"'
+        response['Content-Disposition'] = f'attachment; filename="{resultado["arquivo"]}"'
         
         return response
         
@@ -1138,12 +956,13 @@ def gerar_boletins_turma(request, turma_id):
     """Gera boletins Word de todos os alunos de uma turma com notas completas"""
     turma = get_object_or_404(Turma, id=turma_id)
     
-    # Verificar quais alunos têm notas completas
+    # Verificar quais alunos têm notas completas (uma query para a turma toda)
     alunos_completos = []
     alunos_incompletos = []
     
-    for aluno in turma.alunos.filter(ativo=True):
-        if aluno.tem_notas_completas():
+    completude = ProgressEngine.completude_alunos(turma)
+    for aluno in BoletimDataLoader.queryset_alunos(turma):
+        if completude[aluno.id]['completo']:
             alunos_completos.append(aluno)
         else:
             alunos_incompletos.append(aluno)
@@ -1156,32 +975,22 @@ def gerar_boletins_turma(request, turma_id):
     if len(alunos_completos) == 1:
         return gerar_boletim_individual(request, alunos_completos[0].id)
     
-    # Para múltiplos alunos, criar um ZIP com todos os boletins Word
-    import zipfile
-    
-    zip_buffer = io.BytesIO()
-    with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-        for aluno in alunos_completos:
-            try:
-                # Gerar boletim Word para cada aluno
-                boletim_doc = BoletimGenerator.gerar_boletim(aluno)
-                
-                # Salvar em buffer temporário
-                doc_buffer = io.BytesIO()
-                boletim_doc.save(doc_buffer)
-                doc_buffer.seek(0)
-                
-                # Adicionar ao ZIP
-                filename = f"boletim_{aluno.nome_completo.replace(' ', '_')}.docx"
-                zip_file.writestr(filename, doc_buffer.read())
-                
-            except Exception as e:
-                logger.error(f"Erro ao gerar boletim para {aluno.nome_completo}: {str(e)}")
+    # Para múltiplos alunos, um ZIP com todos os boletins Word, enviado por streaming:
+    # cada boletim vai para o navegador assim que é renderizado pelo pool de processos
+    resultados = BoletimBatchRenderer.renderizar_iter(alunos_completos)
     
-    zip_buffer.seek(0)
+    def arquivos_zip():
+        falhas = []
+        for resultado in resultados:
+            if resultado['erro'] is None:
+                yield resultado['arquivo'], resultado['conteudo']
+            else:
+                falhas.append(f"{resultado['nome']}: {resultado['erro']}")
+        # A resposta já começou a ser enviada: falhas vão num arquivo dentro do ZIP
+        if falhas:
+            yield 'ERROS.txt', ('Boletins não gerados:\n' + '\n'.join(falhas) + '\n').encode('utf-8')
     
-    # Criar resposta HTTP com ZIP
-    response = HttpResponse(zip_buffer.read(), content_type='application/zip')
+    response = StreamingHttpResponse(stream_zip(arquivos_zip()), content_type='application/zip')
     response['Content-Disposition'] = f'attachment; filename="boletins_{turma.identificador_turma.replace(" ", "_")}.zip"'
     
     # Adicionar mensagem sobre alunos incompletos
@@ -1198,6 +1007,35 @@ def gerar_boletins_turma(request, turma_id):
     return response
 
 
+@coordinador_or_admin
+def gerar_boletins_turma_pdf(request, turma_id):
+    """Gera um único PDF com os boletins de todos os alunos da turma com notas completas"""
+    turma = get_object_or_404(Turma, id=turma_id)
+    
+    try:
+        pdf, falhas = BoletimPdfRenderer.gerar_pdf_turma(turma)
+    except PdfIndisponivelError as e:
+        messages.error(request, str(e))
+        return redirect('admin_panel:detalhes_turma', turma_id=turma.id)
+    
+    if pdf is None:
+        if falhas:
+            messages.error(request, 'Não foi possível gerar nenhum boletim da turma em PDF.')
+        else:
+            messages.error(request, 'Nenhum aluno da turma possui todas as notas lançadas.')
+        return redirect('admin_panel:detalhes_turma', turma_id=turma.id)
+    
+    if falhas:
+        messages.warning(
+            request,
+            'Alguns boletins não foram gerados: ' + ', '.join(falha['aluno'] for falha in falhas)
+        )
+    
+    response = HttpResponse(pdf, content_type='application/pdf')
+    response['Content-Disposition'] = f'attachment; filename="boletins_{turma.identificador_turma.replace(" ", "_")}.pdf"'
+    return response
+
+
 @coordinador_or_admin
 def verificar_notas_turma(request, turma_id):
     """Verifica o status das notas de uma turma e retorna JSON"""
@@ -1207,15 +1045,17 @@ def verificar_notas_turma(request, turma_id):
     alunos_completos = 0
     alunos_incompletos = 0
     
-    for aluno in turma.alunos.filter(ativo=True):
-        tem_completas = aluno.tem_notas_completas()
-        progresso = aluno.get_progresso_completo()
+    for info in ProgressEngine.completude_alunos(turma).values():
+        tem_completas = info['completo']
         
         alunos_status.append({
-            'id': aluno.id,
-            'nome': aluno.nome_completo,
+            'id': info['aluno_id'],
+            'nome': info['nome'],
             'tem_completas': tem_completas,
-            'progresso': progresso
+            'progresso': info['progresso'],
+            'notas_lancadas': info['notas_lancadas'],
+            'total_competencias': info['total_competencias'],
+            'competencias_faltando': info['faltando'],
         })
         
         if tem_completas:
@@ -1229,4 +1069,92 @@ def verificar_notas_turma(request, turma_id):
         'total_alunos': len(alunos_status),
         'alunos_status': alunos_status,
         'pode_gerar_boletins': alunos_completos > 0
-    })
\ No newline at end of file
+    })
+
+# ===============================
+# EXPORTAÇÃO DE BOLETINS (ESCOLA INTEIRA)
+# ===============================
+
+@secretaria_or_above
+def exportacoes_boletins_view(request):
+    """Lista as exportações de boletins e inicia uma nova (todas as turmas ou filtradas)"""
+    if request.method == 'POST':
+        tipo_turma = None
+        professor = None
+        if request.POST.get('tipo_turma'):
+            tipo_turma = get_object_or_404(TipoTurma, id=request.POST['tipo_turma'])
+        if request.POST.get('professor'):
+            professor = get_object_or_404(Professor, id=request.POST['professor'])
+        unidade = request.POST.get('unidade', '')
+        if unidade not in dict(ExportacaoBoletins.UNIDADE_CHOICES):
+            unidade = ''
+        
+        exportacao = ExportacaoService.criar(
+            usuario=request.user, tipo_turma=tipo_turma, professor=professor, unidade=unidade
+        )
+        if not exportacao.turmas.exists():
+            exportacao.delete()
+            messages.warning(request, 'Nenhuma turma corresponde aos filtros escolhidos.')
+            return redirect('admin_panel:exportacoes_boletins')
+        
+        ExportacaoService.iniciar_em_background(exportacao.pk)
+        messages.success(request, f'Exportação #{exportacao.pk} iniciada com {exportacao.turmas.count()} turma(s).')
+        return redirect('admin_panel:exportacao_boletins_status', exportacao_id=exportacao.pk)
+    
+    context = {
+        'title': 'Exportação de Boletins',
+        'exportacoes': ExportacaoBoletins.objects.select_related('tipo_turma', 'professor__user', 'criado_por')[:20],
+        'tipos_turma': TipoTurma.objects.all(),
+        'professores': Professor.objects.select_related('user'),
+        'unidades': ExportacaoBoletins.UNIDADE_CHOICES,
+    }
+    return render(request, 'admin_panel/exportacoes_boletins.html', context)
+
+
+@secretaria_or_above
+def exportacao_boletins_status_view(request, exportacao_id):
+    """Página de acompanhamento de uma exportação (consulta o status periodicamente)"""
+    exportacao = get_object_or_404(ExportacaoBoletins, id=exportacao_id)
+    context = {
+        'title': f'Exportação #{exportacao.pk}',
+        'exportacao': exportacao,
+        'status': ExportacaoService.status(exportacao),
+    }
+    return render(request, 'admin_panel/exportacao_boletins_status.html', context)
+
+
+@secretaria_or_above
+def exportacao_boletins_status_data_view(request, exportacao_id):
+    """Progresso da exportação em JSON (usado pelo polling da página de status)"""
+    exportacao = get_object_or_404(ExportacaoBoletins, id=exportacao_id)
+    return JsonResponse(ExportacaoService.status(exportacao))
+
+
+@secretaria_or_above
+def exportacao_boletins_retomar_view(request, exportacao_id):
+    """Retoma uma exportação interrompida, sem refazer as turmas já concluídas"""
+    exportacao = get_object_or_404(ExportacaoBoletins, id=exportacao_id)
+    
+    if request.method == 'POST':
+        if ExportacaoService.pode_retomar(exportacao):
+            ExportacaoService.iniciar_em_background(exportacao.pk)
+            messages.success(request, f'Exportação #{exportacao.pk} retomada.')
+        else:
+            messages.warning(request, 'Esta exportação não está parada.')
+    
+    return redirect('admin_panel:exportacao_boletins_status', exportacao_id=exportacao.pk)
+
+
+@secretaria_or_above
+def exportacao_boletins_download_view(request, exportacao_id):
+    """Baixa o ZIP de uma exportação concluída"""
+    import os
+    from django.conf import settings
+    from django.http import FileResponse, Http404
+    
+    exportacao = get_object_or_404(ExportacaoBoletins, id=exportacao_id, status='CONCLUIDA')
+    caminho = os.path.join(settings.MEDIA_ROOT, exportacao.arquivo)
+    if not exportacao.arquivo or not os.path.exists(caminho):
+        raise Http404('Arquivo da exportação não encontrado')
+    
+    return FileResponse(open(caminho, 'rb'), as_attachment=True, filename=os.path.basename(caminho))
@@ -1,6 +1,10 @@
-from django.contrib import admin # type: ignore
+from django import forms # type: ignore
+from django.contrib import admin, messages # type: ignore
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin #type: ignore
 from django.contrib.auth.models import User # type: ignore
+from django.db.models import F # type: ignore
+from django.http import HttpResponseRedirect # type: ignore
+from django.utils import timezone # type: ignore
 
 from .models import Professor, Turma, Aluno, Competencia, LancamentoDeNota, TipoTurma, ConfiguracaoSistema, ProblemaRelatado, AuditLog, SystemMetrics, UserPreference
 
@@ -54,12 +58,81 @@ class CompetenciaAdmin(admin.ModelAdmin):
     list_display = ('nome', 'tipo_nota') # Campos exibidos na lista
     list_filter = ('tipo_nota',) # Filtros laterais
 
+class LancamentoDeNotaAdminForm(forms.ModelForm):
+    """Recusa a gravação se a nota mudou (ex: autosave do professor) desde que o formulário foi aberto"""
+    MENSAGEM_CONFLITO = (
+        'Esta nota foi alterada por outra pessoa enquanto você editava. '
+        'Recarregue a página para ver o valor atual.'
+    )
+
+    versao_lida = forms.IntegerField(widget=forms.HiddenInput, required=False)
+
+    class Meta:
+        model = LancamentoDeNota
+        fields = '__all__'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.instance.pk:
+            self.fields['versao_lida'].initial = self.instance.versao
+
+    def clean(self):
+        cleaned_data = super().clean()
+        versao_lida = cleaned_data.get('versao_lida')
+        if self.instance.pk and versao_lida is not None:
+            versao_atual = LancamentoDeNota.objects.filter(pk=self.instance.pk).values_list('versao', flat=True).first()
+            if versao_atual != versao_lida:
+                raise forms.ValidationError(self.MENSAGEM_CONFLITO)
+        return cleaned_data
+
 @admin.register(LancamentoDeNota)
 class LancamentoDeNotaAdmin(admin.ModelAdmin):
+    form = LancamentoDeNotaAdminForm
     list_display = ('aluno', 'competencia', 'nota_valor') # Campos exibidos na lista
     list_filter = ('competencia',) # Filtros laterais
     search_fields = ('aluno__nome_completo', 'competencia__nome') # Campos pesquisáveis
 
+    def save_model(self, request, obj, form, change):
+        """
+        Edição: UPDATE condicional à versão lida ao abrir o formulário (a verificação
+        do clean() sozinha deixa uma janela entre a leitura e a gravação). Nenhuma
+        linha atualizada = outra pessoa gravou antes: nada é salvo.
+        """
+        versao_lida = form.cleaned_data.get('versao_lida')
+        if not change or versao_lida is None:
+            return super().save_model(request, obj, form, change)
+
+        obj.nota_numerica = LancamentoDeNota.converter_nota_numerica(obj.nota_valor, obj.competencia.tipo_nota)
+        atualizadas = LancamentoDeNota.objects.filter(pk=obj.pk, versao=versao_lida).update(
+            aluno=obj.aluno,
+            competencia=obj.competencia,
+            nota_valor=obj.nota_valor,
+            nota_numerica=obj.nota_numerica,
+            versao=F('versao') + 1,
+            data_atualizacao=timezone.now(),
+        )
+        if not atualizadas:
+            obj._conflito_versao = True
+            return
+        obj.versao = versao_lida + 1
+
+        # O UPDATE não dispara signals: nota movida para outro aluno/competência muda o progresso
+        if {'aluno', 'competencia'} & set(form.changed_data):
+            from core.progress import ProgressStore
+            for aluno_id in {form.initial.get('aluno'), obj.aluno_id} - {None}:
+                ProgressStore.recalcular_aluno(aluno_id)
+
+    def log_change(self, request, obj, message):
+        if getattr(obj, '_conflito_versao', False):
+            return None
+        return super().log_change(request, obj, message)
+
+    def response_change(self, request, obj):
+        if getattr(obj, '_conflito_versao', False):
+            self.message_user(request, LancamentoDeNotaAdminForm.MENSAGEM_CONFLITO, messages.ERROR)
+            return HttpResponseRedirect(request.path)
+        return super().response_change(request, obj)
+
 @admin.register(ConfiguracaoSistema)
 class ConfiguracaoSistemaAdmin(admin.ModelAdmin):
     list_display = ('nome', 'valor', 'descricao', 'data_atualizacao')
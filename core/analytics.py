@@ -0,0 +1,299 @@
+"""
+Motor de analytics do Sistema de Notas
+
+Monta os dados dos gráficos do dashboard de analytics com agregações feitas
+no banco de dados (médias, mínimos/máximos, contagens e faixas via CASE),
+com um número fixo de queries independente do volume de turmas e notas.
+Os payloads podem ser materializados em AnalyticsSnapshot (geral, por tipo de
+turma e por professor) para que o endpoint responda sem recalcular.
+"""
+
+from django.db.models import Avg, Count, Max, Min, Q
+
+from django.db import transaction
+
+from core.models import Turma, Aluno, Professor, Competencia, LancamentoDeNota, TipoTurma, AnalyticsSnapshot
+from core.progress import ProgressStore
+
+# Faixas de desempenho da distribuição de notas (limite superior inclusivo)
+FAIXAS_DISTRIBUICAO = [
+    ('Insuficiente (0-40)', 40),
+    ('Regular (41-60)', 60),
+    ('Bom (61-80)', 80),
+    ('Excelente (81-100)', None),
+]
+
+
+class AnalyticsEngine:
+    """
+    Calcula os conjuntos de dados do dashboard de analytics no banco de dados
+    """
+
+    @staticmethod
+    def _filtro_turmas(tipo_turma=None, professor=None):
+        """Filtro de Turma para o escopo informado (vazio = escola toda)"""
+        filtro = {}
+        if tipo_turma is not None:
+            filtro['tipo_turma'] = tipo_turma
+        if professor is not None:
+            filtro['professor_responsavel'] = professor
+        return filtro
+    
+    @staticmethod
+    def _prefixar(filtro, prefixo):
+        """Aplica o filtro de Turma a partir de outro modelo (ex: 'aluno__turma__')"""
+        return {f'{prefixo}{campo}': valor for campo, valor in filtro.items()}
+    
+    @staticmethod
+    def notas_numericas(filtro_turmas=None):
+        """
+        Retorna as notas de competências numéricas com valor numérico válido
+        (as agregações usam a coluna indexada nota_numerica)
+        """
+        return LancamentoDeNota.objects.filter(
+            competencia__tipo_nota='NUM',
+            nota_numerica__isnull=False,
+            **AnalyticsEngine._prefixar(filtro_turmas or {}, 'aluno__turma__')
+        ).order_by()
+
+    @staticmethod
+    def _agrupar_progresso(progresso_turmas):
+        """Agrupa as estatísticas de progresso por tipo de turma e por professor"""
+        progresso_por_tipo = {}
+        progresso_por_professor = {}
+        for info in progresso_turmas:
+            turma = info['turma']
+            progresso_por_tipo.setdefault(turma.tipo_turma_id, []).append(info)
+            progresso_por_professor.setdefault(turma.professor_responsavel_id, []).append(info)
+        return progresso_por_tipo, progresso_por_professor
+
+    @staticmethod
+    def tipos_progresso(tipos, progresso_por_tipo):
+        """1. Progresso de lançamento por tipo de turma"""
+        tipos_progresso = []
+        for tipo in tipos:
+            turmas_do_tipo = progresso_por_tipo.get(tipo.id, [])
+            if turmas_do_tipo:
+                total_notas_possiveis = sum(t['total_notas_possiveis'] for t in turmas_do_tipo)
+                total_notas_lancadas = sum(t['notas_lancadas'] for t in turmas_do_tipo)
+
+                tipos_progresso.append({
+                    'nome': tipo.nome,
+                    'progresso': int((total_notas_lancadas / total_notas_possiveis) * 100) if total_notas_possiveis > 0 else 0,
+                    'notas_lancadas': total_notas_lancadas,
+                    'notas_possiveis': total_notas_possiveis,
+                    'turmas_count': len(turmas_do_tipo),
+                    'alunos_count': sum(t['total_alunos'] for t in turmas_do_tipo)
+                })
+        return tipos_progresso
+
+    @staticmethod
+    def tipos_desempenho(tipos, progresso_por_tipo, filtro_turmas=None):
+        """2. Média das notas numéricas por tipo de turma (uma query agrupada)"""
+        medias = {
+            linha['aluno__turma__tipo_turma_id']: linha
+            for linha in AnalyticsEngine.notas_numericas(filtro_turmas)
+            .values('aluno__turma__tipo_turma_id')
+            .annotate(media=Avg('nota_numerica'), total_notas=Count('id'))
+        }
+
+        tipos_desempenho = []
+        for tipo in tipos:
+            turmas_do_tipo = progresso_por_tipo.get(tipo.id, [])
+            linha = medias.get(tipo.id)
+            if turmas_do_tipo and linha:
+                tipos_desempenho.append({
+                    'nome': tipo.nome,
+                    'media': round(linha['media'], 1),
+                    'total_notas': linha['total_notas'],
+                    'total_alunos': sum(t['total_alunos'] for t in turmas_do_tipo),
+                    'turmas_count': len(turmas_do_tipo)
+                })
+
+        # Ordenar por média decrescente
+        tipos_desempenho.sort(key=lambda x: x['media'], reverse=True)
+        return tipos_desempenho
+
+    @staticmethod
+    def professores_detalhados(progresso_por_professor):
+        """3. Progresso individual dos professores, turma a turma"""
+        professores_detalhados = []
+        for professor in Professor.objects.select_related('user'):
+            turmas_prof = progresso_por_professor.get(professor.id, [])
+            if not turmas_prof:
+                continue
+
+            progresso_por_turma = [
+                {
+                    'turma': info['turma'].identificador_turma,
+                    'progresso': info['progresso_turma'],
+                    'alunos': info['total_alunos'],
+                    'notas_lancadas': info['notas_lancadas'],
+                    'notas_possiveis': info['total_notas_possiveis']
+                }
+                for info in turmas_prof
+            ]
+            total_notas_lancadas = sum(t['notas_lancadas'] for t in progresso_por_turma)
+            total_notas_possiveis = sum(t['notas_possiveis'] for t in progresso_por_turma)
+
+            professores_detalhados.append({
+                'nome': professor.user.get_full_name() or professor.user.username,
+                'progresso_geral': int((total_notas_lancadas / total_notas_possiveis) * 100) if total_notas_possiveis > 0 else 0,
+                'turmas': progresso_por_turma,
+                'total_alunos': sum(t['alunos'] for t in progresso_por_turma),
+                'total_notas_lancadas': total_notas_lancadas,
+                'total_notas_possiveis': total_notas_possiveis
+            })
+        return professores_detalhados
+
+    @staticmethod
+    def ranking_competencias(filtro_turmas=None):
+        """4. Ranking das competências numéricas por média (uma query agrupada)"""
+        linhas = AnalyticsEngine.notas_numericas(filtro_turmas).values(
+            'competencia_id', 'competencia__nome'
+        ).annotate(
+            media=Avg('nota_numerica'),
+            total_avaliacoes=Count('id'),
+            min_nota=Min('nota_numerica'),
+            max_nota=Max('nota_numerica')
+        ).order_by('competencia__nome', 'competencia_id')
+
+        ranking_competencias = [
+            {
+                'nome': linha['competencia__nome'],
+                'media': round(linha['media'], 1),
+                'total_avaliacoes': linha['total_avaliacoes'],
+                'min_nota': linha['min_nota'],
+                'max_nota': linha['max_nota']
+            }
+            for linha in linhas
+        ]
+
+        # Ordenar por média decrescente
+        ranking_competencias.sort(key=lambda x: x['media'], reverse=True)
+        return ranking_competencias
+
+    @staticmethod
+    def distribuicao_notas(filtro_turmas=None):
+        """
+        5. Distribuição percentual das notas numéricas por faixa de desempenho
+        (histograma calculado com contagens condicionais em uma única query)
+
+        Returns:
+            tuple: (distribuicao_percentual, total_notas_numericas)
+        """
+        contagens = {'total': Count('id')}
+        limite_anterior = None
+        for indice, (faixa, limite) in enumerate(FAIXAS_DISTRIBUICAO):
+            condicao = Q()
+            if limite_anterior is not None:
+                condicao &= Q(nota_numerica__gt=limite_anterior)
+            if limite is not None:
+                condicao &= Q(nota_numerica__lte=limite)
+            contagens[f'faixa_{indice}'] = Count('id', filter=condicao)
+            limite_anterior = limite
+
+        resultado = AnalyticsEngine.notas_numericas(filtro_turmas).aggregate(**contagens)
+        total_notas_numericas = resultado['total']
+
+        distribuicao_percentual = {}
+        for indice, (faixa, _) in enumerate(FAIXAS_DISTRIBUICAO):
+            count = resultado[f'faixa_{indice}']
+            distribuicao_percentual[faixa] = round((count / total_notas_numericas) * 100, 1) if total_notas_numericas > 0 else 0
+
+        return distribuicao_percentual, total_notas_numericas
+
+    @staticmethod
+    def resumo(ranking_competencias, filtro_turmas=None):
+        """Totais dos cards de resumo"""
+        filtro_turmas = filtro_turmas or {}
+        if filtro_turmas:
+            professores = Professor.objects.filter(
+                **AnalyticsEngine._prefixar(filtro_turmas, 'turmas__')
+            ).distinct()
+        else:
+            professores = Professor.objects.all()
+        
+        return {
+            'total_turmas': Turma.objects.filter(**filtro_turmas).count(),
+            'total_alunos': Aluno.objects.filter(**AnalyticsEngine._prefixar(filtro_turmas, 'turma__')).count(),
+            'total_notas': LancamentoDeNota.objects.filter(**AnalyticsEngine._prefixar(filtro_turmas, 'aluno__turma__')).count(),
+            'total_professores': professores.count(),
+            'total_competencias': Competencia.objects.count(),
+            'media_geral': round(
+                sum(item['media'] for item in ranking_competencias) / len(ranking_competencias), 1
+            ) if ranking_competencias else 0
+        }
+    
+    @staticmethod
+    def dados_dashboard(tipo_turma=None, professor=None):
+        """
+        Monta o payload completo de admin_panel:analytics_data
+        
+        Args:
+            tipo_turma: Se informado, restringe os dados às turmas deste tipo
+            professor: Se informado, restringe os dados às turmas do professor
+        """
+        filtro_turmas = AnalyticsEngine._filtro_turmas(tipo_turma, professor)
+        progresso_por_tipo, progresso_por_professor = AnalyticsEngine._agrupar_progresso(
+            ProgressStore.progresso_turmas(Turma.objects.filter(**filtro_turmas))
+        )
+        tipos = TipoTurma.objects.all()
+        if tipo_turma is not None:
+            tipos = tipos.filter(pk=tipo_turma.pk)
+        tipos = list(tipos)
+        
+        ranking_competencias = AnalyticsEngine.ranking_competencias(filtro_turmas)
+        distribuicao_percentual, total_notas_numericas = AnalyticsEngine.distribuicao_notas(filtro_turmas)
+        
+        return {
+            'tipos_progresso': AnalyticsEngine.tipos_progresso(tipos, progresso_por_tipo),
+            'tipos_desempenho': AnalyticsEngine.tipos_desempenho(tipos, progresso_por_tipo, filtro_turmas),
+            'professores_detalhados': AnalyticsEngine.professores_detalhados(progresso_por_professor),
+            'ranking_competencias': ranking_competencias,
+            'distribuicao_notas': distribuicao_percentual,
+            'total_notas_numericas': total_notas_numericas,
+            'resumo': AnalyticsEngine.resumo(ranking_competencias, filtro_turmas),
+        }
+    
+    @staticmethod
+    def gerar_snapshots(manter=7):
+        """
+        Materializa o payload geral, por tipo de turma e por professor em AnalyticsSnapshot
+        
+        Args:
+            manter: Quantos snapshots guardar por escopo (os mais antigos são apagados)
+        
+        Returns:
+            int: Número de snapshots gerados
+        """
+        snapshots = [AnalyticsSnapshot(escopo='GERAL', dados=AnalyticsEngine.dados_dashboard())]
+        for tipo in TipoTurma.objects.filter(turmas__isnull=False).distinct():
+            snapshots.append(AnalyticsSnapshot(
+                escopo='TIPO_TURMA',
+                referencia_id=tipo.pk,
+                dados=AnalyticsEngine.dados_dashboard(tipo_turma=tipo)
+            ))
+        for professor in Professor.objects.filter(turmas__isnull=False).distinct():
+            snapshots.append(AnalyticsSnapshot(
+                escopo='PROFESSOR',
+                referencia_id=professor.pk,
+                dados=AnalyticsEngine.dados_dashboard(professor=professor)
+            ))
+        
+        with transaction.atomic():
+            for snapshot in snapshots:
+                snapshot.save()
+            AnalyticsEngine.limpar_snapshots(manter)
+        
+        return len(snapshots)
+    
+    @staticmethod
+    def limpar_snapshots(manter=7):
+        """Apaga os snapshots além dos `manter` mais recentes de cada escopo"""
+        chaves = AnalyticsSnapshot.objects.order_by().values_list('escopo', 'referencia_id').distinct()
+        for escopo, referencia_id in chaves:
+            antigos = AnalyticsSnapshot.objects.filter(
+                escopo=escopo, referencia_id=referencia_id
+            ).order_by('-data_geracao', '-pk').values_list('pk', flat=True)[manter:]
+            AnalyticsSnapshot.objects.filter(pk__in=list(antigos)).delete()
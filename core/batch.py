@@ -0,0 +1,314 @@
+"""
+Geração de boletins em lote, em paralelo
+
+Os dados de todos os alunos são lidos do banco antes, no processo que fez o
+pedido (BoletimGenerator.montar_substituicoes). Os workers só recebem
+dicionários simples e devolvem o .docx pronto em bytes, então nunca acessam o
+ORM. Cada worker mantém o seu próprio cache de templates (parseados uma vez).
+"""
+
+import io
+import logging
+import multiprocessing
+import os
+import threading
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.utils.text import get_valid_filename
+
+from core.render_cache import BoletimCache
+
+logger = logging.getLogger(__name__)
+
+
+def _inicializar_worker(settings_module):
+    """Configura o Django no worker (processo novo, iniciado com spawn)"""
+    import django
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+    django.setup()
+
+
+def _renderizar_em_bytes(dados):
+    """
+    Renderiza um boletim a partir dos dados pré-carregados (roda no worker)
+
+    Returns:
+        tuple: (conteudo em bytes, None) ou (None, mensagem de erro)
+    """
+    from core.utils import BoletimGenerator
+
+    try:
+        documento = BoletimGenerator.renderizar_boletim(dados['boletim_tipo'], dados['substituicoes'])
+        buffer = io.BytesIO()
+        documento.save(buffer)
+        return buffer.getvalue(), None
+    except Exception as e:
+        return None, str(e)
+
+
+class BoletimBatchRenderer:
+    """
+    Renderiza os boletins de vários alunos distribuindo-os num pool de processos.
+
+    O resultado sai sempre na ordem dos alunos recebidos e cada aluno tem o seu
+    próprio status: uma falha não interrompe o lote.
+
+    Uso:
+        resultados = BoletimBatchRenderer.renderizar(alunos)
+        for resultado in resultados:
+            if resultado['erro'] is None:
+                zip_file.writestr(resultado['arquivo'], resultado['conteudo'])
+    """
+
+    _pool = None
+    _pool_workers = None
+    _pool_lock = threading.Lock()
+
+    @staticmethod
+    def workers_padrao():
+        """Quantidade de workers: settings.BOLETIM_WORKERS ou, se 0, o número de CPUs (até 4)"""
+        workers = getattr(settings, 'BOLETIM_WORKERS', 0)
+        if workers > 0:
+            return workers
+        return min(os.cpu_count() or 1, 4)
+
+    @classmethod
+    def _obter_pool(cls, workers):
+        """
+        Pool de processos reaproveitado entre pedidos (os workers já têm os
+        templates em cache). Usa spawn: processos limpos, sem herdar as conexões
+        de banco do processo web.
+        """
+        with cls._pool_lock:
+            if cls._pool is None or cls._pool_workers != workers:
+                if cls._pool is not None:
+                    cls._pool.shutdown(wait=False, cancel_futures=True)
+                cls._pool = ProcessPoolExecutor(
+                    max_workers=workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_inicializar_worker,
+                    initargs=(os.environ.get('DJANGO_SETTINGS_MODULE', 'SistemaNotas.settings'),),
+                )
+                cls._pool_workers = workers
+            return cls._pool
+
+    @classmethod
+    def encerrar_pool(cls):
+        """Encerra o pool de processos (recriado no próximo lote)"""
+        with cls._pool_lock:
+            if cls._pool is not None:
+                cls._pool.shutdown(wait=True, cancel_futures=True)
+            cls._pool = None
+            cls._pool_workers = None
+
+    @staticmethod
+    def nome_arquivo(aluno):
+        """
+        Nome do arquivo .docx do boletim de um aluno: seguro como nome de arquivo
+        (sem '/' etc.) e único na turma (alunos homônimos têm ids diferentes)
+        """
+        return get_valid_filename(f"boletim_{aluno.nome_completo}_{aluno.pk}.docx")
+
+    @staticmethod
+    def preparar(alunos):
+        """
+        Lê do banco os dados de todos os boletins (antes de qualquer renderização),
+        com um número fixo de queries (BoletimDataLoader)
+
+        Returns:
+            list: Um dict por aluno, na mesma ordem, com 'aluno_id', 'nome', 'arquivo',
+                  'boletim_tipo', 'substituicoes' e 'erro' (falha ao ler os dados)
+        """
+        from core.boletim_data import BoletimDataLoader
+        from core.utils import BoletimGenerator
+
+        lote = []
+        for carregado in BoletimDataLoader.carregar(alunos):
+            aluno = carregado['aluno']
+            dados = {
+                'aluno_id': aluno.id,
+                'nome': aluno.nome_completo,
+                'arquivo': BoletimBatchRenderer.nome_arquivo(aluno),
+                'boletim_tipo': aluno.turma.boletim_tipo,
+                'substituicoes': None,
+                'erro': None,
+            }
+            try:
+                dados['substituicoes'] = BoletimGenerator.montar_substituicoes(
+                    aluno, notas=carregado['notas'], nota_final=carregado['nota_final']
+                )
+            except Exception as e:
+                dados['erro'] = str(e)
+            lote.append(dados)
+        return lote
+
+    @staticmethod
+    def _marcar_cache(lote):
+        """
+        Calcula a chave de conteúdo de cada boletim e marca os que já estão no cache
+        (esses não vão para o pool)
+        """
+        if not BoletimCache.ativo():
+            return
+        for dados in lote:
+            if dados['erro'] is not None:
+                continue
+            try:
+                dados['chave'] = BoletimCache.chave(dados['boletim_tipo'], dados['substituicoes'])
+            except Exception:
+                # Template inválido: o erro aparece na renderização
+                continue
+            dados['em_cache'] = BoletimCache.contem(dados['chave'])
+
+    @classmethod
+    def renderizar_iter(cls, alunos, workers=None):
+        """
+        Versão incremental de renderizar: os dados são lidos do banco já nesta
+        chamada, e cada boletim é entregue assim que fica pronto, na ordem recebida.
+
+        Ficam no máximo `workers` boletins em andamento, então a memória não cresce
+        com o tamanho da turma (usado pelo download em ZIP por streaming).
+
+        Returns:
+            iterator: Um dict por aluno, no formato de renderizar()
+        """
+        lote = cls.preparar(alunos)
+        return cls._iterar_lote(lote, workers or cls.workers_padrao())
+
+    @classmethod
+    def _iterar_lote(cls, lote, workers):
+        """Renderiza um lote já preparado, mantendo até `workers` boletins em andamento"""
+        cls._marcar_cache(lote)
+        pendentes = [dados for dados in lote if dados['erro'] is None and not dados.get('em_cache')]
+        futuros = deque()
+        proximo = 0
+        pool = None
+        if workers > 1 and len(pendentes) > 1:
+            pool = cls._obter_pool(workers)
+
+        for dados in lote:
+            if dados.get('em_cache'):
+                dados['conteudo'] = BoletimCache.obter(dados['chave'])
+                if dados['conteudo'] is None:
+                    # Removido do cache depois da verificação: renderiza aqui mesmo
+                    dados['conteudo'], dados['erro'] = _renderizar_em_bytes(dados)
+                    dados['em_cache'] = False
+                    cls._guardar_no_cache(dados)
+            elif dados['erro'] is None:
+                if pool is None:
+                    dados['conteudo'], dados['erro'] = _renderizar_em_bytes(dados)
+                else:
+                    # Completa a janela de tarefas em andamento (ordem de entrada preservada)
+                    while proximo < len(pendentes) and len(futuros) < workers:
+                        tarefa = pendentes[proximo]
+                        futuros.append(pool.submit(
+                            _renderizar_em_bytes,
+                            {'boletim_tipo': tarefa['boletim_tipo'], 'substituicoes': tarefa['substituicoes']},
+                        ))
+                        proximo += 1
+                    try:
+                        dados['conteudo'], dados['erro'] = futuros.popleft().result()
+                    except BrokenProcessPool:
+                        logger.exception('Pool de boletins interrompido; renderizando o restante no processo atual')
+                        cls.encerrar_pool()
+                        pool = None
+                        futuros.clear()
+                        dados['conteudo'], dados['erro'] = _renderizar_em_bytes(dados)
+                cls._guardar_no_cache(dados)
+
+            if dados['erro'] is not None:
+                logger.error(f"Erro ao gerar boletim para {dados['nome']}: {dados['erro']}")
+            yield {
+                'aluno_id': dados['aluno_id'],
+                'nome': dados['nome'],
+                'arquivo': dados['arquivo'],
+                'conteudo': dados.get('conteudo'),
+                'erro': dados['erro'],
+                'em_cache': bool(dados.get('em_cache')),
+            }
+            # O lote não guarda os boletins já entregues
+            dados.pop('conteudo', None)
+
+    @staticmethod
+    def _guardar_no_cache(dados):
+        if dados['erro'] is None and dados.get('chave'):
+            BoletimCache.guardar(dados['chave'], dados['conteudo'])
+
+    @classmethod
+    def renderizar(cls, alunos, workers=None):
+        """
+        Gera os boletins de uma lista de alunos
+
+        Args:
+            alunos: Iterável de instâncias de Aluno (idealmente com select_related
+                    da turma, tipo_turma e professor_responsavel)
+            workers: Tamanho do pool (padrão: workers_padrao()). Com 1 worker,
+                     ou um único aluno, renderiza no próprio processo.
+
+        Returns:
+            list: Um dict por aluno, na ordem recebida: 'aluno_id', 'nome', 'arquivo',
+                  'conteudo' (bytes do .docx ou None), 'erro' (None ou mensagem) e
+                  'em_cache' (servido do cache de boletins, sem renderizar)
+        """
+        return list(cls.renderizar_iter(alunos, workers=workers))
+
+    @classmethod
+    def renderizar_turma(cls, turma, workers=None, somente_completos=True):
+        """
+        Gera os boletins dos alunos ativos de uma turma (por padrão, só dos que
+        têm todas as notas lançadas)
+        """
+        from core.boletim_data import BoletimDataLoader
+        from core.progress import ProgressEngine
+
+        alunos = BoletimDataLoader.queryset_alunos(turma)
+        if somente_completos:
+            completude = ProgressEngine.completude_alunos(turma)
+            alunos = [aluno for aluno in alunos if completude[aluno.id]['completo']]
+        return cls.renderizar(alunos, workers=workers)
+
+
+class _SaidaZip:
+    """Destino de escrita do ZipFile que acumula os bytes até serem entregues"""
+
+    def __init__(self):
+        self._partes = []
+
+    def write(self, dados):
+        self._partes.append(bytes(dados))
+        return len(dados)
+
+    def flush(self):
+        pass
+
+    def esvaziar(self):
+        dados = b''.join(self._partes)
+        self._partes = []
+        return dados
+
+
+def stream_zip(arquivos):
+    """
+    Gera um arquivo ZIP em pedaços, um por arquivo, sem montar o ZIP em memória.
+
+    Args:
+        arquivos: Iterável de (nome, conteudo em bytes), consumido sob demanda
+
+    Yields:
+        bytes: O trecho do ZIP de cada arquivo e, ao final, o diretório central
+
+    Uso:
+        StreamingHttpResponse(stream_zip(arquivos), content_type='application/zip')
+    """
+    saida = _SaidaZip()
+    # Sem seek(): o zipfile escreve o ZIP sequencialmente
+    with zipfile.ZipFile(saida, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+        for nome, conteudo in arquivos:
+            zip_file.writestr(nome, conteudo)
+            yield saida.esvaziar()
+    yield saida.esvaziar()
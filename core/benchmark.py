@@ -0,0 +1,304 @@
+"""
+Benchmark da geração de boletins com turmas sintéticas
+
+Cria, dentro de uma transação que é desfeita no final, uma turma sintética por
+tipo de boletim e tamanho pedido (alunos com todas as notas lançadas) e mede:
+
+- template: carga do .docx (parse a frio) e clone do template em cache
+- etapas: busca dos dados, substituição, serialização e ZIP de uma turma,
+  cada etapa separada e no processo atual
+- individual: um boletim, do banco aos bytes do .docx
+- turma: todos os boletins de uma turma com o pool de processos + ZIP
+- escola: todas as turmas sintéticas num único lote + ZIP
+
+O resultado é um dict pronto para JSON (docs/segundo e pico de memória por
+cenário), para comparar execuções entre commits. O pico de memória é o das
+alocações Python do processo principal (tracemalloc), medido numa segunda
+execução do cenário para não distorcer os tempos; os workers do pool não entram.
+"""
+
+import io
+import os
+import platform
+import random
+import subprocess
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from core.batch import BoletimBatchRenderer, stream_zip
+from core.boletim_data import BoletimDataLoader
+from core.catalog import CompetenciaRegistry
+from core.models import Aluno, Competencia, LancamentoDeNota, Professor, TipoTurma, Turma
+from core.utils import BoletimGenerator
+
+# Formato do JSON gerado (incrementar se as chaves mudarem)
+VERSAO_FORMATO = 1
+
+
+class BoletimBenchmark:
+    """
+    Mede a vazão da geração de boletins
+
+    Uso:
+        resultado = BoletimBenchmark.executar(tamanhos=[5, 20], workers=2)
+        json.dump(resultado, arquivo)
+    """
+
+    TAMANHOS_PADRAO = (5, 20)
+    PREFIXO = 'BENCH'
+
+    @staticmethod
+    def _medir(funcao, memoria=True):
+        """
+        Executa a função cronometrada e, se pedido, de novo sob tracemalloc
+
+        Returns:
+            tuple: (retorno da primeira execução, segundos, pico de memória em MB ou None)
+        """
+        inicio = time.perf_counter()
+        retorno = funcao()
+        segundos = time.perf_counter() - inicio
+
+        pico = None
+        if memoria:
+            tracemalloc.start()
+            try:
+                funcao()
+                pico = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+            finally:
+                tracemalloc.stop()
+        return retorno, segundos, pico
+
+    @staticmethod
+    def _metricas(documentos, segundos, pico):
+        return {
+            'documentos': documentos,
+            'segundos': round(segundos, 4),
+            'docs_por_segundo': round(documentos / segundos, 2) if segundos > 0 else None,
+            'pico_memoria_mb': round(pico, 2) if pico is not None else None,
+        }
+
+    @staticmethod
+    def criar_turma(boletim_tipo, tamanho, professor, aleatorio):
+        """Turma sintética com `tamanho` alunos e todas as notas do boletim lançadas"""
+        prefixo = BoletimBenchmark.PREFIXO
+        tipo_turma, _ = TipoTurma.objects.get_or_create(nome=f'{prefixo} {boletim_tipo}')
+        turma = Turma.objects.create(
+            tipo_turma=tipo_turma,
+            identificador_turma=f'{prefixo}-{boletim_tipo}-{tamanho}',
+            professor_responsavel=professor,
+            boletim_tipo=boletim_tipo,
+        )
+        competencias = [
+            Competencia.objects.get_or_create(nome=nome, defaults={'tipo_nota': 'NUM'})[0]
+            for nome in Turma.COMPETENCIAS_POR_BOLETIM[boletim_tipo]
+        ]
+
+        alunos = Aluno.objects.bulk_create([
+            # Nomes únicos na escola: os arquivos do ZIP da escola não se repetem
+            Aluno(nome_completo=f'Aluno Sintético {turma.identificador_turma} {indice:04d}', turma=turma)
+            for indice in range(tamanho)
+        ])
+        notas = []
+        for aluno in alunos:
+            for competencia in competencias:
+                if competencia.tipo_nota == 'ABC':
+                    valor = aleatorio.choice('ABCD')
+                else:
+                    valor = str(aleatorio.randint(40, 100))
+                # bulk_create não chama save(): a coluna numérica é preenchida aqui
+                notas.append(LancamentoDeNota(
+                    aluno=aluno,
+                    competencia=competencia,
+                    nota_valor=valor,
+                    nota_numerica=LancamentoDeNota.converter_nota_numerica(valor, competencia.tipo_nota),
+                ))
+        LancamentoDeNota.objects.bulk_create(notas, batch_size=500)
+        return turma
+
+    @staticmethod
+    def medir_template(boletim_tipo, repeticoes=20):
+        """Parse a frio do template e clone a partir do cache (média de `repeticoes`)"""
+        def parse():
+            for _ in range(repeticoes):
+                BoletimGenerator.limpar_cache_templates()
+                BoletimGenerator._preparar_template(boletim_tipo)
+
+        def clone():
+            for _ in range(repeticoes):
+                BoletimGenerator._preparar_template(boletim_tipo)
+
+        _, frio, _ = BoletimBenchmark._medir(parse, memoria=False)
+        _, quente, _ = BoletimBenchmark._medir(clone, memoria=False)
+        return {
+            'parse_ms': round(frio / repeticoes * 1000, 2),
+            'clone_ms': round(quente / repeticoes * 1000, 2),
+        }
+
+    @staticmethod
+    def medir_etapas(turma):
+        """Tempo de cada etapa da geração dos boletins de uma turma, no processo atual"""
+        medir = BoletimBenchmark._medir
+
+        def buscar():
+            return [
+                (dados['aluno'], BoletimGenerator.montar_substituicoes(
+                    dados['aluno'], notas=dados['notas'], nota_final=dados['nota_final']
+                ))
+                for dados in BoletimDataLoader.carregar_turma(turma)
+            ]
+        lote, busca, pico_busca = medir(buscar)
+
+        def substituir():
+            return [
+                (aluno, BoletimGenerator.renderizar_boletim(turma.boletim_tipo, substituicoes))
+                for aluno, substituicoes in lote
+            ]
+        documentos, substituicao, pico_substituicao = medir(substituir)
+
+        def serializar():
+            arquivos = []
+            for aluno, documento in documentos:
+                buffer = io.BytesIO()
+                documento.save(buffer)
+                arquivos.append((BoletimBatchRenderer.nome_arquivo(aluno), buffer.getvalue()))
+            return arquivos
+        arquivos, serializacao, pico_serializacao = medir(serializar)
+
+        tamanho_zip, compactacao, pico_zip = medir(lambda: sum(len(pedaco) for pedaco in stream_zip(arquivos)))
+
+        total = busca + substituicao + serializacao + compactacao
+        picos = [pico for pico in (pico_busca, pico_substituicao, pico_serializacao, pico_zip) if pico is not None]
+        resultado = BoletimBenchmark._metricas(len(arquivos), total, max(picos) if picos else None)
+        resultado['etapas_ms'] = {
+            'busca_dados': round(busca * 1000, 2),
+            'substituicao': round(substituicao * 1000, 2),
+            'serializacao': round(serializacao * 1000, 2),
+            'zip': round(compactacao * 1000, 2),
+        }
+        resultado['bytes_zip'] = tamanho_zip
+        return resultado
+
+    @staticmethod
+    def medir_lote(alunos, workers):
+        """Geração com o BoletimBatchRenderer (pool de processos) + ZIP em streaming"""
+        def gerar():
+            arquivos = (
+                (resultado['arquivo'], resultado['conteudo'])
+                for resultado in BoletimBatchRenderer.renderizar_iter(alunos, workers=workers)
+                if resultado['erro'] is None
+            )
+            return sum(len(pedaco) for pedaco in stream_zip(arquivos))
+
+        tamanho_zip, segundos, pico = BoletimBenchmark._medir(gerar)
+        resultado = BoletimBenchmark._metricas(len(alunos), segundos, pico)
+        resultado['workers'] = workers
+        resultado['bytes_zip'] = tamanho_zip
+        return resultado
+
+    @staticmethod
+    def _commit():
+        try:
+            saida = subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'],
+                cwd=settings.BASE_DIR, capture_output=True, text=True, timeout=5,
+            )
+        except (OSError, subprocess.SubprocessError):
+            return None
+        return saida.stdout.strip() or None
+
+    @staticmethod
+    def executar(tamanhos=None, tipos=None, workers=None, repeticoes=20, semente=0, progresso=None):
+        """
+        Roda todos os cenários e desfaz os dados sintéticos no final
+
+        Args:
+            tamanhos: Quantidades de alunos por turma (padrão: TAMANHOS_PADRAO)
+            tipos: Tipos de boletim (padrão: todos os de TEMPLATE_MAP)
+            workers: Tamanho do pool nos cenários turma/escola (padrão: workers_padrao())
+            repeticoes: Cargas de template por tipo no cenário template
+            semente: Semente das notas aleatórias (execuções comparáveis)
+            progresso: Função opcional chamada com uma mensagem a cada cenário
+
+        Returns:
+            dict: Resultado pronto para json.dump
+        """
+        tamanhos = sorted(set(tamanhos or BoletimBenchmark.TAMANHOS_PADRAO))
+        tipos = list(tipos or BoletimGenerator.TEMPLATE_MAP)
+        workers = workers or BoletimBatchRenderer.workers_padrao()
+        avisar = progresso or (lambda mensagem: None)
+        aleatorio = random.Random(semente)
+
+        resultado = {
+            'versao_formato': VERSAO_FORMATO,
+            'commit': BoletimBenchmark._commit(),
+            'data': timezone.now().isoformat(),
+            'python': platform.python_version(),
+            'plataforma': platform.platform(),
+            'cpus': os.cpu_count(),
+            'workers': workers,
+            'tamanhos': tamanhos,
+            'tipos': tipos,
+            'cenarios': [],
+        }
+        cenarios = resultado['cenarios']
+
+        # Boletins em cache não seriam renderizados: o cache fica desligado durante a medição.
+        with override_settings(BOLETIM_CACHE_MAX_MB=0), transaction.atomic():
+            try:
+                usuario, _ = User.objects.get_or_create(username=f'{BoletimBenchmark.PREFIXO.lower()}_professor')
+                professor, _ = Professor.objects.get_or_create(user=usuario, defaults={'nome_completo': 'Professor Sintético'})
+
+                turmas = {}
+                for boletim_tipo in tipos:
+                    for tamanho in tamanhos:
+                        turmas[(boletim_tipo, tamanho)] = BoletimBenchmark.criar_turma(
+                            boletim_tipo, tamanho, professor, aleatorio
+                        )
+                CompetenciaRegistry.invalidar()
+
+                for boletim_tipo in tipos:
+                    avisar(f'template {boletim_tipo}')
+                    cenarios.append({'cenario': 'template', 'boletim_tipo': boletim_tipo,
+                                     **BoletimBenchmark.medir_template(boletim_tipo, repeticoes)})
+
+                # Pool já iniciado: o custo de subir os processos não entra nos cenários
+                BoletimBatchRenderer.renderizar(
+                    list(BoletimDataLoader.queryset_alunos(turmas[(tipos[0], tamanhos[0])])[:workers]),
+                    workers=workers,
+                )
+
+                for (boletim_tipo, tamanho), turma in turmas.items():
+                    alunos = list(BoletimDataLoader.queryset_alunos(turma))
+
+                    avisar(f'individual {boletim_tipo} ({tamanho} alunos)')
+                    if tamanho == tamanhos[0]:
+                        cenarios.append({'cenario': 'individual', 'boletim_tipo': boletim_tipo,
+                                         **BoletimBenchmark.medir_lote(alunos[:1], 1)})
+
+                    avisar(f'etapas {boletim_tipo} ({tamanho} alunos)')
+                    cenarios.append({'cenario': 'etapas', 'boletim_tipo': boletim_tipo, 'alunos': tamanho,
+                                     **BoletimBenchmark.medir_etapas(turma)})
+
+                    avisar(f'turma {boletim_tipo} ({tamanho} alunos)')
+                    cenarios.append({'cenario': 'turma', 'boletim_tipo': boletim_tipo, 'alunos': tamanho,
+                                     **BoletimBenchmark.medir_lote(alunos, workers)})
+
+                avisar('escola')
+                escola = []
+                for turma in turmas.values():
+                    escola.extend(BoletimDataLoader.queryset_alunos(turma))
+                cenarios.append({'cenario': 'escola', 'turmas': len(turmas), 'alunos': len(escola),
+                                 **BoletimBenchmark.medir_lote(escola, workers)})
+            finally:
+                # Nada do benchmark fica no banco
+                transaction.set_rollback(True)
+        CompetenciaRegistry.invalidar()
+
+        return resultado
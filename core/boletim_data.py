@@ -0,0 +1,107 @@
+"""
+Carregamento em lote dos dados dos boletins
+
+Aluno.get_notas_boletim() faz uma query por competência, e cada aluno ainda
+busca turma, tipo de turma e professor separadamente. Para gerar os boletins de
+uma turma inteira, BoletimDataLoader lê alunos, competências e notas com um
+número fixo de queries, independente do tamanho da turma, e entrega tudo em
+memória no mesmo formato de get_notas_boletim(), junto com a nota final de
+cada aluno (calculada para o lote inteiro numa só passada do NotaFinalEngine).
+"""
+
+from django.db.models import prefetch_related_objects
+
+from core.catalog import CompetenciaRegistry
+from core.grading import NotaFinalEngine
+from core.models import LancamentoDeNota
+
+
+class BoletimDataLoader:
+    """
+    Lê de uma vez os dados dos boletins de vários alunos
+
+    Uso:
+        for dados in BoletimDataLoader.carregar(alunos):
+            BoletimGenerator.montar_substituicoes(
+                dados['aluno'], notas=dados['notas'], nota_final=dados['nota_final']
+            )
+    """
+
+    # Relações usadas pelo boletim (nível, professor)
+    RELACOES_ALUNO = ('turma__tipo_turma', 'turma__professor_responsavel__user')
+
+    @staticmethod
+    def queryset_alunos(turma):
+        """Alunos ativos da turma, já com as relações do boletim, em ordem alfabética"""
+        return turma.alunos.filter(ativo=True).select_related(
+            *BoletimDataLoader.RELACOES_ALUNO
+        ).order_by('nome_completo', 'id')
+
+    @staticmethod
+    def competencias(boletim_tipo):
+        """Competências do boletim na ordem de Aluno.get_notas_boletim() (por nome)"""
+        return sorted(CompetenciaRegistry.competencias(boletim_tipo), key=lambda competencia: competencia.nome)
+
+    @staticmethod
+    def carregar(alunos):
+        """
+        Carrega as notas de todos os alunos (1 query para as notas, mais uma por
+        relação que ainda não veio com select_related)
+
+        Args:
+            alunos: Iterável de instâncias de Aluno
+
+        Returns:
+            list: Um dict por aluno, na ordem recebida, com 'aluno', 'notas'
+                  (lista no formato de Aluno.get_notas_boletim()) e 'nota_final'
+                  ((media, conceito), ver NotaFinalEngine.calcular_carregados)
+        """
+        alunos = list(alunos)
+        if not alunos:
+            return []
+        prefetch_related_objects(alunos, *BoletimDataLoader.RELACOES_ALUNO)
+
+        competencias_por_tipo = {}
+        for aluno in alunos:
+            boletim_tipo = aluno.turma.boletim_tipo
+            if boletim_tipo not in competencias_por_tipo:
+                competencias_por_tipo[boletim_tipo] = BoletimDataLoader.competencias(boletim_tipo)
+
+        ids_competencias = {
+            competencia.id
+            for competencias in competencias_por_tipo.values()
+            for competencia in competencias
+        }
+        lancamentos = {}
+        if ids_competencias:
+            linhas = LancamentoDeNota.objects.filter(
+                aluno__in=[aluno.id for aluno in alunos],
+                competencia_id__in=ids_competencias,
+            ).order_by().values_list('aluno_id', 'competencia_id', 'nota_valor', 'nota_numerica', 'data_lancamento')
+            for aluno_id, competencia_id, nota_valor, nota_numerica, data_lancamento in linhas:
+                lancamentos[(aluno_id, competencia_id)] = (nota_valor, nota_numerica, data_lancamento)
+
+        resultado = []
+        for aluno in alunos:
+            notas = []
+            for competencia in competencias_por_tipo[aluno.turma.boletim_tipo]:
+                nota_valor, nota_numerica, data_lancamento = lancamentos.get(
+                    (aluno.id, competencia.id), ('-', None, None)
+                )
+                notas.append({
+                    'competencia': competencia,
+                    'nota': nota_valor,
+                    'nota_numerica': nota_numerica,
+                    'data_lancamento': data_lancamento,
+                })
+            resultado.append({'aluno': aluno, 'notas': notas})
+
+        notas_finais = NotaFinalEngine.calcular_carregados(resultado)
+        for dados in resultado:
+            dados['nota_final'] = notas_finais[dados['aluno'].id]
+        return resultado
+
+    @staticmethod
+    def carregar_turma(turma):
+        """Dados dos boletins de todos os alunos ativos da turma"""
+        return BoletimDataLoader.carregar(BoletimDataLoader.queryset_alunos(turma))
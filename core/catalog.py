@@ -0,0 +1,105 @@
+"""
+Catálogo de competências por tipo de boletim
+
+O mapeamento boletim_tipo → competências fica na tabela CompetenciaBoletim
+(semeada a partir de Turma.COMPETENCIAS_POR_BOLETIM). O CompetenciaRegistry
+guarda esse mapeamento em memória, por processo, para que resolver as
+competências de uma turma custe no máximo uma query.
+"""
+
+import threading
+import time
+
+from django.db import transaction
+
+from core.models import Turma, Competencia, CompetenciaBoletim
+
+
+class CompetenciaRegistry:
+    """
+    Cache por processo do catálogo de competências (boletim_tipo → competências em ordem).
+    Invalidado pelos signals de Competencia/CompetenciaBoletim e pelo gerenciamento de
+    competências; o TTL limita o atraso de outros processos do servidor.
+    """
+
+    TTL_SEGUNDOS = 60
+
+    _lock = threading.Lock()
+    _carregado_em = None
+    _competencias = None
+
+    @classmethod
+    def _catalogo(cls):
+        """Retorna {boletim_tipo: [Competencia, ...]}, carregando o catálogo se preciso (1 query)"""
+        with cls._lock:
+            expirado = cls._carregado_em is None or time.monotonic() - cls._carregado_em > cls.TTL_SEGUNDOS
+            if expirado:
+                competencias = {}
+                linhas = CompetenciaBoletim.objects.select_related('competencia').order_by(
+                    'boletim_tipo', 'ordem', 'competencia__nome'
+                )
+                for linha in linhas:
+                    competencias.setdefault(linha.boletim_tipo, []).append(linha.competencia)
+                cls._competencias = competencias
+                cls._carregado_em = time.monotonic()
+            return cls._competencias
+
+    @classmethod
+    def invalidar(cls):
+        """
+        Descarta o catálogo em memória (recarregado no próximo acesso). Só vale para o
+        processo atual: os outros workers do servidor continuam com o catálogo que já
+        carregaram até o TTL_SEGUNDOS expirar.
+        """
+        with cls._lock:
+            cls._carregado_em = None
+            cls._competencias = None
+
+    @classmethod
+    def competencias(cls, boletim_tipo):
+        """Lista de Competencia do boletim, na ordem do catálogo"""
+        return list(cls._catalogo().get(boletim_tipo, []))
+
+    @classmethod
+    def ids(cls, boletim_tipo):
+        """IDs das competências do boletim, na ordem do catálogo"""
+        return [competencia.id for competencia in cls._catalogo().get(boletim_tipo, [])]
+
+    @classmethod
+    def mapa(cls):
+        """Retorna {boletim_tipo: [ids das competências]} de todos os boletins"""
+        return {
+            boletim_tipo: [competencia.id for competencia in competencias]
+            for boletim_tipo, competencias in cls._catalogo().items()
+        }
+
+    @staticmethod
+    def sincronizar_competencia(competencia):
+        """
+        Ajusta as linhas do catálogo de uma competência conforme seu nome
+        (usado quando a competência é criada ou renomeada)
+        """
+        esperado = {
+            boletim_tipo: nomes.index(competencia.nome)
+            for boletim_tipo, nomes in Turma.COMPETENCIAS_POR_BOLETIM.items()
+            if competencia.nome in nomes
+        }
+        with transaction.atomic():
+            CompetenciaBoletim.objects.filter(competencia=competencia).exclude(
+                boletim_tipo__in=list(esperado)
+            ).delete()
+            for boletim_tipo, ordem in esperado.items():
+                CompetenciaBoletim.objects.update_or_create(
+                    boletim_tipo=boletim_tipo,
+                    competencia=competencia,
+                    defaults={'ordem': ordem}
+                )
+        CompetenciaRegistry.invalidar()
+
+    @staticmethod
+    def sincronizar():
+        """Reconstrói todo o catálogo a partir de Turma.COMPETENCIAS_POR_BOLETIM"""
+        with transaction.atomic():
+            for competencia in Competencia.objects.all():
+                CompetenciaRegistry.sincronizar_competencia(competencia)
+        CompetenciaRegistry.invalidar()
@@ -0,0 +1,120 @@
+"""
+GET condicional (ETag/Last-Modified) baseado na versão dos dados do Sistema de Notas
+
+A versão dos dados é derivada da última escrita (e da contagem de linhas, para
+detectar exclusões) de LancamentoDeNota, Aluno e Turma e dos cadastros cujos
+nomes aparecem nas páginas (Competencia, CompetenciaBoletim, Professor e TipoTurma). Views que optam pelo
+decorator conditional_on_data_version respondem 304 Not Modified sem executar
+a view quando nada mudou desde a última visita do navegador.
+"""
+
+import hashlib
+from functools import wraps
+
+from django.contrib.messages import get_messages
+from django.db.models import Count, Max, Value
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+from core.models import Turma, Aluno, LancamentoDeNota, Competencia, CompetenciaBoletim, Professor, TipoTurma
+
+
+class DataVersion:
+    """
+    Calcula a versão atual dos dados de notas (uma única query agregada)
+    """
+
+    MODELOS = (LancamentoDeNota, Aluno, Turma, Competencia, CompetenciaBoletim, Professor, TipoTurma)
+
+    @staticmethod
+    def atual():
+        """
+        Lê a versão de todos os modelos numa única query (UNION ALL dos agregados)
+
+        Returns:
+            dict: 'componentes' (última escrita e total de linhas por modelo) e
+                  'ultima_alteracao' (datetime da escrita mais recente ou None)
+        """
+        consultas = [
+            modelo.objects.order_by().values(modelo_nome=Value(modelo._meta.model_name)).annotate(
+                ultima=Max('data_atualizacao'), total=Count('pk')
+            ).values_list('modelo_nome', 'ultima', 'total')
+            for modelo in DataVersion.MODELOS
+        ]
+        # Tabela vazia não gera linha no GROUP BY: fica (None, 0), como no aggregate()
+        por_modelo = {
+            modelo_nome: (ultima, total)
+            for modelo_nome, ultima, total in consultas[0].union(*consultas[1:], all=True)
+        }
+
+        componentes = []
+        ultimas = []
+        for modelo in DataVersion.MODELOS:
+            ultima, total = por_modelo.get(modelo._meta.model_name, (None, 0))
+            componentes.append((modelo._meta.model_name, ultima, total))
+            if ultima is not None:
+                ultimas.append(ultima)
+
+        return {
+            'componentes': componentes,
+            'ultima_alteracao': max(ultimas) if ultimas else None,
+        }
+
+    @staticmethod
+    def etag(request, versao, extras=()):
+        """
+        Gera o ETag da resposta: versão dos dados + usuário + dia atual (widgets de prazo)
+        + token CSRF (muda no login) + valores extras da view
+        """
+        partes = [
+            repr(versao['componentes']),
+            str(request.user.pk),
+            timezone.localdate().isoformat(),
+            request.META.get('CSRF_COOKIE', ''),
+            request.get_full_path(),
+        ]
+        partes.extend(repr(extra) for extra in extras)
+        return quote_etag(hashlib.sha1('|'.join(partes).encode('utf-8')).hexdigest())
+
+
+def conditional_on_data_version(extra=None):
+    """
+    Decorator que adiciona ETag/Last-Modified à view e responde 304 quando o
+    navegador já tem a versão atual dos dados.
+
+    Args:
+        extra: Função opcional extra(request) que retorna valores adicionais
+               dos quais a resposta depende (ex: preferências, snapshots)
+
+    Uso (sempre abaixo dos decorators de autenticação):
+        @coordinador_or_admin
+        @conditional_on_data_version()
+        def minha_view(request): ...
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            # Mensagens pendentes só aparecem se a página for renderizada de novo
+            if request.method not in ('GET', 'HEAD') or len(get_messages(request)):
+                return view_func(request, *args, **kwargs)
+
+            versao = DataVersion.atual()
+            etag = DataVersion.etag(request, versao, extra(request) if extra else ())
+            last_modified = None
+            if versao['ultima_alteracao'] is not None:
+                last_modified = int(versao['ultima_alteracao'].timestamp())
+
+            response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if response is None:
+                response = view_func(request, *args, **kwargs)
+
+            if response.status_code in (200, 304):
+                response.headers.setdefault('ETag', etag)
+                if last_modified is not None:
+                    response.headers.setdefault('Last-Modified', http_date(last_modified))
+                # Páginas por usuário: o navegador guarda, mas sempre revalida
+                patch_cache_control(response, private=True, no_cache=True)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,302 @@
+"""
+Exportação dos boletins da escola inteira (ou de um filtro) para MEDIA_ROOT
+
+Cada turma é renderizada numa pasta temporária e movida para o lugar final de uma
+vez só; o progresso fica gravado em ExportacaoTurma. Se o processo cair no meio,
+a exportação é retomada a partir da primeira turma não concluída. Ao final, as
+pastas das turmas são reunidas num ZIP com um manifesto.json.
+
+Estrutura em MEDIA_ROOT/boletins/exportacoes/<id>/:
+    <Tipo de Turma>/<identificador da turma>_<id da turma>/boletim_<Aluno>_<id do aluno>.docx
+    boletins_exportacao_<id>.zip
+"""
+
+import json
+import logging
+import os
+import shutil
+import threading
+import zipfile
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.text import get_valid_filename
+
+from core.batch import BoletimBatchRenderer
+from core.boletim_data import BoletimDataLoader
+from core.progress import ProgressEngine
+from core.models import Turma, ExportacaoBoletins, ExportacaoTurma
+
+logger = logging.getLogger(__name__)
+
+
+class ExportacaoService:
+    """
+    Cria, executa e retoma exportações de boletins
+    """
+
+    # Uma exportação EXECUTANDO sem sinal de vida há mais que isso é considerada interrompida
+    EXPIRACAO_EXECUCAO = timedelta(minutes=10)
+
+    @staticmethod
+    def filtrar_turmas(tipo_turma=None, professor=None, unidade=''):
+        """
+        Turmas incluídas numa exportação. A unidade segue a mesma regra do dashboard
+        administrativo: professores 'lidia' ou terminados em 'nf' são de Nova Friburgo,
+        terminados em 'rb' de Rio Bonito.
+        """
+        turmas = Turma.objects.select_related('tipo_turma').order_by('tipo_turma__nome', 'identificador_turma', 'id')
+        if tipo_turma is not None:
+            turmas = turmas.filter(tipo_turma=tipo_turma)
+        if professor is not None:
+            turmas = turmas.filter(professor_responsavel=professor)
+        if unidade == 'NF':
+            turmas = turmas.filter(
+                Q(professor_responsavel__user__username='lidia')
+                | Q(professor_responsavel__user__username__endswith='nf')
+            )
+        elif unidade == 'RB':
+            turmas = turmas.filter(professor_responsavel__user__username__endswith='rb')
+        return turmas
+
+    @staticmethod
+    def criar(usuario=None, tipo_turma=None, professor=None, unidade=''):
+        """
+        Registra uma exportação e a lista de turmas que ela vai percorrer
+
+        Returns:
+            ExportacaoBoletins: Exportação PENDENTE (ainda não executada)
+        """
+        turmas = ExportacaoService.filtrar_turmas(tipo_turma, professor, unidade)
+        with transaction.atomic():
+            exportacao = ExportacaoBoletins.objects.create(
+                criado_por=usuario,
+                tipo_turma=tipo_turma,
+                professor=professor,
+                unidade=unidade,
+            )
+            ExportacaoTurma.objects.bulk_create([
+                ExportacaoTurma(exportacao=exportacao, turma=turma, ordem=ordem)
+                for ordem, turma in enumerate(turmas)
+            ])
+        return exportacao
+
+    @staticmethod
+    def pode_retomar(exportacao):
+        """Exportação parada: pendente, com erro ou executando sem sinal de vida"""
+        if exportacao.status in ('PENDENTE', 'ERRO'):
+            return True
+        if exportacao.status == 'EXECUTANDO':
+            return exportacao.data_atualizacao < timezone.now() - ExportacaoService.EXPIRACAO_EXECUCAO
+        return False
+
+    @staticmethod
+    def _reservar(exportacao_id):
+        """
+        Marca a exportação como EXECUTANDO se ela puder ser (re)iniciada.
+        O UPDATE condicional impede duas execuções simultâneas da mesma exportação.
+        """
+        agora = timezone.now()
+        parada = Q(status__in=['PENDENTE', 'ERRO']) | Q(
+            status='EXECUTANDO',
+            data_atualizacao__lt=agora - ExportacaoService.EXPIRACAO_EXECUCAO,
+        )
+        reservada = ExportacaoBoletins.objects.filter(parada, pk=exportacao_id).update(
+            status='EXECUTANDO',
+            erro='',
+            data_atualizacao=agora,
+        )
+        if reservada:
+            ExportacaoBoletins.objects.filter(pk=exportacao_id, data_inicio__isnull=True).update(data_inicio=agora)
+        return bool(reservada)
+
+    @staticmethod
+    def _caminho(*partes):
+        return os.path.join(settings.MEDIA_ROOT, *partes)
+
+    @staticmethod
+    def pasta_turma(turma):
+        """
+        Pasta da turma dentro da exportação: <Tipo de Turma>/<identificador>_<id>.
+        O id garante uma pasta por turma mesmo com identificadores repetidos (ou que
+        ficam iguais depois de get_valid_filename) em turmas sem tipo.
+        """
+        tipo = turma.tipo_turma.nome if turma.tipo_turma else 'Sem_Tipo'
+        return os.path.join(
+            get_valid_filename(tipo),
+            get_valid_filename(f"{turma.identificador_turma}_{turma.pk}"),
+        )
+
+    @staticmethod
+    def executar(exportacao_id, workers=None):
+        """
+        Executa (ou retoma) uma exportação. Turmas já concluídas são puladas.
+
+        Returns:
+            bool: True se a exportação terminou, False se não pôde ser iniciada ou falhou
+        """
+        if not ExportacaoService._reservar(exportacao_id):
+            logger.info(f"Exportação #{exportacao_id} já está em execução ou concluída")
+            return False
+
+        exportacao = ExportacaoBoletins.objects.get(pk=exportacao_id)
+        item = None
+        try:
+            pendentes = exportacao.turmas.exclude(status='CONCLUIDA').select_related('turma__tipo_turma')
+            for item in pendentes:
+                ExportacaoService._exportar_turma(exportacao, item, workers)
+                item = None
+                # Sinal de vida: data_atualizacao (auto_now) avança a cada turma
+                exportacao.save(update_fields=['data_atualizacao'])
+
+            exportacao.arquivo = ExportacaoService._montar_arquivo(exportacao)
+            exportacao.status = 'CONCLUIDA'
+            exportacao.data_conclusao = timezone.now()
+            exportacao.save(update_fields=['arquivo', 'status', 'data_conclusao', 'data_atualizacao'])
+            logger.info(f"Exportação #{exportacao.pk} concluída: {exportacao.arquivo}")
+            return True
+        except Exception as e:
+            logger.exception(f"Erro na exportação #{exportacao.pk}")
+            if item is not None:
+                item.status = 'ERRO'
+                item.save(update_fields=['status'])
+            exportacao.status = 'ERRO'
+            exportacao.erro = str(e)
+            exportacao.save(update_fields=['status', 'erro', 'data_atualizacao'])
+            return False
+
+    @staticmethod
+    def _exportar_turma(exportacao, item, workers=None):
+        """Renderiza os boletins de uma turma numa pasta temporária e a publica de uma vez"""
+        turma = item.turma
+        destino = ExportacaoService._caminho(exportacao.pasta, ExportacaoService.pasta_turma(turma))
+        temporaria = ExportacaoService._caminho(exportacao.pasta, '.tmp', str(turma.pk))
+
+        # Sobras de uma execução interrompida desta mesma turma
+        shutil.rmtree(temporaria, ignore_errors=True)
+        os.makedirs(temporaria)
+
+        alunos = BoletimDataLoader.queryset_alunos(turma)
+        completude = ProgressEngine.completude_alunos(turma)
+        completos = []
+        falhas = []
+        for aluno in alunos:
+            if completude[aluno.id]['completo']:
+                completos.append(aluno)
+            else:
+                falhas.append({'aluno': aluno.nome_completo, 'erro': 'Notas incompletas'})
+
+        gerados = 0
+        for resultado in BoletimBatchRenderer.renderizar_iter(completos, workers=workers):
+            if resultado['erro'] is not None:
+                falhas.append({'aluno': resultado['nome'], 'erro': resultado['erro']})
+                continue
+            with open(os.path.join(temporaria, resultado['arquivo']), 'wb') as arquivo:
+                arquivo.write(resultado['conteudo'])
+            gerados += 1
+
+        # destino é desta exportação e desta turma: se já existe, é sobra de uma execução
+        # interrompida entre o rename e a gravação do status (turma ainda não CONCLUIDA)
+        shutil.rmtree(destino, ignore_errors=True)
+        os.makedirs(os.path.dirname(destino), exist_ok=True)
+        os.rename(temporaria, destino)
+
+        item.status = 'CONCLUIDA'
+        item.total_alunos = len(alunos)
+        item.boletins_gerados = gerados
+        item.falhas = falhas
+        item.data_conclusao = timezone.now()
+        item.save(update_fields=['status', 'total_alunos', 'boletins_gerados', 'falhas', 'data_conclusao'])
+
+    @staticmethod
+    def _montar_arquivo(exportacao):
+        """
+        Reúne as pastas das turmas num ZIP com manifesto.json
+
+        Returns:
+            str: Caminho do ZIP relativo a MEDIA_ROOT
+        """
+        relativo = f"{exportacao.pasta}/boletins_exportacao_{exportacao.pk}.zip"
+        caminho = ExportacaoService._caminho(relativo)
+        temporario = caminho + '.tmp'
+
+        manifesto = {
+            'exportacao': exportacao.pk,
+            'gerado_em': timezone.now().isoformat(),
+            'filtros': {
+                'tipo_turma': exportacao.tipo_turma.nome if exportacao.tipo_turma else None,
+                'professor': exportacao.professor.user.username if exportacao.professor else None,
+                'unidade': exportacao.unidade or None,
+            },
+            'turmas': [],
+        }
+
+        with zipfile.ZipFile(temporario, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+            for item in exportacao.turmas.select_related('turma__tipo_turma').order_by('ordem'):
+                pasta = ExportacaoService.pasta_turma(item.turma)
+                pasta_absoluta = ExportacaoService._caminho(exportacao.pasta, pasta)
+                arquivos = sorted(os.listdir(pasta_absoluta)) if os.path.isdir(pasta_absoluta) else []
+                for nome in arquivos:
+                    zip_file.write(os.path.join(pasta_absoluta, nome), f"{pasta}/{nome}".replace(os.sep, '/'))
+                manifesto['turmas'].append({
+                    'turma': item.turma.nome,
+                    'pasta': pasta.replace(os.sep, '/'),
+                    'total_alunos': item.total_alunos,
+                    'boletins_gerados': item.boletins_gerados,
+                    'falhas': item.falhas,
+                })
+            zip_file.writestr('manifesto.json', json.dumps(manifesto, ensure_ascii=False, indent=2))
+
+        os.replace(temporario, caminho)
+        shutil.rmtree(ExportacaoService._caminho(exportacao.pasta, '.tmp'), ignore_errors=True)
+        return relativo
+
+    @staticmethod
+    def iniciar_em_background(exportacao_id, workers=None):
+        """
+        Executa a exportação numa thread separada, fora do ciclo do request.
+        Se o servidor reiniciar no meio, a exportação fica parada e pode ser retomada
+        pela página de status ou pelo comando exportar_boletins --retomar.
+        """
+        def rodar():
+            close_old_connections()
+            try:
+                ExportacaoService.executar(exportacao_id, workers=workers)
+            finally:
+                connections.close_all()
+
+        thread = threading.Thread(target=rodar, name=f'exportacao-boletins-{exportacao_id}', daemon=True)
+        thread.start()
+        return thread
+
+    @staticmethod
+    def status(exportacao):
+        """Dados de progresso da exportação (usados pela página de status)"""
+        turmas = list(exportacao.turmas.select_related('turma__tipo_turma').order_by('ordem'))
+        concluidas = sum(1 for item in turmas if item.status == 'CONCLUIDA')
+        return {
+            'id': exportacao.pk,
+            'status': exportacao.status,
+            'status_display': exportacao.get_status_display(),
+            'erro': exportacao.erro,
+            'pode_retomar': ExportacaoService.pode_retomar(exportacao),
+            'total_turmas': len(turmas),
+            'turmas_concluidas': concluidas,
+            'percentual': round(concluidas / len(turmas) * 100) if turmas else 100,
+            'boletins_gerados': sum(item.boletins_gerados for item in turmas),
+            'arquivo_disponivel': exportacao.status == 'CONCLUIDA' and bool(exportacao.arquivo),
+            'turmas': [
+                {
+                    'turma': item.turma.nome,
+                    'status': item.status,
+                    'status_display': item.get_status_display(),
+                    'total_alunos': item.total_alunos,
+                    'boletins_gerados': item.boletins_gerados,
+                    'falhas': item.falhas,
+                }
+                for item in turmas
+            ],
+        }
@@ -0,0 +1,301 @@
+"""
+Cálculo vetorizado da nota final dos boletins
+
+As notas de todos os alunos (de uma turma, de um filtro ou da escola toda) são
+lidas numa única query e montadas numa matriz aluno × competência com pandas; a
+nota final de todos os alunos sai de uma só passada com NumPy:
+
+- adolescentes_adultos: Produção Oral (40%) + Produção Escrita (40%) +
+  Avaliações de Progresso (20%); sem as avaliações, média simples das duas
+  produções; sem as duas produções, N/A
+- material_antigo: média simples de todas as notas do boletim
+
+Conceitos (A/B/C/D) entram no cálculo pela tabela CONCEITO_PARA_NUMERO e a
+média volta a ser conceito pelos limites de LIMITES_CONCEITO. Os demais tipos
+de boletim não têm nota final.
+"""
+
+import numpy as np
+import pandas as pd
+
+from core.catalog import CompetenciaRegistry
+from core.models import Aluno, LancamentoDeNota
+
+
+class NotaFinalEngine:
+    """
+    Calcula a nota final de muitos alunos de uma vez
+
+    Uso:
+        resultado = NotaFinalEngine.calcular(turmas=Turma.objects.all())
+        resultado.loc[aluno.id, 'nota_final']  # 'A', 'B', 'C', 'D' ou 'N/A'
+    """
+
+    # Valor de cada conceito no cálculo da nota final
+    CONCEITO_PARA_NUMERO = {
+        'A': 95,  # 100-90%
+        'B': 82,  # 89-75%
+        'C': 67,  # 74-60%
+        'D': 50,  # 59% ou menos
+    }
+
+    # Média mínima de cada conceito (abaixo do último: D)
+    LIMITES_CONCEITO = [(90, 'A'), (75, 'B'), (60, 'C')]
+
+    PESOS_ADOLESCENTES_ADULTOS = {
+        'producao_oral': 0.4,
+        'producao_escrita': 0.4,
+        'avaliacoes_de_progresso': 0.2,
+    }
+
+    TIPOS_COM_NOTA_FINAL = ('adolescentes_adultos', 'material_antigo')
+
+    SEM_NOTA = 'N/A'
+
+    @staticmethod
+    def _catalogo():
+        """
+        Competências de cada tipo de boletim com nota final, com o nome já
+        normalizado (chave) e se são de conceito (ABC)
+        """
+        from core.utils import BoletimGenerator
+
+        linhas = []
+        for boletim_tipo in NotaFinalEngine.TIPOS_COM_NOTA_FINAL:
+            for competencia in CompetenciaRegistry.competencias(boletim_tipo):
+                linhas.append((
+                    boletim_tipo,
+                    competencia.id,
+                    BoletimGenerator._normalizar_nome_competencia(competencia.nome),
+                    competencia.tipo_nota == 'ABC',
+                ))
+        return pd.DataFrame(linhas, columns=['boletim_tipo', 'competencia_id', 'chave', 'conceito']).astype(
+            {'competencia_id': 'int64', 'conceito': bool}
+        )
+
+    @staticmethod
+    def _frame_notas(linhas):
+        """DataFrame de notas (aluno_id, competencia_id, nota_numerica) com tipos fixos, mesmo vazio"""
+        return pd.DataFrame(linhas, columns=['aluno_id', 'competencia_id', 'nota_numerica']).astype(
+            {'aluno_id': 'int64', 'competencia_id': 'int64', 'nota_numerica': 'float64'}
+        )
+
+    @staticmethod
+    def matriz(alunos=None, turmas=None):
+        """
+        Lê as notas do banco (2 queries, independente da quantidade de alunos)
+
+        Args:
+            alunos: Queryset/lista de Aluno ou de IDs
+            turmas: Queryset/lista de Turma (ignorado se alunos for informado).
+                    Sem nenhum dos dois, todos os alunos ativos da escola.
+
+        Returns:
+            tuple: (DataFrame de alunos com 'aluno_id' e 'boletim_tipo',
+                    DataFrame de notas com 'aluno_id', 'competencia_id', 'nota_numerica')
+        """
+        if alunos is not None:
+            ids = [aluno if isinstance(aluno, int) else aluno.pk for aluno in alunos]
+            filtro = {'pk__in': ids}
+        elif turmas is not None:
+            filtro = {'turma__in': turmas, 'ativo': True}
+        else:
+            filtro = {'ativo': True}
+
+        alunos_df = pd.DataFrame(
+            list(Aluno.objects.filter(**filtro).order_by().values_list('id', 'turma__boletim_tipo')),
+            columns=['aluno_id', 'boletim_tipo'],
+        )
+        notas_df = NotaFinalEngine._frame_notas(list(
+            LancamentoDeNota.objects.filter(
+                nota_numerica__isnull=False,
+                **{f'aluno__{campo}': valor for campo, valor in filtro.items()}
+            ).order_by().values_list('aluno_id', 'competencia_id', 'nota_numerica')
+        ))
+        return alunos_df, notas_df
+
+    @staticmethod
+    def para_conceito(medias):
+        """Converte um array de médias em conceitos (NaN → N/A)"""
+        medias = np.asarray(medias, dtype=float)
+        condicoes = [medias >= limite for limite, _ in NotaFinalEngine.LIMITES_CONCEITO]
+        conceitos = [conceito for _, conceito in NotaFinalEngine.LIMITES_CONCEITO]
+        return np.select(
+            condicoes + [~np.isnan(medias)],
+            conceitos + ['D'],
+            default=NotaFinalEngine.SEM_NOTA,
+        )
+
+    @staticmethod
+    def calcular_matriz(alunos_df, notas_df, catalogo=None):
+        """
+        Nota final de todos os alunos, numa só passada
+
+        Returns:
+            DataFrame indexado por aluno_id, com 'boletim_tipo', 'media'
+            (NaN quando não há notas suficientes) e 'nota_final' (conceito,
+            'N/A' sem notas suficientes ou None nos boletins sem nota final)
+        """
+        engine = NotaFinalEngine
+        catalogo = engine._catalogo() if catalogo is None else catalogo
+
+        resultado = alunos_df.set_index('aluno_id')[['boletim_tipo']].copy()
+        resultado['media'] = np.nan
+
+        # Só entram as notas das competências do boletim do aluno
+        notas = notas_df.merge(resultado[['boletim_tipo']], left_on='aluno_id', right_index=True)
+        notas = notas.merge(catalogo, on=['boletim_tipo', 'competencia_id'])
+        # Competências ABC guardam o ordinal do conceito em nota_numerica
+        ordinal_para_numero = {
+            ordinal: engine.CONCEITO_PARA_NUMERO[conceito]
+            for conceito, ordinal in LancamentoDeNota.CONCEITO_ORDINAL.items()
+        }
+        notas['valor'] = notas['nota_numerica'].where(
+            ~notas['conceito'],
+            notas['nota_numerica'].map(ordinal_para_numero),
+        )
+        notas = notas.dropna(subset=['valor'])
+
+        # material_antigo: média simples
+        simples = notas[notas['boletim_tipo'] == 'material_antigo']
+        medias_simples = simples.groupby('aluno_id')['valor'].mean()
+        resultado.loc[medias_simples.index, 'media'] = medias_simples
+
+        # adolescentes_adultos: 40/40/20 (ou 50/50 sem as avaliações de progresso)
+        ponderadas = notas[notas['boletim_tipo'] == 'adolescentes_adultos']
+        colunas = list(engine.PESOS_ADOLESCENTES_ADULTOS)
+        if not ponderadas.empty:
+            grade = ponderadas.pivot_table(
+                index='aluno_id', columns='chave', values='valor', aggfunc='last'
+            ).reindex(columns=colunas)
+            oral, escrita, avaliacoes = (grade[coluna].to_numpy(dtype=float) for coluna in colunas)
+            pesos = engine.PESOS_ADOLESCENTES_ADULTOS
+            media = np.where(
+                np.isnan(avaliacoes),
+                (oral + escrita) / 2,
+                (oral * pesos['producao_oral']) + (escrita * pesos['producao_escrita'])
+                + (avaliacoes * pesos['avaliacoes_de_progresso']),
+            )
+            resultado.loc[grade.index, 'media'] = media
+
+        tem_nota_final = resultado['boletim_tipo'].isin(engine.TIPOS_COM_NOTA_FINAL).to_numpy()
+        resultado['nota_final'] = np.where(
+            tem_nota_final,
+            engine.para_conceito(resultado['media'].to_numpy(dtype=float)),
+            None,
+        )
+        return resultado
+
+    @staticmethod
+    def calcular(alunos=None, turmas=None):
+        """Lê as notas e calcula a nota final (ver matriz() e calcular_matriz())"""
+        alunos_df, notas_df = NotaFinalEngine.matriz(alunos=alunos, turmas=turmas)
+        return NotaFinalEngine.calcular_matriz(alunos_df, notas_df)
+
+    @staticmethod
+    def calcular_carregados(carregados):
+        """
+        Nota final dos alunos já carregados por BoletimDataLoader, numa só passada
+        de calcular_matriz (sem nova consulta ao banco)
+
+        Args:
+            carregados: Lista de dicts com 'aluno' e 'notas' (formato de Aluno.get_notas_boletim())
+
+        Returns:
+            dict: {aluno_id: (media ou None, conceito)}; (None, None) nos boletins sem nota final
+        """
+        engine = NotaFinalEngine
+        resultado = {dados['aluno'].id: (None, None) for dados in carregados}
+        com_nota_final = [
+            dados for dados in carregados if dados['aluno'].turma.boletim_tipo in engine.TIPOS_COM_NOTA_FINAL
+        ]
+        if not com_nota_final:
+            return resultado
+
+        alunos_df = pd.DataFrame(
+            [(dados['aluno'].id, dados['aluno'].turma.boletim_tipo) for dados in com_nota_final],
+            columns=['aluno_id', 'boletim_tipo'],
+        )
+        notas_df = engine._frame_notas([
+            (dados['aluno'].id, nota_info['competencia'].id, nota_info['nota_numerica'])
+            for dados in com_nota_final
+            for nota_info in dados['notas']
+            if nota_info.get('competencia') is not None and nota_info.get('nota_numerica') is not None
+        ])
+        calculado = engine.calcular_matriz(alunos_df, notas_df)
+        for aluno_id, media, nota_final in zip(calculado.index, calculado['media'], calculado['nota_final']):
+            resultado[aluno_id] = (None if pd.isna(media) else float(media), nota_final)
+        return resultado
+
+    @staticmethod
+    def conceito(media):
+        """Converte uma média em conceito (None → N/A), versão escalar de para_conceito()"""
+        if media is None:
+            return NotaFinalEngine.SEM_NOTA
+        for limite, conceito in NotaFinalEngine.LIMITES_CONCEITO:
+            if media >= limite:
+                return conceito
+        return 'D'
+
+    @staticmethod
+    def calcular_de_notas(boletim_tipo, notas_list, aluno_id=0):
+        """
+        Nota final de um aluno cujas notas já foram carregadas (Aluno.get_notas_boletim),
+        sem nova consulta ao banco. Mesmas regras de calcular_matriz(), em Python puro:
+        para um único aluno, montar os DataFrames custa mais do que o cálculo.
+
+        Returns:
+            tuple: (media ou None, conceito) ou (None, None) se o boletim não tem nota final
+        """
+        from core.utils import BoletimGenerator
+
+        engine = NotaFinalEngine
+        if boletim_tipo not in engine.TIPOS_COM_NOTA_FINAL:
+            return None, None
+
+        catalogo = {
+            competencia.id: (
+                BoletimGenerator._normalizar_nome_competencia(competencia.nome),
+                competencia.tipo_nota == 'ABC',
+            )
+            for competencia in CompetenciaRegistry.competencias(boletim_tipo)
+        }
+        ordinal_para_numero = {
+            ordinal: engine.CONCEITO_PARA_NUMERO[conceito]
+            for conceito, ordinal in LancamentoDeNota.CONCEITO_ORDINAL.items()
+        }
+
+        # {chave: valor}: vale a última nota de cada competência, como no pivot_table
+        valores = []
+        por_chave = {}
+        for nota_info in notas_list:
+            competencia = nota_info.get('competencia')
+            nota_numerica = nota_info.get('nota_numerica')
+            if competencia is None or nota_numerica is None or competencia.id not in catalogo:
+                continue
+            chave, conceito = catalogo[competencia.id]
+            valor = ordinal_para_numero.get(nota_numerica) if conceito else nota_numerica
+            if valor is None:
+                continue
+            valores.append(valor)
+            por_chave[chave] = valor
+
+        if boletim_tipo == 'material_antigo':
+            media = sum(valores) / len(valores) if valores else None
+        else:
+            pesos = engine.PESOS_ADOLESCENTES_ADULTOS
+            oral = por_chave.get('producao_oral')
+            escrita = por_chave.get('producao_escrita')
+            avaliacoes = por_chave.get('avaliacoes_de_progresso')
+            if oral is None or escrita is None:
+                media = None
+            elif avaliacoes is None:
+                media = (oral + escrita) / 2
+            else:
+                media = (
+                    (oral * pesos['producao_oral']) + (escrita * pesos['producao_escrita'])
+                    + (avaliacoes * pesos['avaliacoes_de_progresso'])
+                )
+
+        media = None if media is None else float(media)
+        return media, engine.conceito(media)
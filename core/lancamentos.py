@@ -0,0 +1,458 @@
+"""
+Gravação em lote dos lançamentos de notas
+
+A tela de lançamento por aluno gravava uma competência por vez (update_or_create:
+SELECT + INSERT/UPDATE por nota, mais um AuditLog de texto livre por nota).
+LancamentoService recebe de uma vez as células de um aluno ou de uma turma
+inteira (aluno × competência), valida todas com DataValidator.validate_nota_valor,
+compara com as notas já gravadas e grava só o que mudou, com operações em lote
+dentro de uma transação. Cada envio gera um único AuditLog com as células
+alteradas (valor anterior e novo) em detalhes_json.
+
+O autosave grava uma célula por vez com controle de concorrência otimista: o
+UPDATE só acontece se a versão da nota no banco for a que o cliente leu; senão
+a gravação é recusada como conflito (sem locks). A sincronização do modo
+offline aplica do mesmo jeito, célula a célula, os lotes de alterações guardados
+no aparelho do professor.
+"""
+
+from django.db import IntegrityError, transaction
+from django.db.models import Case, F, Q, Value, When
+from django.utils import timezone
+
+from core.logging_utils import SimpleLogger
+from core.models import LancamentoDeNota, Turma
+from core.progress import ProgressStore
+from core.utils import DataValidator
+
+
+class LancamentoService:
+    """
+    Valida e grava as notas de vários alunos/competências de uma turma
+
+    Uso:
+        resultado = LancamentoService.salvar_grade(turma, [
+            {'aluno': 12, 'competencia': 3, 'valor': '85'},
+            {'aluno': 12, 'competencia': 4, 'valor': 'b'},
+        ])
+        if resultado['erros']:
+            ...  # nada foi gravado
+    """
+
+    # Tamanho máximo de nota_valor no banco
+    TAMANHO_MAXIMO_NOTA = LancamentoDeNota._meta.get_field('nota_valor').max_length
+
+    @staticmethod
+    def _inteiro(valor):
+        """ID recebido do formulário/JSON como int (ou None se inválido)"""
+        try:
+            return int(valor)
+        except (TypeError, ValueError):
+            return None
+
+    @staticmethod
+    def validar_celulas(celulas, alunos_ids, competencias):
+        """
+        Valida as células enviadas pela grade
+
+        Células com valor vazio são ignoradas (como na tela por aluno, nota vazia
+        não apaga a nota existente). Se a mesma célula vier repetida, vale a última.
+
+        Args:
+            celulas: Iterável de dicts com 'aluno', 'competencia' e 'valor'
+            alunos_ids: IDs dos alunos que podem receber nota
+            competencias: Dict {competencia_id: Competencia} das competências aceitas
+
+        Returns:
+            tuple: (dict {(aluno_id, competencia_id): nota_valor normalizado},
+                    lista de erros com 'aluno', 'competencia' e 'erro')
+        """
+        validas = {}
+        erros = []
+        for celula in celulas:
+            if not isinstance(celula, dict):
+                erros.append({'aluno': None, 'competencia': None, 'erro': 'Célula inválida'})
+                continue
+            aluno_id = LancamentoService._inteiro(celula.get('aluno'))
+            competencia_id = LancamentoService._inteiro(celula.get('competencia'))
+            valor = str(celula.get('valor') or '').strip()
+            if not valor:
+                continue
+
+            competencia = competencias.get(competencia_id)
+            if aluno_id not in alunos_ids:
+                valido, resultado = False, 'Aluno não pertence à turma'
+            elif competencia is None:
+                valido, resultado = False, 'Competência não faz parte do boletim da turma'
+            elif len(valor) > LancamentoService.TAMANHO_MAXIMO_NOTA:
+                valido, resultado = False, f'Nota deve ter no máximo {LancamentoService.TAMANHO_MAXIMO_NOTA} caracteres'
+            else:
+                valido, resultado = DataValidator.validate_nota_valor(valor, competencia.tipo_nota)
+
+            if not valido:
+                erros.append({'aluno': aluno_id, 'competencia': competencia_id, 'erro': resultado})
+                continue
+            # Conceitos são gravados em maiúsculas; números, como foram digitados
+            validas[(aluno_id, competencia_id)] = resultado if competencia.tipo_nota == 'ABC' else valor
+        return validas, erros
+
+    @staticmethod
+    def gravar(notas, competencias):
+        """
+        Grava só as notas que mudaram (sem disparar signals): uma query para ler
+        as notas atuais, um upsert em lote para as novas (mais um UPDATE que acerta
+        a versão delas) e um bulk_update para as alteradas
+
+        Args:
+            notas: Dict {(aluno_id, competencia_id): nota_valor}
+            competencias: Dict {competencia_id: Competencia}
+
+        Returns:
+            dict: 'criadas', 'atualizadas' e 'alteracoes' (uma entrada por célula
+                  gravada, com 'aluno', 'competencia', 'anterior' e 'novo')
+        """
+        resultado = {'criadas': 0, 'atualizadas': 0, 'alteracoes': []}
+        if not notas:
+            return resultado
+
+        existentes = {
+            (aluno_id, competencia_id): (pk, nota_valor)
+            for pk, aluno_id, competencia_id, nota_valor in LancamentoDeNota.objects.filter(
+                aluno_id__in={aluno_id for aluno_id, _ in notas},
+                competencia_id__in={competencia_id for _, competencia_id in notas},
+            ).order_by().values_list('pk', 'aluno_id', 'competencia_id', 'nota_valor')
+        }
+
+        agora = timezone.now()
+        novas, alteradas = [], []
+        for (aluno_id, competencia_id), nota_valor in notas.items():
+            pk, anterior = existentes.get((aluno_id, competencia_id), (None, None))
+            if anterior == nota_valor:
+                continue
+            nota = LancamentoDeNota(
+                pk=pk,
+                aluno_id=aluno_id,
+                competencia_id=competencia_id,
+                nota_valor=nota_valor,
+                nota_numerica=LancamentoDeNota.converter_nota_numerica(
+                    nota_valor, competencias[competencia_id].tipo_nota
+                ),
+                data_atualizacao=agora,
+            )
+            if pk is None:
+                # Versão 0 marca a linha inserida por este upsert (ver abaixo)
+                nota.versao = 0
+                novas.append(nota)
+            else:
+                nota.versao = F('versao') + 1
+                alteradas.append(nota)
+            resultado['alteracoes'].append({
+                'aluno': aluno_id,
+                'competencia': competencia_id,
+                'anterior': anterior,
+                'novo': nota_valor,
+            })
+
+        with transaction.atomic():
+            # Upsert: uma nota criada por outra requisição desde a leitura acima vira
+            # atualização. O conflito mantém a versão da linha existente, então em
+            # seguida as linhas do upsert recebem a versão certa: 0 → 1 (inseridas
+            # agora) ou versão + 1 (já existiam), para que quem leu a versão anterior
+            # receba conflito no autosave/sincronização.
+            LancamentoDeNota.objects.bulk_create(
+                novas,
+                update_conflicts=True,
+                unique_fields=['aluno', 'competencia'],
+                update_fields=['nota_valor', 'nota_numerica', 'data_atualizacao'],
+                batch_size=500,
+            )
+            if novas:
+                # Bancos com RETURNING devolvem o pk de cada linha do upsert
+                if all(nota.pk is not None for nota in novas):
+                    celulas = Q(pk__in=[nota.pk for nota in novas])
+                else:
+                    celulas = Q()
+                    for nota in novas:
+                        celulas |= Q(aluno_id=nota.aluno_id, competencia_id=nota.competencia_id)
+                LancamentoDeNota.objects.filter(celulas).update(
+                    versao=Case(When(versao=0, then=Value(1)), default=F('versao') + 1)
+                )
+            LancamentoDeNota.objects.bulk_update(
+                alteradas, ['nota_valor', 'nota_numerica', 'data_atualizacao', 'versao'], batch_size=500
+            )
+        resultado['criadas'] = len(novas)
+        resultado['atualizadas'] = len(alteradas)
+        return resultado
+
+    @staticmethod
+    def registrar_auditoria(turma, gravacao, origem, usuario=None, request=None):
+        """Um único AuditLog para o envio inteiro, com as células alteradas em detalhes_json"""
+        if not gravacao['alteracoes']:
+            return
+        SimpleLogger.log_action(
+            user=usuario,
+            action='UPDATE' if gravacao['atualizadas'] else 'CREATE',
+            description=(
+                f"{len(gravacao['alteracoes'])} nota(s) salva(s) na turma {turma.nome} "
+                f"({gravacao['criadas']} nova(s), {gravacao['atualizadas']} alterada(s))"
+            ),
+            severity='LOW',
+            request=request,
+            model='LancamentoDeNota',
+            object_id=turma.pk,
+            details={
+                'turma': turma.pk,
+                'origem': origem,
+                'criadas': gravacao['criadas'],
+                'atualizadas': gravacao['atualizadas'],
+                'alteracoes': gravacao['alteracoes'],
+            },
+        )
+
+    @staticmethod
+    def _salvar(turma, celulas, alunos_ids, competencias, origem, usuario=None, request=None):
+        """Valida, grava as mudanças numa transação e registra a auditoria"""
+        notas, erros = LancamentoService.validar_celulas(celulas, alunos_ids, competencias)
+        if erros:
+            return {'salvas': 0, 'criadas': 0, 'atualizadas': 0, 'erros': erros}
+
+        with transaction.atomic():
+            gravacao = LancamentoService.gravar(notas, competencias)
+            if gravacao['criadas']:
+                # bulk_create não dispara os signals que mantêm o progresso
+                if len(alunos_ids) == 1:
+                    ProgressStore.recalcular_aluno(next(iter(alunos_ids)))
+                else:
+                    ProgressStore.reconstruir([turma.pk])
+
+        # Fora da transação: uma falha no log não desfaz as notas
+        LancamentoService.registrar_auditoria(turma, gravacao, origem, usuario, request)
+        return {
+            'salvas': len(gravacao['alteracoes']),
+            'criadas': gravacao['criadas'],
+            'atualizadas': gravacao['atualizadas'],
+            'erros': [],
+        }
+
+    @staticmethod
+    def salvar_grade(turma, celulas, usuario=None, request=None):
+        """
+        Valida e grava as células da grade de uma turma numa única transação
+
+        Se alguma célula for inválida, nada é gravado. Células iguais à nota já
+        gravada não geram escrita. O número de queries não depende da quantidade
+        de alunos nem de células.
+
+        Returns:
+            dict: 'salvas', 'criadas', 'atualizadas' e 'erros' (lista de validar_celulas)
+        """
+        competencias = {competencia.id: competencia for competencia in turma.competencias}
+        alunos_ids = set(turma.alunos.values_list('id', flat=True))
+        return LancamentoService._salvar(turma, celulas, alunos_ids, competencias, 'grade', usuario, request)
+
+    @staticmethod
+    def salvar_aluno(turma, aluno, valores, competencias, usuario=None, request=None):
+        """
+        Valida e grava as notas de um aluno (tela de lançamento por aluno)
+
+        Args:
+            valores: Dict {competencia_id: valor digitado}
+            competencias: Competências da turma (lista já carregada pela view)
+
+        Returns:
+            dict: Igual a salvar_grade()
+        """
+        celulas = [
+            {'aluno': aluno.pk, 'competencia': competencia_id, 'valor': valor}
+            for competencia_id, valor in valores.items()
+        ]
+        return LancamentoService._salvar(
+            turma, celulas, {aluno.pk}, {competencia.id: competencia for competencia in competencias},
+            'aluno', usuario, request
+        )
+
+    @staticmethod
+    def aplicar_celulas(turma, celulas):
+        """
+        Grava células independentes com controle de concorrência otimista
+
+        Cada célula traz a versão da nota que o cliente leu (0/None se estava
+        vazia). Uma célula só é gravada se a nota no banco ainda estiver nessa
+        versão (UPDATE condicional, sem locks). Se a nota já tem o valor enviado,
+        a célula conta como salva em qualquer versão; assim, reenviar o mesmo
+        lote (ex: sincronização repetida depois de uma queda de conexão) não
+        gera conflito nem nova escrita.
+
+        Args:
+            celulas: Lista de dicts com 'aluno', 'competencia', 'valor', 'versao'
+                     e opcionalmente 'id' (devolvido no resultado)
+
+        Returns:
+            tuple: (um resultado por célula, na ordem recebida, com 'id', 'aluno',
+                    'competencia', 'status' ('salva', 'invalida' ou 'conflito'),
+                    'nota_valor' e 'versao' (os gravados ou, no conflito, os atuais
+                    do banco) e 'erro'; dict de gravação no formato de gravar())
+        """
+        competencias = {competencia.id: competencia for competencia in turma.competencias}
+        alunos_ids = set(turma.alunos.values_list('id', flat=True))
+
+        validas = []
+        resultados = []
+        for celula in celulas:
+            notas, erros = LancamentoService.validar_celulas([celula], alunos_ids, competencias)
+            if erros or not notas:
+                resultado = {
+                    'aluno': erros[0]['aluno'] if erros else LancamentoService._inteiro(celula.get('aluno')),
+                    'competencia': erros[0]['competencia'] if erros else LancamentoService._inteiro(celula.get('competencia')),
+                    'status': 'invalida',
+                    'nota_valor': None,
+                    'versao': None,
+                    'erro': erros[0]['erro'] if erros else 'Nota vazia não é gravada',
+                }
+            else:
+                (aluno_id, competencia_id), nota_valor = next(iter(notas.items()))
+                resultado = {'aluno': aluno_id, 'competencia': competencia_id, 'nota_valor': nota_valor}
+                validas.append((resultado, LancamentoService._inteiro(celula.get('versao')) or 0))
+            resultado['id'] = celula.get('id') if isinstance(celula, dict) else None
+            resultados.append(resultado)
+
+        # Estado atual de todas as células numa única query
+        estados = {}
+        if validas:
+            estados = {
+                (aluno_id, competencia_id): (nota_valor, versao)
+                for aluno_id, competencia_id, nota_valor, versao in LancamentoDeNota.objects.filter(
+                    aluno_id__in={resultado['aluno'] for resultado, _ in validas},
+                    competencia_id__in={resultado['competencia'] for resultado, _ in validas},
+                ).order_by().values_list('aluno_id', 'competencia_id', 'nota_valor', 'versao')
+            }
+
+        gravacao = {'criadas': 0, 'atualizadas': 0, 'alteracoes': []}
+        # Versão lida pelo cliente → versão que este lote gravou (mesma célula repetida no lote)
+        reescritas = {}
+        with transaction.atomic():
+            for resultado, versao in validas:
+                chave = (resultado['aluno'], resultado['competencia'])
+                nota_valor = resultado['nota_valor']
+                if chave in reescritas and versao == reescritas[chave][0]:
+                    versao = reescritas[chave][1]
+                anterior, versao_atual = estados.get(chave, (None, None))
+
+                if anterior == nota_valor:
+                    gravada = True  # Já está com esse valor: nada a escrever
+                elif versao_atual is None and not versao:
+                    try:
+                        # Célula vazia no cliente: só cria; se outra pessoa já criou, é conflito
+                        with transaction.atomic():
+                            LancamentoDeNota.objects.create(
+                                aluno_id=chave[0], competencia=competencias[chave[1]], nota_valor=nota_valor
+                            )
+                        gravada, versao_atual = True, 1
+                        gravacao['criadas'] += 1
+                    except IntegrityError:
+                        gravada = False
+                        anterior, versao_atual = LancamentoService._estado_celula(*chave)
+                elif versao_atual is not None and versao_atual == versao:
+                    # UPDATE condicional: só grava se ninguém alterou a nota desde a leitura do cliente
+                    gravada = bool(LancamentoDeNota.objects.filter(
+                        aluno_id=chave[0], competencia_id=chave[1], versao=versao
+                    ).update(
+                        nota_valor=nota_valor,
+                        nota_numerica=LancamentoDeNota.converter_nota_numerica(
+                            nota_valor, competencias[chave[1]].tipo_nota
+                        ),
+                        versao=F('versao') + 1,
+                        data_atualizacao=timezone.now(),
+                    ))
+                    if gravada:
+                        versao_atual += 1
+                        gravacao['atualizadas'] += 1
+                    else:
+                        anterior, versao_atual = LancamentoService._estado_celula(*chave)
+                else:
+                    gravada = False
+
+                if gravada and anterior != nota_valor:
+                    gravacao['alteracoes'].append({
+                        'aluno': chave[0], 'competencia': chave[1], 'anterior': anterior, 'novo': nota_valor,
+                    })
+                    reescritas[chave] = (versao, versao_atual)
+                    estados[chave] = (nota_valor, versao_atual)
+                resultado.update({
+                    'status': 'salva' if gravada else 'conflito',
+                    'nota_valor': nota_valor if gravada else anterior,
+                    'versao': versao_atual,
+                    'erro': None,
+                })
+        return resultados, gravacao
+
+    @staticmethod
+    def _estado_celula(aluno_id, competencia_id):
+        """Valor e versão atuais de uma célula (None, None se não há nota)"""
+        return LancamentoDeNota.objects.filter(
+            aluno_id=aluno_id, competencia_id=competencia_id
+        ).values_list('nota_valor', 'versao').first() or (None, None)
+
+    @staticmethod
+    def salvar_celula(turma, aluno_id, competencia_id, valor, versao, usuario=None, request=None):
+        """
+        Grava uma única célula (autosave) se ela não mudou desde que o cliente a leu
+
+        Args:
+            versao: Versão da nota lida pelo cliente (None/0 se a célula estava vazia)
+
+        Returns:
+            dict: Resultado da célula (ver aplicar_celulas())
+        """
+        resultados, gravacao = LancamentoService.aplicar_celulas(turma, [
+            {'aluno': aluno_id, 'competencia': competencia_id, 'valor': valor, 'versao': versao}
+        ])
+        LancamentoService.registrar_auditoria(turma, gravacao, 'autosave', usuario, request)
+        return resultados[0]
+
+    @staticmethod
+    def sincronizar(usuario, alteracoes, request=None):
+        """
+        Aplica um lote de alterações feitas offline (células de uma ou mais turmas)
+
+        Cada alteração traz 'turma' além dos campos de aplicar_celulas(); turmas
+        que não são do professor tornam a célula inválida (com 'sem_permissao',
+        para o cliente não descartá-la) e itens que não são objetos são
+        descartados. Gera um AuditLog por turma alterada.
+
+        Returns:
+            list: Um resultado por alteração, na ordem recebida (ver aplicar_celulas())
+        """
+        alteracoes = [alteracao for alteracao in alteracoes if isinstance(alteracao, dict)]
+        turma_ids = {LancamentoService._inteiro(alteracao.get('turma')) for alteracao in alteracoes} - {None}
+        turmas = Turma.objects.filter(
+            pk__in=turma_ids, professor_responsavel__user=usuario
+        ).select_related('tipo_turma').in_bulk() if turma_ids else {}
+
+        resultados = {}
+        por_turma = {}
+        for posicao, alteracao in enumerate(alteracoes):
+            turma_id = LancamentoService._inteiro(alteracao.get('turma'))
+            if turma_id in turmas:
+                por_turma.setdefault(turma_id, []).append((posicao, alteracao))
+            else:
+                resultados[posicao] = {
+                    'id': alteracao.get('id'),
+                    'turma': turma_id,
+                    'aluno': LancamentoService._inteiro(alteracao.get('aluno')),
+                    'competencia': LancamentoService._inteiro(alteracao.get('competencia')),
+                    'status': 'invalida',
+                    'nota_valor': None,
+                    'versao': None,
+                    'erro': 'Turma não encontrada ou sem permissão',
+                    'sem_permissao': True,
+                }
+
+        for turma_id, itens in por_turma.items():
+            turma = turmas[turma_id]
+            resultados_turma, gravacao = LancamentoService.aplicar_celulas(turma, [alteracao for _, alteracao in itens])
+            for (posicao, _), resultado in zip(itens, resultados_turma):
+                resultados[posicao] = {**resultado, 'turma': turma_id}
+            LancamentoService.registrar_auditoria(turma, gravacao, 'sincronizacao', usuario, request)
+
+        return [resultados[posicao] for posicao in range(len(alteracoes))]
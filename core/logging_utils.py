@@ -15,9 +15,10 @@ class SimpleLogger:
     """
     
     @staticmethod
-    def log_action(user, action, description, severity='LOW', request=None):
+    def log_action(user, action, description, severity='LOW', request=None, model='', object_id=None, details=None):
         """
         Registra uma ação no sistema de forma simples
+        (details vai estruturado para AuditLog.detalhes_json)
         """
         try:
             from core.models import AuditLog
@@ -27,6 +28,9 @@ class SimpleLogger:
                 'acao': action,
                 'severidade': severity,
                 'descricao': description,
+                'modelo_afetado': model,
+                'objeto_id': object_id,
+                'detalhes_json': details,
             }
             
             if request:
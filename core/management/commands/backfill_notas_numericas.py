@@ -0,0 +1,34 @@
+"""
+Comando Django para preencher a coluna numérica das notas (nota_numerica)
+Execute com: python manage.py backfill_notas_numericas
+"""
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.models import LancamentoDeNota
+
+
+class Command(BaseCommand):
+    help = 'Recalcula em lote o valor numérico (nota_numerica) de todos os lançamentos de notas'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            dest='batch_size',
+            default=1000,
+            help='Quantidade de notas gravadas por lote (padrão: 1000)',
+        )
+
+    def handle(self, *args, **options):
+        total_notas = LancamentoDeNota.objects.count()
+        self.stdout.write(f'Analisando {total_notas} notas...')
+
+        with transaction.atomic():
+            alteradas = LancamentoDeNota.atualizar_notas_numericas(batch_size=options['batch_size'])
+
+        if alteradas:
+            self.stdout.write(self.style.SUCCESS(f'✅ {alteradas} nota(s) atualizada(s)'))
+        else:
+            self.stdout.write(self.style.SUCCESS('✅ Todas as notas já estão com o valor numérico correto!'))
@@ -0,0 +1,101 @@
+"""
+Comando Django para medir a vazão da geração de boletins com turmas sintéticas
+Execute com: python manage.py benchmark_boletins --tamanhos 5 20 --json benchmark.json
+"""
+
+import json
+
+from django.core.management.base import BaseCommand
+
+from core.benchmark import BoletimBenchmark
+from core.utils import BoletimGenerator
+
+
+class Command(BaseCommand):
+    help = (
+        'Gera turmas sintéticas de cada tipo de boletim (desfeitas no final) e mede template, '
+        'etapas, boletim individual, turma e escola; o resultado pode ser gravado em JSON'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tamanhos',
+            type=int,
+            nargs='+',
+            default=list(BoletimBenchmark.TAMANHOS_PADRAO),
+            help='Quantidades de alunos por turma sintética (padrão: 5 20)',
+        )
+        parser.add_argument(
+            '--tipos',
+            nargs='+',
+            choices=list(BoletimGenerator.TEMPLATE_MAP),
+            default=None,
+            help='Tipos de boletim a medir (padrão: todos)',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=None,
+            help='Processos nos cenários turma e escola (padrão: settings.BOLETIM_WORKERS ou nº de CPUs)',
+        )
+        parser.add_argument(
+            '--repeticoes',
+            type=int,
+            dest='repeticoes',
+            default=20,
+            help='Cargas de cada template no cenário de template (padrão: 20)',
+        )
+        parser.add_argument(
+            '--semente',
+            type=int,
+            default=0,
+            help='Semente das notas sintéticas (padrão: 0)',
+        )
+        parser.add_argument(
+            '--json',
+            dest='json',
+            default=None,
+            help='Arquivo onde gravar o resultado em JSON ("-" para a saída padrão)',
+        )
+
+    def handle(self, *args, **options):
+        def progresso(mensagem):
+            if options['json'] != '-':
+                self.stdout.write(f'   ⏱️  {mensagem}...')
+
+        try:
+            resultado = BoletimBenchmark.executar(
+                tamanhos=[tamanho for tamanho in options['tamanhos'] if tamanho > 0] or None,
+                tipos=options['tipos'],
+                workers=options['workers'],
+                repeticoes=max(options['repeticoes'], 1),
+                semente=options['semente'],
+                progresso=progresso,
+            )
+        except FileNotFoundError as e:
+            self.stdout.write(self.style.ERROR(f'❌ {e}'))
+            return
+
+        if options['json'] == '-':
+            self.stdout.write(json.dumps(resultado, ensure_ascii=False, indent=2))
+            return
+
+        self.stdout.write(f"\n{'Cenário':<12}{'Boletim':<24}{'Alunos':>8}{'Docs/s':>10}{'Pico (MB)':>12}")
+        for cenario in resultado['cenarios']:
+            if cenario['cenario'] == 'template':
+                self.stdout.write(
+                    f"{'template':<12}{cenario['boletim_tipo']:<24}"
+                    f"   parse {cenario['parse_ms']:.1f} ms / clone {cenario['clone_ms']:.1f} ms"
+                )
+                continue
+            self.stdout.write(
+                f"{cenario['cenario']:<12}{cenario.get('boletim_tipo', '-'):<24}{cenario['documentos']:>8}"
+                f"{cenario['docs_por_segundo'] or 0:>10.1f}{cenario['pico_memoria_mb'] or 0:>12.1f}"
+            )
+
+        if options['json']:
+            with open(options['json'], 'w', encoding='utf-8') as arquivo:
+                json.dump(resultado, arquivo, ensure_ascii=False, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"\n✅ Resultado gravado em {options['json']}"))
+        else:
+            self.stdout.write(self.style.SUCCESS('\n✅ Benchmark concluído'))
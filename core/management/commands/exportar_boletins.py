@@ -0,0 +1,87 @@
+"""
+Comando Django para exportar os boletins de várias turmas para MEDIA_ROOT
+Execute com: python manage.py exportar_boletins (ou --retomar <id> após uma interrupção)
+"""
+
+from django.core.management.base import BaseCommand
+
+from core.batch import BoletimBatchRenderer
+from core.export import ExportacaoService
+from core.models import ExportacaoBoletins, TipoTurma, Professor
+
+
+class Command(BaseCommand):
+    help = 'Exporta os boletins da escola inteira (ou filtrados) e permite retomar exportações interrompidas'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tipo-turma',
+            dest='tipo_turma',
+            help='Exporta só as turmas deste tipo (nome do TipoTurma)',
+        )
+        parser.add_argument(
+            '--professor',
+            help='Exporta só as turmas deste professor (username)',
+        )
+        parser.add_argument(
+            '--unidade',
+            choices=[valor for valor, _ in ExportacaoBoletins.UNIDADE_CHOICES],
+            default='',
+            help='Exporta só as turmas da unidade (NF ou RB)',
+        )
+        parser.add_argument(
+            '--retomar',
+            type=int,
+            dest='retomar',
+            help='ID de uma exportação interrompida a ser retomada',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=None,
+            help='Quantidade de processos de renderização (padrão: settings.BOLETIM_WORKERS)',
+        )
+
+    def handle(self, *args, **options):
+        if options['retomar']:
+            exportacao = ExportacaoBoletins.objects.filter(pk=options['retomar']).first()
+            if exportacao is None:
+                self.stdout.write(self.style.ERROR(f"❌ Exportação #{options['retomar']} não encontrada"))
+                return
+            if not ExportacaoService.pode_retomar(exportacao):
+                self.stdout.write(self.style.WARNING(
+                    f'⚠️  Exportação #{exportacao.pk} não está parada ({exportacao.get_status_display()})'
+                ))
+                return
+        else:
+            tipo_turma = None
+            professor = None
+            try:
+                if options['tipo_turma']:
+                    tipo_turma = TipoTurma.objects.get(nome=options['tipo_turma'])
+                if options['professor']:
+                    professor = Professor.objects.get(user__username=options['professor'])
+            except (TipoTurma.DoesNotExist, Professor.DoesNotExist) as e:
+                self.stdout.write(self.style.ERROR(f'❌ {e}'))
+                return
+
+            exportacao = ExportacaoService.criar(
+                tipo_turma=tipo_turma, professor=professor, unidade=options['unidade']
+            )
+            if not exportacao.turmas.exists():
+                exportacao.delete()
+                self.stdout.write(self.style.WARNING('⚠️  Nenhuma turma corresponde aos filtros'))
+                return
+
+        self.stdout.write(f'Exportando {exportacao.turmas.exclude(status="CONCLUIDA").count()} turma(s) da exportação #{exportacao.pk}...')
+        try:
+            concluida = ExportacaoService.executar(exportacao.pk, workers=options['workers'])
+        finally:
+            BoletimBatchRenderer.encerrar_pool()
+
+        if concluida:
+            exportacao.refresh_from_db()
+            self.stdout.write(self.style.SUCCESS(f'✅ Exportação concluída: {exportacao.arquivo}'))
+        else:
+            exportacao.refresh_from_db()
+            self.stdout.write(self.style.ERROR(f'❌ Exportação #{exportacao.pk} não concluída: {exportacao.erro}'))
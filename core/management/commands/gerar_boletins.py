@@ -0,0 +1,112 @@
+"""
+Comando Django para gerar os boletins Word de turmas inteiras em paralelo
+Execute com: python manage.py gerar_boletins --turma 12 --saida boletins/
+"""
+
+import os
+
+from django.core.management.base import BaseCommand
+
+from core.batch import BoletimBatchRenderer
+from core.boletim_data import BoletimDataLoader
+from core.models import Turma
+from core.progress import ProgressEngine
+
+
+class Command(BaseCommand):
+    help = 'Gera os boletins (.docx) de uma ou mais turmas usando um pool de processos'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--turma',
+            type=int,
+            action='append',
+            dest='turmas',
+            default=[],
+            help='ID da turma (pode ser repetido)',
+        )
+        parser.add_argument(
+            '--tipo-turma',
+            dest='tipo_turma',
+            help='Gera os boletins de todas as turmas deste tipo (nome do TipoTurma)',
+        )
+        parser.add_argument(
+            '--todas',
+            action='store_true',
+            help='Gera os boletins de todas as turmas',
+        )
+        parser.add_argument(
+            '--saida',
+            default='boletins',
+            help='Pasta onde os boletins serão gravados, uma subpasta por turma (padrão: boletins)',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=None,
+            help='Quantidade de processos (padrão: settings.BOLETIM_WORKERS ou nº de CPUs)',
+        )
+        parser.add_argument(
+            '--incluir-incompletos',
+            action='store_true',
+            dest='incluir_incompletos',
+            help='Gera também os boletins de alunos sem todas as notas lançadas',
+        )
+
+    def handle(self, *args, **options):
+        turmas = Turma.objects.select_related('tipo_turma')
+        if options['todas']:
+            pass
+        elif options['turmas'] or options['tipo_turma']:
+            if options['turmas']:
+                turmas = turmas.filter(id__in=options['turmas'])
+            if options['tipo_turma']:
+                turmas = turmas.filter(tipo_turma__nome=options['tipo_turma'])
+        else:
+            self.stdout.write(self.style.ERROR('❌ Informe --turma, --tipo-turma ou --todas'))
+            return
+
+        turmas = list(turmas)
+        if not turmas:
+            self.stdout.write(self.style.WARNING('⚠️  Nenhuma turma encontrada'))
+            return
+
+        # Um único lote com os alunos de todas as turmas aproveita melhor o pool
+        alunos = []
+        pastas = {}
+        completude = ProgressEngine.completude_alunos(turmas)
+        for turma in turmas:
+            turma_alunos = BoletimDataLoader.queryset_alunos(turma)
+            if not options['incluir_incompletos']:
+                turma_alunos = [aluno for aluno in turma_alunos if completude[aluno.id]['completo']]
+            pasta = os.path.join(options['saida'], turma.identificador_turma.replace(' ', '_'))
+            for aluno in turma_alunos:
+                alunos.append(aluno)
+                pastas[aluno.id] = pasta
+
+        if not alunos:
+            self.stdout.write(self.style.WARNING('⚠️  Nenhum aluno com todas as notas lançadas'))
+            return
+
+        workers = options['workers'] or BoletimBatchRenderer.workers_padrao()
+        self.stdout.write(f'Gerando {len(alunos)} boletim(ns) de {len(turmas)} turma(s) com {workers} worker(s)...')
+
+        try:
+            resultados = BoletimBatchRenderer.renderizar(alunos, workers=workers)
+        finally:
+            BoletimBatchRenderer.encerrar_pool()
+
+        gerados = 0
+        for resultado in resultados:
+            if resultado['erro'] is not None:
+                self.stdout.write(self.style.ERROR(f"❌ {resultado['nome']}: {resultado['erro']}"))
+                continue
+            pasta = pastas[resultado['aluno_id']]
+            os.makedirs(pasta, exist_ok=True)
+            with open(os.path.join(pasta, resultado['arquivo']), 'wb') as arquivo:
+                arquivo.write(resultado['conteudo'])
+            gerados += 1
+
+        self.stdout.write(self.style.SUCCESS(f"✅ {gerados} boletim(ns) gravado(s) em {options['saida']}"))
+        if gerados < len(resultados):
+            self.stdout.write(self.style.WARNING(f'⚠️  {len(resultados) - gerados} boletim(ns) com erro'))
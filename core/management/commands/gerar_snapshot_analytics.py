@@ -0,0 +1,29 @@
+"""
+Comando Django para materializar os dados do dashboard de analytics
+Execute com: python manage.py gerar_snapshot_analytics (agendar via cron, ex: todas as noites)
+"""
+
+from django.core.management.base import BaseCommand
+
+from core.analytics import AnalyticsEngine
+
+
+class Command(BaseCommand):
+    help = 'Gera snapshots do dashboard de analytics (geral, por tipo de turma e por professor)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--manter',
+            type=int,
+            dest='manter',
+            default=7,
+            help='Quantidade de snapshots guardados por escopo (padrão: 7)',
+        )
+
+    def handle(self, *args, **options):
+        if options['manter'] < 1:
+            self.stdout.write(self.style.ERROR('❌ --manter deve ser pelo menos 1'))
+            return
+
+        total = AnalyticsEngine.gerar_snapshots(manter=options['manter'])
+        self.stdout.write(self.style.SUCCESS(f'✅ {total} snapshot(s) de analytics gerado(s)'))
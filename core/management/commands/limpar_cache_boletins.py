@@ -0,0 +1,48 @@
+"""
+Comando Django para limpar o cache de boletins renderizados
+Execute com: python manage.py limpar_cache_boletins (agendar via cron, ex: semanalmente)
+"""
+
+from django.core.management.base import BaseCommand
+
+from core.render_cache import BoletimCache
+
+
+class Command(BaseCommand):
+    help = 'Remove boletins do cache (LRU) até respeitar o limite de tamanho, os antigos ou todos'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--max-mb',
+            type=int,
+            dest='max_mb',
+            default=None,
+            help='Limite de tamanho em MB (padrão: settings.BOLETIM_CACHE_MAX_MB)',
+        )
+        parser.add_argument(
+            '--dias',
+            type=int,
+            dest='dias',
+            default=None,
+            help='Remove também os boletins não usados há mais de N dias',
+        )
+        parser.add_argument(
+            '--tudo',
+            action='store_true',
+            help='Esvazia o cache',
+        )
+
+    def handle(self, *args, **options):
+        max_bytes = options['max_mb'] * 1024 * 1024 if options['max_mb'] is not None else None
+        idade_maxima = options['dias'] * 24 * 60 * 60 if options['dias'] is not None else None
+
+        resultado = BoletimCache.limpar(max_bytes=max_bytes, idade_maxima=idade_maxima, tudo=options['tudo'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {resultado['removidos']} boletim(ns) removido(s) "
+            f"({resultado['bytes_liberados'] / (1024 * 1024):.1f} MB liberados)"
+        ))
+        self.stdout.write(
+            f"   Restam {resultado['restantes']} boletim(ns) em cache "
+            f"({resultado['bytes_restantes'] / (1024 * 1024):.1f} MB)"
+        )
@@ -0,0 +1,34 @@
+"""
+Comando Django para reconstruir e verificar as tabelas de progresso
+Execute com: python manage.py recompute_progress
+"""
+
+from django.core.management.base import BaseCommand
+
+from core.progress import ProgressStore
+
+
+class Command(BaseCommand):
+    help = 'Reconstrói os contadores de progresso (ProgressoTurma/ProgressoAluno) e confere com os dados reais'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verificar',
+            action='store_true',
+            dest='apenas_verificar',
+            default=False,
+            help='Apenas confere o store com os dados reais, sem reconstruir',
+        )
+
+    def handle(self, *args, **options):
+        if not options['apenas_verificar']:
+            total = ProgressStore.reconstruir()
+            self.stdout.write(self.style.SUCCESS(f'✅ Progresso reconstruído para {total} turma(s)'))
+
+        divergencias = ProgressStore.verificar()
+        if divergencias:
+            self.stdout.write(self.style.ERROR(f'❌ {len(divergencias)} divergência(s) encontrada(s):'))
+            for divergencia in divergencias:
+                self.stdout.write(f'  • {divergencia}')
+        else:
+            self.stdout.write(self.style.SUCCESS('✅ Store de progresso confere com os dados reais'))
@@ -0,0 +1,60 @@
+"""
+Comando Django para gerar o relatório de notas finais da escola (ou de um tipo de turma)
+Execute com: python manage.py relatorio_notas_finais --saida notas_finais.csv
+"""
+
+import time
+
+import pandas as pd
+from django.core.management.base import BaseCommand
+
+from core.grading import NotaFinalEngine
+from core.models import Aluno, Turma
+
+
+class Command(BaseCommand):
+    help = 'Calcula a nota final de todos os alunos ativos numa única passada e grava um CSV'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tipo-turma',
+            dest='tipo_turma',
+            help='Só as turmas deste tipo (nome do TipoTurma)',
+        )
+        parser.add_argument(
+            '--saida',
+            default='notas_finais.csv',
+            help='Arquivo CSV de saída (padrão: notas_finais.csv)',
+        )
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+
+        turmas = Turma.objects.all()
+        if options['tipo_turma']:
+            turmas = turmas.filter(tipo_turma__nome=options['tipo_turma'])
+
+        resultado = NotaFinalEngine.calcular(turmas=turmas)
+        if resultado.empty:
+            self.stdout.write(self.style.WARNING('⚠️  Nenhum aluno encontrado'))
+            return
+
+        nomes = pd.DataFrame(
+            list(Aluno.objects.filter(pk__in=resultado.index.tolist()).values_list(
+                'id', 'turma__tipo_turma__nome', 'turma__identificador_turma', 'nome_completo'
+            )),
+            columns=['aluno_id', 'tipo_turma', 'turma', 'aluno'],
+        ).set_index('aluno_id')
+
+        relatorio = nomes.join(resultado).sort_values(['tipo_turma', 'turma', 'aluno'])
+        relatorio['media'] = relatorio['media'].round(1)
+        relatorio.to_csv(options['saida'], index=False, encoding='utf-8')
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Notas finais de {len(relatorio)} aluno(s) gravadas em {options['saida']} "
+            f"({time.perf_counter() - inicio:.2f}s)"
+        ))
+        contagem = relatorio['nota_final'].value_counts()
+        for conceito in ['A', 'B', 'C', 'D', NotaFinalEngine.SEM_NOTA]:
+            if conceito in contagem:
+                self.stdout.write(f'   {conceito}: {contagem[conceito]}')
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.7 on 2026-10-17 22:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_alter_userpreference_background_gradient_end_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProgressoTurma',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_alunos', models.PositiveIntegerField(default=0)),
+                ('alunos_ativos', models.PositiveIntegerField(default=0)),
+                ('total_competencias', models.PositiveIntegerField(default=0)),
+                ('notas_lancadas', models.PositiveIntegerField(default=0)),
+                ('alunos_completos', models.PositiveIntegerField(default=0)),
+                ('data_atualizacao', models.DateTimeField(auto_now=True)),
+                ('turma', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='progresso', to='core.turma')),
+            ],
+            options={
+                'verbose_name': 'Progresso da Turma',
+                'verbose_name_plural': 'Progresso das Turmas',
+            },
+        ),
+        migrations.CreateModel(
+            name='ProgressoAluno',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ativo', models.BooleanField(default=True)),
+                ('notas_lancadas', models.PositiveIntegerField(default=0)),
+                ('total_competencias', models.PositiveIntegerField(default=0)),
+                ('completo', models.BooleanField(default=False)),
+                ('data_atualizacao', models.DateTimeField(auto_now=True)),
+                ('aluno', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='progresso', to='core.aluno')),
+                ('turma', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='progresso_alunos', to='core.turma')),
+            ],
+            options={
+                'verbose_name': 'Progresso do Aluno',
+                'verbose_name_plural': 'Progresso dos Alunos',
+                'indexes': [models.Index(fields=['turma', 'completo'], name='core_progre_turma_i_634255_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.7 on 2026-10-17 22:20
+
+import math
+
+from django.db import migrations, models
+
+
+def preencher_nota_numerica(apps, schema_editor):
+    """Preenche nota_numerica para as notas já existentes"""
+    LancamentoDeNota = apps.get_model('core', 'LancamentoDeNota')
+    conceitos = {'A': 4, 'B': 3, 'C': 2, 'D': 1}
+    alteradas = []
+    for nota in LancamentoDeNota.objects.select_related('competencia').only(
+        'pk', 'nota_valor', 'competencia__tipo_nota'
+    ).iterator(chunk_size=1000):
+        valor = str(nota.nota_valor or '').strip()
+        if nota.competencia.tipo_nota == 'ABC':
+            nota.nota_numerica = conceitos.get(valor.upper())
+        else:
+            try:
+                numero = float(valor)
+                nota.nota_numerica = numero if math.isfinite(numero) else None
+            except ValueError:
+                nota.nota_numerica = None
+        if nota.nota_numerica is not None:
+            alteradas.append(nota)
+    LancamentoDeNota.objects.bulk_update(alteradas, ['nota_numerica'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_progressoturma_progressoaluno'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lancamentodenota',
+            name='nota_numerica',
+            field=models.FloatField(blank=True, db_index=True, editable=False, help_text='Valor numérico da nota (número para NUM, ordinal de A=4 a D=1 para ABC), preenchido ao salvar', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='lancamentodenota',
+            index=models.Index(fields=['competencia', 'nota_numerica'], name='core_lancam_compete_306439_idx'),
+        ),
+        migrations.RunPython(preencher_nota_numerica, migrations.RunPython.noop),
+    ]
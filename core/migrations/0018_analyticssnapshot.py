@@ -0,0 +1,29 @@
+# Generated by Django 5.2.7 on 2026-10-17 22:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_lancamentodenota_nota_numerica'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnalyticsSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('escopo', models.CharField(choices=[('GERAL', 'Geral'), ('TIPO_TURMA', 'Tipo de Turma'), ('PROFESSOR', 'Professor')], default='GERAL', max_length=10)),
+                ('referencia_id', models.PositiveIntegerField(blank=True, help_text='ID do tipo de turma ou do professor (vazio no escopo geral)', null=True)),
+                ('dados', models.JSONField(help_text='Payload do endpoint de analytics')),
+                ('data_geracao', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Snapshot de Analytics',
+                'verbose_name_plural': 'Snapshots de Analytics',
+                'ordering': ['-data_geracao'],
+                'indexes': [models.Index(fields=['escopo', 'referencia_id', '-data_geracao'], name='core_analyt_escopo_0d777d_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.7 on 2026-10-17 22:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_analyticssnapshot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='aluno',
+            name='data_atualizacao',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AddField(
+            model_name='lancamentodenota',
+            name='data_atualizacao',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AddField(
+            model_name='turma',
+            name='data_atualizacao',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+    ]
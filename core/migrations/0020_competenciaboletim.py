@@ -0,0 +1,86 @@
+# Generated by Django 5.2.7 on 2026-10-17 22:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# Catálogo padrão no momento da migração (Turma.COMPETENCIAS_POR_BOLETIM)
+COMPETENCIAS_POR_BOLETIM = {
+    'adolescentes_adultos': [
+        'Produção Oral',
+        'Produção Escrita',
+        'Avaliações de Progresso',
+    ],
+    'material_antigo': [
+        'Produção Oral',
+        'Produção Escrita',
+        'Compreensão Oral',
+        'Compreensão Escrita',
+        'Writing Bit 01',
+        'Writing Bit 02',
+        'Checkpoints',
+    ],
+    'lion_stars': [
+        'Comunicação Oral',
+        'Compreensão Oral',
+        'Interesse pela Aprendizagem',
+        'Colaboração',
+        'Engajamento',
+    ],
+    'junior': [
+        'Comunicação Oral',
+        'Compreensão Oral',
+        'Comunicação Escrita',
+        'Compreensão de Leitura',
+        'Interesse pela Aprendizagem',
+        'Colaboração',
+        'Engajamento',
+    ],
+}
+
+
+def popular_catalogo(apps, schema_editor):
+    """Cria as linhas do catálogo para as competências já cadastradas"""
+    Competencia = apps.get_model('core', 'Competencia')
+    CompetenciaBoletim = apps.get_model('core', 'CompetenciaBoletim')
+    linhas = []
+    for boletim_tipo, nomes in COMPETENCIAS_POR_BOLETIM.items():
+        for competencia in Competencia.objects.filter(nome__in=nomes):
+            linhas.append(CompetenciaBoletim(
+                boletim_tipo=boletim_tipo,
+                competencia=competencia,
+                ordem=nomes.index(competencia.nome)
+            ))
+    CompetenciaBoletim.objects.bulk_create(linhas)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0019_data_atualizacao'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='competencia',
+            name='nome',
+            field=models.CharField(db_index=True, max_length=100),
+        ),
+        migrations.CreateModel(
+            name='CompetenciaBoletim',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('boletim_tipo', models.CharField(choices=[('adolescentes_adultos', 'Adolescentes - adultos'), ('material_antigo', 'Material antigo'), ('lion_stars', 'Lion stars'), ('junior', 'Junior')], max_length=32)),
+                ('ordem', models.PositiveSmallIntegerField(default=0)),
+                ('competencia', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='boletins', to='core.competencia')),
+            ],
+            options={
+                'verbose_name': 'Competência do Boletim',
+                'verbose_name_plural': 'Competências dos Boletins',
+                'ordering': ['boletim_tipo', 'ordem'],
+                'indexes': [models.Index(fields=['boletim_tipo', 'ordem'], name='core_compet_boletim_2f3e47_idx')],
+                'unique_together': {('boletim_tipo', 'competencia')},
+            },
+        ),
+        migrations.RunPython(popular_catalogo, migrations.RunPython.noop),
+    ]
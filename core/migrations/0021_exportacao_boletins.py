@@ -0,0 +1,58 @@
+# Generated by Django 5.2.7 on 2026-10-17 22:42
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0020_competenciaboletim'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExportacaoBoletins',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('PENDENTE', 'Pendente'), ('EXECUTANDO', 'Executando'), ('CONCLUIDA', 'Concluída'), ('ERRO', 'Erro')], db_index=True, default='PENDENTE', max_length=10)),
+                ('unidade', models.CharField(blank=True, choices=[('NF', 'Nova Friburgo'), ('RB', 'Rio Bonito')], max_length=2)),
+                ('arquivo', models.CharField(blank=True, help_text='Caminho do ZIP final, relativo a MEDIA_ROOT', max_length=255)),
+                ('erro', models.TextField(blank=True)),
+                ('data_criacao', models.DateTimeField(auto_now_add=True)),
+                ('data_inicio', models.DateTimeField(blank=True, null=True)),
+                ('data_conclusao', models.DateTimeField(blank=True, null=True)),
+                ('data_atualizacao', models.DateTimeField(auto_now=True, help_text='Atualizado a cada turma (sinal de vida da execução)')),
+                ('criado_por', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+                ('professor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='core.professor')),
+                ('tipo_turma', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='core.tipoturma')),
+            ],
+            options={
+                'verbose_name': 'Exportação de Boletins',
+                'verbose_name_plural': 'Exportações de Boletins',
+                'ordering': ['-data_criacao'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ExportacaoTurma',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ordem', models.PositiveIntegerField(default=0)),
+                ('status', models.CharField(choices=[('PENDENTE', 'Pendente'), ('CONCLUIDA', 'Concluída'), ('ERRO', 'Erro')], default='PENDENTE', max_length=10)),
+                ('total_alunos', models.PositiveIntegerField(default=0)),
+                ('boletins_gerados', models.PositiveIntegerField(default=0)),
+                ('falhas', models.JSONField(blank=True, default=list, help_text="[{'aluno': nome, 'erro': mensagem}]")),
+                ('data_conclusao', models.DateTimeField(blank=True, null=True)),
+                ('exportacao', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='turmas', to='core.exportacaoboletins')),
+                ('turma', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='exportacoes', to='core.turma')),
+            ],
+            options={
+                'verbose_name': 'Turma da Exportação',
+                'verbose_name_plural': 'Turmas da Exportação',
+                'ordering': ['exportacao', 'ordem'],
+                'unique_together': {('exportacao', 'turma')},
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-17 23:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0021_exportacao_boletins'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lancamentodenota',
+            name='versao',
+            field=models.PositiveIntegerField(default=1, editable=False, help_text='Incrementada a cada alteração da nota; gravações com versão desatualizada são recusadas'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.7 on 2026-10-17 23:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0022_lancamentodenota_versao'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='competencia',
+            name='data_atualizacao',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AddField(
+            model_name='competenciaboletim',
+            name='data_atualizacao',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AddField(
+            model_name='professor',
+            name='data_atualizacao',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AddField(
+            model_name='tipoturma',
+            name='data_atualizacao',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+    ]
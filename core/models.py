@@ -1,5 +1,9 @@
+import math
+
 from django.db import models # type: ignore
 
+from django.utils import timezone # type: ignore
+
 from django.contrib.auth.models import User # Reutilizando o sistema de usuário do Django (Melhor Prática!) # type: ignore
 
 
@@ -32,6 +36,7 @@ class Professor(models.Model):
         help_text="Nome completo do professor para exibir nos boletins"
     )
     data_contratacao = models.DateField(null=True, blank=True)
+    data_atualizacao = models.DateTimeField(auto_now=True, db_index=True) # Usada na versão dos dados (ETag)
 
 
 
@@ -63,7 +68,7 @@ class Competencia(models.Model):
 
     ]
 
-    nome = models.CharField(max_length=100)
+    nome = models.CharField(max_length=100, db_index=True)
 
     tipo_nota = models.CharField(
 
@@ -75,6 +80,8 @@ class Competencia(models.Model):
 
     )
 
+    data_atualizacao = models.DateTimeField(auto_now=True, db_index=True) # Usada na versão dos dados (ETag)
+
     def __str__(self):
 
         return f"{self.nome} ({self.get_tipo_nota_display()})" # Exibe o nome e o tipo de nota #type:ignore
@@ -98,6 +105,7 @@ class TipoTurma(models.Model):
         blank=True,  # Torna opcional - competências virão do boletim_tipo
         help_text="(Opcional) Competências customizadas. Se vazio, usará as competências do tipo de boletim."
     )
+    data_atualizacao = models.DateTimeField(auto_now=True, db_index=True) # Usada na versão dos dados (ETag)
     
     def __str__(self):
         return self.nome
@@ -125,7 +133,8 @@ class Turma(models.Model): # Representa uma turma
         ("junior", "Junior"),
     ]
     
-    # Mapeamento de tipos de boletim para competências necessárias
+    # Mapeamento de tipos de boletim para competências necessárias (na ordem do boletim).
+    # É o catálogo padrão: as linhas de CompetenciaBoletim são sincronizadas a partir dele
     COMPETENCIAS_POR_BOLETIM = {
         'adolescentes_adultos': [
             'Produção Oral',
@@ -184,6 +193,8 @@ class Turma(models.Model): # Representa uma turma
 
         related_name='turmas')
 
+    data_atualizacao = models.DateTimeField(auto_now=True, db_index=True) # Usada na versão dos dados (ETag)
+
     # Removido: competencias ManyToManyField - agora vem do TipoTurma
     
     @property
@@ -195,19 +206,10 @@ class Turma(models.Model): # Representa uma turma
     
     @property
     def competencias(self):
-        """Retorna as competências baseadas no tipo de boletim da turma"""
-        # Busca os nomes das competências necessárias para este tipo de boletim
-        nomes_competencias = self.COMPETENCIAS_POR_BOLETIM.get(self.boletim_tipo, [])
-        
-        # Busca os objetos Competencia do banco de dados
-        from django.db.models import Q
-        if nomes_competencias:
-            query = Q()
-            for nome in nomes_competencias:
-                query |= Q(nome=nome)
-            return Competencia.objects.filter(query)
-        
-        return Competencia.objects.none()
+        """Retorna as competências do tipo de boletim da turma (catálogo CompetenciaBoletim)"""
+        # Os IDs vêm do registro em memória; avaliar o queryset custa uma única query
+        from core.catalog import CompetenciaRegistry
+        return Competencia.objects.filter(pk__in=CompetenciaRegistry.ids(self.boletim_tipo))
 
     def __str__(self):
 
@@ -226,6 +228,33 @@ class Turma(models.Model): # Representa uma turma
 
        
 
+class CompetenciaBoletim(models.Model):
+    """
+    Catálogo de competências de cada tipo de boletim, na ordem em que aparecem.
+    Mantido em sincronia com Turma.COMPETENCIAS_POR_BOLETIM pelos signals de core.signals.
+    """
+    boletim_tipo = models.CharField(max_length=32, choices=Turma.BOLETIM_TIPOS)
+    competencia = models.ForeignKey(
+        Competencia,
+        on_delete=models.CASCADE,
+        related_name='boletins'
+    )
+    ordem = models.PositiveSmallIntegerField(default=0)
+    data_atualizacao = models.DateTimeField(auto_now=True, db_index=True) # Usada na versão dos dados (ETag)
+
+    def __str__(self):
+        return f"{self.get_boletim_tipo_display()} #{self.ordem}: {self.competencia.nome}"
+
+    class Meta:
+        verbose_name = "Competência do Boletim"
+        verbose_name_plural = "Competências dos Boletins"
+        ordering = ['boletim_tipo', 'ordem']
+        unique_together = ('boletim_tipo', 'competencia')
+        indexes = [
+            models.Index(fields=['boletim_tipo', 'ordem']),
+        ]
+
+
 class Aluno(models.Model):
 
     """Representa um aluno."""
@@ -248,6 +277,7 @@ class Aluno(models.Model):
     data_cadastro = models.DateTimeField(auto_now_add=True)
     ativo = models.BooleanField(default=True, help_text="Indica se o aluno está ativo no sistema")
     observacoes = models.TextField(blank=True, help_text="Observações sobre o aluno")
+    data_atualizacao = models.DateTimeField(auto_now=True, db_index=True) # Usada na versão dos dados (ETag)
 
 
 
@@ -257,69 +287,52 @@ class Aluno(models.Model):
     
     def get_progresso_completo(self):
         """Retorna o progresso completo do aluno em suas competências"""
-        if not self.turma.competencias:
-            return 0
-        
-        competencias_turma = self.turma.competencias.all()
-        total_competencias = len(competencias_turma)
+        from core.catalog import CompetenciaRegistry
+        competencia_ids = CompetenciaRegistry.ids(self.turma.boletim_tipo)
+        total_competencias = len(competencia_ids)
         
         if total_competencias == 0:
             return 0
         
         notas_lancadas = LancamentoDeNota.objects.filter(
             aluno=self,
-            competencia__in=competencias_turma
+            competencia_id__in=competencia_ids
         ).count()
         
         return int((notas_lancadas / total_competencias) * 100)
     
     def get_media_geral(self):
         """Calcula a média geral do aluno em competências numéricas"""
-        notas_numericas = LancamentoDeNota.objects.filter(
+        media = LancamentoDeNota.objects.filter(
             aluno=self,
-            competencia__tipo_nota='NUM'
-        )
+            competencia__tipo_nota='NUM',
+            nota_numerica__isnull=False
+        ).aggregate(media=models.Avg('nota_numerica'))['media']
         
-        if not notas_numericas.exists():
-            return None
-        
-        total = 0
-        count = 0
-        
-        for nota in notas_numericas:
-            try:
-                valor = float(nota.nota_valor)
-                total += valor
-                count += 1
-            except ValueError:
-                continue
-        
-        return round(total / count, 1) if count > 0 else None
+        return round(media, 1) if media is not None else None
 
     def tem_notas_completas(self):
         """Verifica se o aluno tem todas as notas lançadas para as competências de sua turma"""
-        if not self.turma.competencias:
-            return False
-        
-        competencias_turma = self.turma.competencias.all()
-        total_competencias = competencias_turma.count()
+        from core.catalog import CompetenciaRegistry
+        competencia_ids = CompetenciaRegistry.ids(self.turma.boletim_tipo)
+        total_competencias = len(competencia_ids)
         
         if total_competencias == 0:
             return False
         
         notas_lancadas = LancamentoDeNota.objects.filter(
             aluno=self,
-            competencia__in=competencias_turma
+            competencia_id__in=competencia_ids
         ).count()
         
         return notas_lancadas == total_competencias
     
     def get_notas_boletim(self):
         """Retorna todas as notas do aluno organizadas para o boletim"""
-        if not self.turma.competencias:
+        competencias_turma = list(self.turma.competencias)
+        if not competencias_turma:
             return []
         
-        competencias_turma = self.turma.competencias.all()
         notas_data = []
         
         for competencia in competencias_turma:
@@ -331,12 +344,14 @@ class Aluno(models.Model):
                 notas_data.append({
                     'competencia': competencia,
                     'nota': nota.nota_valor,
+                    'nota_numerica': nota.nota_numerica,
                     'data_lancamento': nota.data_lancamento
                 })
             except LancamentoDeNota.DoesNotExist:
                 notas_data.append({
                     'competencia': competencia,
                     'nota': '-',
+                    'nota_numerica': None,
                     'data_lancamento': None
                 })
         
@@ -385,14 +400,134 @@ class LancamentoDeNota(models.Model):
 
     nota_valor = models.CharField(max_length=10, help_text="Valor da nota (ex: 85 ou A)") # Armazena a nota como string para flexibilidade
 
+    nota_numerica = models.FloatField(
+
+        null=True,
+
+        blank=True,
+
+        db_index=True,
+
+        editable=False,
+
+        help_text="Valor numérico da nota (número para NUM, ordinal de A=4 a D=1 para ABC), preenchido ao salvar"
+
+    ) # Permite médias, faixas e rankings direto no banco
+
     data_lancamento = models.DateField(auto_now_add=True)
 
+    data_atualizacao = models.DateTimeField(auto_now=True, db_index=True) # Usada na versão dos dados (ETag)
+
+    versao = models.PositiveIntegerField(
+
+        default=1,
+
+        editable=False,
+
+        help_text="Incrementada a cada alteração da nota; gravações com versão desatualizada são recusadas"
+
+    ) # Controle de concorrência otimista (autosave, admin)
+
+
+
+    # Ordinal canônico dos conceitos (A é o mais alto)
+
+    CONCEITO_ORDINAL = {'A': 4, 'B': 3, 'C': 2, 'D': 1}
+
 
 
     def __str__(self):
 
         return f"Nota {self.nota_valor} para {self.aluno.nome_completo} em {self.competencia.nome}"
 
+
+
+    @staticmethod
+
+    def converter_nota_numerica(nota_valor, tipo_nota):
+
+        """Converte o valor textual da nota para sua representação numérica (ou None se inválido)"""
+
+        valor = str(nota_valor or '').strip()
+
+        if tipo_nota == 'ABC':
+
+            return LancamentoDeNota.CONCEITO_ORDINAL.get(valor.upper())
+
+        try:
+
+            numero = float(valor)
+
+        except ValueError:
+
+            return None
+
+        return numero if math.isfinite(numero) else None
+
+
+
+    def save(self, *args, **kwargs):
+
+        # Só o tipo_nota: não carrega a competência inteira se quem chamou não a trouxe
+
+        if LancamentoDeNota.competencia.is_cached(self):
+
+            tipo_nota = self.competencia.tipo_nota
+
+        else:
+
+            tipo_nota = Competencia.objects.filter(pk=self.competencia_id).order_by().values_list('tipo_nota', flat=True).first()
+
+        self.nota_numerica = self.converter_nota_numerica(self.nota_valor, tipo_nota)
+
+        if not self._state.adding:
+
+            self.versao = (self.versao or 0) + 1
+
+        update_fields = kwargs.get('update_fields')
+
+        if update_fields is not None and 'nota_valor' in update_fields:
+
+            kwargs['update_fields'] = set(update_fields) | {'nota_numerica', 'data_atualizacao', 'versao'}
+
+        super().save(*args, **kwargs)
+
+
+
+    @staticmethod
+
+    def atualizar_notas_numericas(queryset=None, batch_size=1000):
+
+        """
+
+        Recalcula nota_numerica em lote (para dados antigos ou após mudar o tipo
+
+        de nota de uma competência). Retorna o número de notas alteradas.
+
+        """
+
+        if queryset is None:
+
+            queryset = LancamentoDeNota.objects.all()
+
+        linhas = queryset.order_by('pk').values_list('pk', 'nota_valor', 'nota_numerica', 'competencia__tipo_nota')
+
+        agora = timezone.now()
+
+        alteradas = []
+
+        for pk, nota_valor, nota_numerica, tipo_nota in linhas.iterator(chunk_size=batch_size):
+
+            novo_valor = LancamentoDeNota.converter_nota_numerica(nota_valor, tipo_nota)
+
+            if novo_valor != nota_numerica:
+
+                alteradas.append(LancamentoDeNota(pk=pk, nota_numerica=novo_valor, data_atualizacao=agora))
+
+        LancamentoDeNota.objects.bulk_update(alteradas, ['nota_numerica', 'data_atualizacao'], batch_size=batch_size)
+
+        return len(alteradas)
+
        
 
     class Meta:
@@ -403,6 +538,56 @@ class LancamentoDeNota(models.Model):
 
         unique_together = ('aluno', 'competencia') # Garante que um aluno tenha apenas uma nota por competência
 
+        indexes = [
+
+            models.Index(fields=['competencia', 'nota_numerica']),
+
+        ]
+
+
+class ProgressoTurma(models.Model):
+    """
+    Contadores pré-agregados de progresso de uma turma.
+    Mantidos incrementalmente pelos signals de core.signals (ver core.progress.ProgressStore).
+    """
+    turma = models.OneToOneField(Turma, on_delete=models.CASCADE, related_name='progresso')
+    total_alunos = models.PositiveIntegerField(default=0)
+    alunos_ativos = models.PositiveIntegerField(default=0)
+    total_competencias = models.PositiveIntegerField(default=0)
+    notas_lancadas = models.PositiveIntegerField(default=0)
+    alunos_completos = models.PositiveIntegerField(default=0)
+    data_atualizacao = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Progresso {self.turma}: {self.notas_lancadas}/{self.total_alunos * self.total_competencias}"
+
+    class Meta:
+        verbose_name = "Progresso da Turma"
+        verbose_name_plural = "Progresso das Turmas"
+
+
+class ProgressoAluno(models.Model):
+    """
+    Contadores pré-agregados de progresso de um aluno nas competências do boletim da sua turma.
+    """
+    aluno = models.OneToOneField(Aluno, on_delete=models.CASCADE, related_name='progresso')
+    turma = models.ForeignKey(Turma, on_delete=models.CASCADE, related_name='progresso_alunos')
+    ativo = models.BooleanField(default=True)
+    notas_lancadas = models.PositiveIntegerField(default=0)
+    total_competencias = models.PositiveIntegerField(default=0)
+    completo = models.BooleanField(default=False)
+    data_atualizacao = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Progresso {self.aluno.nome_completo}: {self.notas_lancadas}/{self.total_competencias}"
+
+    class Meta:
+        verbose_name = "Progresso do Aluno"
+        verbose_name_plural = "Progresso dos Alunos"
+        indexes = [
+            models.Index(fields=['turma', 'completo']),
+        ]
+
 
 class ConfiguracaoSistema(models.Model):
     """
@@ -621,6 +806,122 @@ class SystemMetrics(models.Model):
         return f"{metric_display}: {self.metric_value} ({self.timestamp.strftime('%Y-%m-%d %H:%M')})"
 
 
+
+class AnalyticsSnapshot(models.Model):
+    """
+    Payload materializado do dashboard de analytics (gerado pelo comando gerar_snapshot_analytics)
+    """
+    ESCOPO_CHOICES = [
+        ('GERAL', 'Geral'),
+        ('TIPO_TURMA', 'Tipo de Turma'),
+        ('PROFESSOR', 'Professor'),
+    ]
+    
+    escopo = models.CharField(max_length=10, choices=ESCOPO_CHOICES, default='GERAL')
+    referencia_id = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        help_text="ID do tipo de turma ou do professor (vazio no escopo geral)"
+    )
+    dados = models.JSONField(help_text="Payload do endpoint de analytics")
+    data_geracao = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name = "Snapshot de Analytics"
+        verbose_name_plural = "Snapshots de Analytics"
+        ordering = ['-data_geracao']
+        indexes = [
+            models.Index(fields=['escopo', 'referencia_id', '-data_geracao']),
+        ]
+    
+    def __str__(self):
+        escopo_display = dict(self.ESCOPO_CHOICES).get(self.escopo, self.escopo)
+        referencia = f" #{self.referencia_id}" if self.referencia_id else ""
+        return f"Analytics {escopo_display}{referencia} ({self.data_geracao.strftime('%Y-%m-%d %H:%M')})"
+    
+    @classmethod
+    def ultimo(cls, escopo='GERAL', referencia_id=None):
+        """Retorna o snapshot mais recente do escopo (ou None)"""
+        return cls.objects.filter(escopo=escopo, referencia_id=referencia_id).order_by('-data_geracao', '-pk').first()
+
+class ExportacaoBoletins(models.Model):
+    """
+    Exportação dos boletins de várias turmas (escola inteira ou filtrada) para MEDIA_ROOT.
+    O progresso é gravado por turma em ExportacaoTurma, o que permite retomar a
+    exportação depois de uma queda sem renderizar de novo as turmas já concluídas.
+    """
+    STATUS_CHOICES = [
+        ('PENDENTE', 'Pendente'),
+        ('EXECUTANDO', 'Executando'),
+        ('CONCLUIDA', 'Concluída'),
+        ('ERRO', 'Erro'),
+    ]
+    
+    UNIDADE_CHOICES = [
+        ('NF', 'Nova Friburgo'),
+        ('RB', 'Rio Bonito'),
+    ]
+    
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDENTE', db_index=True)
+    
+    # Filtros (vazios = todas as turmas)
+    tipo_turma = models.ForeignKey(TipoTurma, on_delete=models.SET_NULL, null=True, blank=True)
+    professor = models.ForeignKey(Professor, on_delete=models.SET_NULL, null=True, blank=True)
+    unidade = models.CharField(max_length=2, choices=UNIDADE_CHOICES, blank=True)
+    
+    criado_por = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    arquivo = models.CharField(max_length=255, blank=True, help_text="Caminho do ZIP final, relativo a MEDIA_ROOT")
+    erro = models.TextField(blank=True)
+    
+    data_criacao = models.DateTimeField(auto_now_add=True)
+    data_inicio = models.DateTimeField(null=True, blank=True)
+    data_conclusao = models.DateTimeField(null=True, blank=True)
+    data_atualizacao = models.DateTimeField(auto_now=True, help_text="Atualizado a cada turma (sinal de vida da execução)")
+    
+    class Meta:
+        verbose_name = "Exportação de Boletins"
+        verbose_name_plural = "Exportações de Boletins"
+        ordering = ['-data_criacao']
+    
+    def __str__(self):
+        status_display = dict(self.STATUS_CHOICES).get(self.status, self.status)
+        return f"Exportação #{self.pk} ({status_display})"
+    
+    @property
+    def pasta(self):
+        """Pasta da exportação, relativa a MEDIA_ROOT"""
+        return f"boletins/exportacoes/{self.pk}"
+
+
+class ExportacaoTurma(models.Model):
+    """
+    Progresso de uma turma dentro de uma exportação de boletins
+    """
+    STATUS_CHOICES = [
+        ('PENDENTE', 'Pendente'),
+        ('CONCLUIDA', 'Concluída'),
+        ('ERRO', 'Erro'),
+    ]
+    
+    exportacao = models.ForeignKey(ExportacaoBoletins, on_delete=models.CASCADE, related_name='turmas')
+    turma = models.ForeignKey(Turma, on_delete=models.CASCADE, related_name='exportacoes')
+    ordem = models.PositiveIntegerField(default=0)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDENTE')
+    total_alunos = models.PositiveIntegerField(default=0)
+    boletins_gerados = models.PositiveIntegerField(default=0)
+    falhas = models.JSONField(default=list, blank=True, help_text="[{'aluno': nome, 'erro': mensagem}]")
+    data_conclusao = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        verbose_name = "Turma da Exportação"
+        verbose_name_plural = "Turmas da Exportação"
+        ordering = ['exportacao', 'ordem']
+        unique_together = ['exportacao', 'turma']
+    
+    def __str__(self):
+        return f"{self.exportacao} - {self.turma.nome}"
+
+
 class UserPreference(models.Model):
     """
     Preferências de personalização do usuário para o dashboard
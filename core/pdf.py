@@ -0,0 +1,157 @@
+"""
+Boletins em PDF a partir de templates HTML (WeasyPrint)
+
+Cada boletim_tipo tem o seu template em core/templates/boletins/html/<tipo>.html,
+que desenha o boletim de um aluno. Os boletins de uma turma são reunidos num
+único documento HTML e convertidos em um PDF só, numa única passada de layout
+(um aluno por página).
+
+A folha de estilo (boletim.css) e a configuração de fontes são carregadas uma
+vez por processo e reaproveitadas em todos os PDFs; só são recarregadas se o
+arquivo .css mudar.
+"""
+
+import logging
+import os
+import threading
+
+from django.conf import settings
+from django.template import TemplateDoesNotExist
+from django.template.loader import render_to_string
+
+from core.batch import BoletimBatchRenderer
+from core.boletim_data import BoletimDataLoader
+from core.progress import ProgressEngine
+
+logger = logging.getLogger(__name__)
+
+
+class PdfIndisponivelError(RuntimeError):
+    """WeasyPrint (ou as bibliotecas de sistema dele) não está disponível"""
+
+
+class BoletimPdfRenderer:
+    """
+    Gera o PDF com os boletins de vários alunos
+
+    Uso:
+        pdf, falhas = BoletimPdfRenderer.gerar_pdf_turma(turma)
+    """
+
+    TEMPLATES_DIR = os.path.join(settings.BASE_DIR, 'core', 'templates', 'boletins', 'html')
+    CSS_PATH = os.path.join(TEMPLATES_DIR, 'boletim.css')
+
+    _estilo = None
+    _estilo_lock = threading.Lock()
+
+    @staticmethod
+    def _weasyprint():
+        """Importa o WeasyPrint só quando um PDF é pedido"""
+        try:
+            import weasyprint
+        except (ImportError, OSError) as e:
+            # OSError: pacote instalado, mas sem as bibliotecas do sistema (Pango)
+            raise PdfIndisponivelError(f'Geração de PDF indisponível: {e}') from e
+        return weasyprint
+
+    @classmethod
+    def _folha_de_estilo(cls):
+        """
+        Folha de estilo compilada e configuração de fontes, compartilhadas por
+        todos os PDFs do processo
+
+        Returns:
+            tuple: (weasyprint.CSS, FontConfiguration)
+        """
+        weasyprint = cls._weasyprint()
+        from weasyprint.text.fonts import FontConfiguration
+
+        mtime_ns = os.stat(cls.CSS_PATH).st_mtime_ns
+        with cls._estilo_lock:
+            if cls._estilo is None or cls._estilo['mtime_ns'] != mtime_ns:
+                font_config = FontConfiguration()
+                cls._estilo = {
+                    'mtime_ns': mtime_ns,
+                    'css': weasyprint.CSS(filename=cls.CSS_PATH, font_config=font_config),
+                    'font_config': font_config,
+                }
+            return cls._estilo['css'], cls._estilo['font_config']
+
+    @classmethod
+    def limpar_cache_estilo(cls):
+        """Descarta a folha de estilo carregada (recarregada no próximo PDF)"""
+        with cls._estilo_lock:
+            cls._estilo = None
+
+    @staticmethod
+    def renderizar_html(boletim_tipo, substituicoes):
+        """
+        HTML do boletim de um aluno (uma <section class="boletim">)
+
+        Raises:
+            ValueError: Se não houver template HTML para o tipo de boletim
+        """
+        try:
+            return render_to_string(f'boletins/html/{boletim_tipo}.html', {'s': substituicoes})
+        except TemplateDoesNotExist:
+            raise ValueError(f"Tipo de boletim '{boletim_tipo}' não encontrado")
+
+    @staticmethod
+    def montar_documento(alunos, titulo='Boletins'):
+        """
+        Documento HTML com os boletins de todos os alunos, na ordem recebida
+
+        Returns:
+            tuple: (html, boletins gerados, falhas), falhas = [{'aluno': nome, 'erro': mensagem}]
+        """
+        boletins = []
+        falhas = []
+        for dados in BoletimBatchRenderer.preparar(alunos):
+            if dados['erro'] is None:
+                try:
+                    boletins.append(
+                        BoletimPdfRenderer.renderizar_html(dados['boletim_tipo'], dados['substituicoes'])
+                    )
+                    continue
+                except Exception as e:
+                    dados['erro'] = str(e)
+            logger.error(f"Erro ao gerar boletim em PDF para {dados['nome']}: {dados['erro']}")
+            falhas.append({'aluno': dados['nome'], 'erro': dados['erro']})
+
+        html = render_to_string('boletins/html/documento.html', {'titulo': titulo, 'boletins': boletins})
+        return html, len(boletins), falhas
+
+    @classmethod
+    def gerar_pdf(cls, alunos, titulo='Boletins'):
+        """
+        PDF único com os boletins dos alunos (um por página)
+
+        Returns:
+            tuple: (bytes do PDF ou None se nenhum boletim foi gerado, falhas)
+
+        Raises:
+            PdfIndisponivelError: Se o WeasyPrint não puder ser carregado
+        """
+        css, font_config = cls._folha_de_estilo()
+        html, gerados, falhas = cls.montar_documento(alunos, titulo=titulo)
+        if not gerados:
+            return None, falhas
+
+        weasyprint = cls._weasyprint()
+        pdf = weasyprint.HTML(string=html, base_url=cls.TEMPLATES_DIR).write_pdf(
+            stylesheets=[css],
+            font_config=font_config,
+        )
+        return pdf, falhas
+
+    @classmethod
+    def gerar_pdf_turma(cls, turma, somente_completos=True):
+        """
+        PDF com os boletins dos alunos ativos de uma turma (por padrão, só dos
+        que têm todas as notas lançadas)
+        """
+        alunos = BoletimDataLoader.queryset_alunos(turma)
+        if somente_completos:
+            completude = ProgressEngine.completude_alunos(turma)
+            alunos = [aluno for aluno in alunos if completude[aluno.id]['completo']]
+        return cls.gerar_pdf(alunos, titulo=f'Boletins - {turma.nome}')
@@ -0,0 +1,570 @@
+"""
+Motor de progresso do Sistema de Notas
+
+Calcula, para um conjunto de turmas, o total de alunos, competências,
+notas lançadas, notas possíveis e alunos completos usando um número fixo
+de queries (independente da quantidade de turmas ou alunos).
+
+O ProgressStore mantém esses números pré-agregados nas tabelas
+ProgressoTurma/ProgressoAluno, atualizadas a cada lançamento de nota.
+
+O TurmaRoster guarda em cache, por turma, a lista de alunos com o progresso
+de cada um e os vizinhos (anterior/próximo) usados na navegação do lançamento.
+"""
+
+from collections import defaultdict
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q, Sum, F, Value, Case, When, IntegerField
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from core.models import Turma, Aluno, LancamentoDeNota, ProgressoTurma, ProgressoAluno
+from core.catalog import CompetenciaRegistry
+
+
+class ProgressEngine:
+    """
+    Calcula o progresso de lançamento de notas de várias turmas de uma vez
+    """
+
+    @staticmethod
+    def competencias_por_boletim():
+        """
+        Retorna {boletim_tipo: [ids de competência]} a partir do catálogo em memória
+        (no máximo uma query, quando o catálogo precisa ser recarregado)
+        """
+        mapa = CompetenciaRegistry.mapa()
+        return {
+            boletim_tipo: mapa.get(boletim_tipo, [])
+            for boletim_tipo in Turma.COMPETENCIAS_POR_BOLETIM
+        }
+
+    @staticmethod
+    def _notas_do_boletim(turma_ids, competencias_map):
+        """
+        Retorna o queryset de notas que contam para o progresso: apenas as
+        competências do boletim da turma de cada aluno (ou None se não houver).
+        O filtro é um join com o catálogo CompetenciaBoletim.
+        """
+        if not turma_ids or not any(competencias_map.values()):
+            return None
+
+        return LancamentoDeNota.objects.filter(
+            aluno__turma_id__in=turma_ids,
+            competencia__boletins__boletim_tipo=F('aluno__turma__boletim_tipo')
+        ).order_by()
+
+    @staticmethod
+    def notas_por_aluno(turma_ids, competencias_map):
+        """
+        Conta as notas lançadas de cada aluno, considerando apenas as
+        competências do boletim da sua turma.
+
+        Returns:
+            dict: {aluno_id: (turma_id, notas_lancadas)}
+        """
+        notas = ProgressEngine._notas_do_boletim(turma_ids, competencias_map)
+        if notas is None:
+            return {}
+
+        linhas = notas.values('aluno_id', 'aluno__turma_id').annotate(total=Count('id'))
+
+        return {
+            linha['aluno_id']: (linha['aluno__turma_id'], linha['total'])
+            for linha in linhas
+        }
+
+    @staticmethod
+    def notas_por_turma(turma_ids, competencias_map):
+        """
+        Conta as notas lançadas de cada turma com uma query agrupada
+
+        Returns:
+            dict: {turma_id: notas_lancadas}
+        """
+        notas = ProgressEngine._notas_do_boletim(turma_ids, competencias_map)
+        if notas is None:
+            return {}
+
+        linhas = notas.values('aluno__turma_id').annotate(total=Count('id'))
+        return {linha['aluno__turma_id']: linha['total'] for linha in linhas}
+
+    @staticmethod
+    def alunos_completos_por_turma(turma_ids, competencias_map):
+        """
+        Conta os alunos com todas as notas do boletim lançadas, em uma única
+        query agrupada por aluno com HAVING (total de notas >= competências exigidas)
+
+        Returns:
+            dict: {turma_id: alunos_completos}
+        """
+        notas = ProgressEngine._notas_do_boletim(turma_ids, competencias_map)
+        if notas is None:
+            return {}
+
+        exigido = Case(
+            *[
+                When(aluno__turma__boletim_tipo=boletim_tipo, then=Value(len(comp_ids)))
+                for boletim_tipo, comp_ids in competencias_map.items() if comp_ids
+            ],
+            default=Value(0),
+            output_field=IntegerField()
+        )
+        linhas = notas.values('aluno_id', 'aluno__turma_id').annotate(
+            total=Count('id'),
+            exigido=exigido
+        ).filter(total__gte=F('exigido')).values_list('aluno__turma_id', flat=True)
+
+        completos = defaultdict(int)
+        for turma_id in linhas:
+            completos[turma_id] += 1
+        return completos
+
+    @staticmethod
+    def completude_alunos(turmas):
+        """
+        Situação de lançamento de cada aluno ativo das turmas, com um número fixo
+        de queries (alunos + notas do boletim), sem depender do tamanho das turmas
+
+        Args:
+            turmas: Uma Turma ou um iterável de Turma/IDs
+
+        Returns:
+            dict: {aluno_id: {'aluno_id', 'nome', 'turma_id', 'notas_lancadas',
+                   'total_competencias', 'progresso', 'completo', 'faltando'}},
+                  em ordem de turma e nome; 'faltando' lista os nomes das
+                  competências do boletim ainda sem nota
+        """
+        if isinstance(turmas, Turma):
+            turmas = [turmas]
+        turma_ids = [turma.pk if isinstance(turma, Turma) else turma for turma in turmas]
+
+        alunos = Aluno.objects.filter(turma_id__in=turma_ids, ativo=True).order_by(
+            'turma_id', 'nome_completo', 'id'
+        ).values_list('id', 'nome_completo', 'turma_id', 'turma__boletim_tipo')
+
+        competencias_map = ProgressEngine.competencias_por_boletim()
+        lancadas = defaultdict(set)
+        notas = ProgressEngine._notas_do_boletim(turma_ids, competencias_map)
+        if notas is not None:
+            for aluno_id, competencia_id in notas.filter(aluno__ativo=True).values_list('aluno_id', 'competencia_id'):
+                lancadas[aluno_id].add(competencia_id)
+
+        competencias_por_tipo = {}
+        resultado = {}
+        for aluno_id, nome, turma_id, boletim_tipo in alunos:
+            if boletim_tipo not in competencias_por_tipo:
+                competencias_por_tipo[boletim_tipo] = CompetenciaRegistry.competencias(boletim_tipo)
+            competencias = competencias_por_tipo[boletim_tipo]
+            total_competencias = len(competencias)
+            notas_lancadas = len(lancadas.get(aluno_id, ()))
+            resultado[aluno_id] = {
+                'aluno_id': aluno_id,
+                'nome': nome,
+                'turma_id': turma_id,
+                'notas_lancadas': notas_lancadas,
+                'total_competencias': total_competencias,
+                'progresso': int((notas_lancadas / total_competencias) * 100) if total_competencias > 0 else 0,
+                'completo': total_competencias > 0 and notas_lancadas >= total_competencias,
+                'faltando': [
+                    competencia.nome for competencia in competencias
+                    if competencia.id not in lancadas.get(aluno_id, ())
+                ],
+            }
+        return resultado
+
+    @staticmethod
+    def progresso_turmas(turmas=None, professor=None):
+        """
+        Calcula as estatísticas de progresso de todas as turmas informadas
+
+        Args:
+            turmas: QuerySet de Turma (padrão: todas as turmas)
+            professor: Se informado, filtra as turmas do professor
+
+        Returns:
+            list: Um dicionário por turma, na ordem do queryset, com as chaves
+                  turma, total_alunos, total_competencias, notas_lancadas,
+                  total_notas_possiveis, progresso_turma, alunos_completos e
+                  alunos_completos_percent
+        """
+        if turmas is None:
+            turmas = Turma.objects.all()
+        if professor is not None:
+            turmas = turmas.filter(professor_responsavel=professor)
+        if not turmas.query.order_by:
+            # O Meta.ordering não é aplicado em queries com GROUP BY
+            turmas = turmas.order_by(*Turma._meta.ordering)
+
+        turmas = list(
+            turmas.select_related('tipo_turma', 'professor_responsavel__user')
+            .annotate(total_alunos=Count('alunos'))
+        )
+
+        turma_ids = [t.id for t in turmas]
+        competencias_map = ProgressEngine.competencias_por_boletim()
+        notas_por_turma = ProgressEngine.notas_por_turma(turma_ids, competencias_map)
+        completos_por_turma = ProgressEngine.alunos_completos_por_turma(turma_ids, competencias_map)
+
+        resultado = []
+        for turma in turmas:
+            total_alunos = turma.total_alunos
+            total_competencias = len(competencias_map.get(turma.boletim_tipo, []))
+            total_notas_possiveis = total_alunos * total_competencias
+            notas_lancadas = notas_por_turma.get(turma.id, 0)
+            alunos_completos = completos_por_turma.get(turma.id, 0)
+
+            resultado.append({
+                'turma': turma,
+                'total_alunos': total_alunos,
+                'total_competencias': total_competencias,
+                'notas_lancadas': notas_lancadas,
+                'total_notas_possiveis': total_notas_possiveis,
+                'progresso_turma': int((notas_lancadas / total_notas_possiveis) * 100) if total_notas_possiveis > 0 else 0,
+                'alunos_completos': alunos_completos,
+                'alunos_completos_percent': int((alunos_completos / total_alunos) * 100) if total_alunos > 0 else 0,
+            })
+
+        return resultado
+
+
+class ProgressStore:
+    """
+    Mantém as tabelas ProgressoTurma/ProgressoAluno sincronizadas com os lançamentos.
+
+    Os signals de core.signals chamam estes métodos automaticamente. Operações em
+    lote que não disparam signals (bulk_create, queryset.update) devem chamar
+    recalcular_aluno() ou reconstruir() explicitamente.
+    """
+
+    @staticmethod
+    def registrar_nota(aluno_id, competencia_id, delta):
+        """
+        Aplica um incremento (+1 ao criar, -1 ao remover uma nota) aos contadores
+        do aluno e da sua turma
+        """
+        contexto = Aluno.objects.filter(pk=aluno_id).values_list('turma_id', 'turma__boletim_tipo').first()
+        if contexto is None:
+            return
+
+        turma_id, boletim_tipo = contexto
+        comp_ids = ProgressEngine.competencias_por_boletim().get(boletim_tipo, [])
+        if competencia_id not in comp_ids:
+            return
+
+        with transaction.atomic():
+            progresso = ProgressoAluno.objects.select_for_update().filter(aluno_id=aluno_id).first()
+            if progresso is None:
+                # Aluno ainda sem linha no store (ex: dados anteriores à tabela)
+                if delta > 0:
+                    ProgressStore.recalcular_aluno(aluno_id)
+                return
+
+            estava_completo = progresso.completo
+            progresso.notas_lancadas = max(progresso.notas_lancadas + delta, 0)
+            progresso.completo = (
+                progresso.total_competencias > 0
+                and progresso.notas_lancadas >= progresso.total_competencias
+            )
+            progresso.save(update_fields=['notas_lancadas', 'completo', 'data_atualizacao'])
+
+            delta_completos = int(progresso.completo) - int(estava_completo)
+            ProgressoTurma.objects.filter(turma_id=progresso.turma_id).update(
+                notas_lancadas=Greatest(F('notas_lancadas') + delta, Value(0)),
+                alunos_completos=Greatest(F('alunos_completos') + delta_completos, Value(0)),
+                data_atualizacao=timezone.now()
+            )
+
+    @staticmethod
+    def recalcular_aluno(aluno_id):
+        """
+        Recalcula do zero a linha de um aluno (ex: mudou de turma ou de status)
+        e reagrega as turmas afetadas
+        """
+        with transaction.atomic():
+            turma_anterior = ProgressoAluno.objects.filter(aluno_id=aluno_id).values_list('turma_id', flat=True).first()
+            aluno = Aluno.objects.filter(pk=aluno_id).values('turma_id', 'turma__boletim_tipo', 'ativo').first()
+
+            turmas_afetadas = {turma_anterior}
+            if aluno is None:
+                ProgressoAluno.objects.filter(aluno_id=aluno_id).delete()
+            else:
+                comp_ids = ProgressEngine.competencias_por_boletim().get(aluno['turma__boletim_tipo'], [])
+                notas_lancadas = LancamentoDeNota.objects.filter(
+                    aluno_id=aluno_id,
+                    competencia_id__in=comp_ids
+                ).count() if comp_ids else 0
+
+                ProgressoAluno.objects.update_or_create(
+                    aluno_id=aluno_id,
+                    defaults={
+                        'turma_id': aluno['turma_id'],
+                        'ativo': aluno['ativo'],
+                        'notas_lancadas': notas_lancadas,
+                        'total_competencias': len(comp_ids),
+                        'completo': bool(comp_ids) and notas_lancadas >= len(comp_ids),
+                    }
+                )
+                turmas_afetadas.add(aluno['turma_id'])
+
+            for turma_id in turmas_afetadas - {None}:
+                ProgressStore.agregar_turma(turma_id)
+
+    @staticmethod
+    def agregar_turma(turma_id):
+        """
+        Reagrega os contadores de uma turma a partir das linhas de ProgressoAluno.
+        Não cria a linha da turma (ela pode estar sendo excluída em cascata).
+        """
+        totais = ProgressoAluno.objects.filter(turma_id=turma_id).aggregate(
+            total_alunos=Count('id'),
+            alunos_ativos=Count('id', filter=Q(ativo=True)),
+            notas_lancadas=Sum('notas_lancadas'),
+            alunos_completos=Count('id', filter=Q(completo=True)),
+        )
+        ProgressoTurma.objects.filter(turma_id=turma_id).update(
+            total_alunos=totais['total_alunos'],
+            alunos_ativos=totais['alunos_ativos'],
+            notas_lancadas=totais['notas_lancadas'] or 0,
+            alunos_completos=totais['alunos_completos'],
+            data_atualizacao=timezone.now()
+        )
+
+    @staticmethod
+    def reconstruir(turma_ids=None):
+        """
+        Reconstrói o store a partir dos dados reais com um número fixo de queries
+
+        Args:
+            turma_ids: Lista de turmas a reconstruir (padrão: todas)
+
+        Returns:
+            int: Quantidade de turmas reconstruídas
+        """
+        turmas = Turma.objects.all()
+        if turma_ids is not None:
+            turmas = turmas.filter(pk__in=turma_ids)
+        turmas = list(turmas.values_list('id', 'boletim_tipo'))
+        ids = [turma_id for turma_id, _ in turmas]
+
+        competencias_map = ProgressEngine.competencias_por_boletim()
+        notas_map = ProgressEngine.notas_por_aluno(ids, competencias_map)
+        total_competencias_turma = {
+            turma_id: len(competencias_map.get(boletim_tipo, [])) for turma_id, boletim_tipo in turmas
+        }
+
+        linhas_alunos = []
+        totais_turma = {turma_id: defaultdict(int) for turma_id in ids}
+        for aluno_id, turma_id, ativo in Aluno.objects.filter(turma_id__in=ids).values_list('id', 'turma_id', 'ativo'):
+            total_competencias = total_competencias_turma[turma_id]
+            notas_lancadas = notas_map.get(aluno_id, (turma_id, 0))[1]
+            completo = total_competencias > 0 and notas_lancadas >= total_competencias
+
+            linhas_alunos.append(ProgressoAluno(
+                aluno_id=aluno_id,
+                turma_id=turma_id,
+                ativo=ativo,
+                notas_lancadas=notas_lancadas,
+                total_competencias=total_competencias,
+                completo=completo,
+            ))
+            totais = totais_turma[turma_id]
+            totais['total_alunos'] += 1
+            totais['alunos_ativos'] += int(ativo)
+            totais['notas_lancadas'] += notas_lancadas
+            totais['alunos_completos'] += int(completo)
+
+        with transaction.atomic():
+            ProgressoAluno.objects.filter(
+                Q(turma_id__in=ids) | Q(aluno__turma_id__in=ids)
+            ).delete()
+            ProgressoTurma.objects.filter(turma_id__in=ids).delete()
+
+            ProgressoAluno.objects.bulk_create(linhas_alunos, batch_size=500)
+            ProgressoTurma.objects.bulk_create([
+                ProgressoTurma(
+                    turma_id=turma_id,
+                    total_competencias=total_competencias_turma[turma_id],
+                    **totais_turma[turma_id]
+                )
+                for turma_id in ids
+            ], batch_size=500)
+
+        return len(ids)
+
+    @staticmethod
+    def verificar():
+        """
+        Compara o store com os dados reais
+
+        Returns:
+            list: Descrição de cada divergência encontrada (vazia se tudo confere)
+        """
+        divergencias = []
+        armazenado = {p.turma_id: p for p in ProgressoTurma.objects.all()}
+        campos = ['total_alunos', 'total_competencias', 'notas_lancadas', 'alunos_completos']
+
+        for info in ProgressEngine.progresso_turmas():
+            turma = info['turma']
+            progresso = armazenado.pop(turma.id, None)
+            if progresso is None:
+                divergencias.append(f"Turma {turma.nome}: sem linha de progresso")
+                continue
+            for campo in campos:
+                if getattr(progresso, campo) != info[campo]:
+                    divergencias.append(
+                        f"Turma {turma.nome}: {campo} armazenado={getattr(progresso, campo)} real={info[campo]}"
+                    )
+
+        for turma_id in armazenado:
+            divergencias.append(f"Turma #{turma_id}: linha de progresso órfã")
+
+        return divergencias
+
+    @staticmethod
+    def progresso_turmas(turmas=None, professor=None):
+        """
+        Lê o progresso pré-agregado das turmas (mesmo formato de ProgressEngine.progresso_turmas).
+        Turmas sem linha no store são reconstruídas na hora.
+        """
+        if turmas is None:
+            turmas = Turma.objects.all()
+        if professor is not None:
+            turmas = turmas.filter(professor_responsavel=professor)
+
+        turmas = turmas.select_related('tipo_turma', 'professor_responsavel__user', 'progresso')
+        turmas_lista = list(turmas)
+
+        sem_progresso = [t.id for t in turmas_lista if not hasattr(t, 'progresso')]
+        if sem_progresso:
+            ProgressStore.reconstruir(sem_progresso)
+            turmas_lista = list(turmas)
+
+        resultado = []
+        for turma in turmas_lista:
+            progresso = turma.progresso
+            total_notas_possiveis = progresso.total_alunos * progresso.total_competencias
+
+            resultado.append({
+                'turma': turma,
+                'total_alunos': progresso.total_alunos,
+                'alunos_ativos': progresso.alunos_ativos,
+                'total_competencias': progresso.total_competencias,
+                'notas_lancadas': progresso.notas_lancadas,
+                'total_notas_possiveis': total_notas_possiveis,
+                'progresso_turma': int((progresso.notas_lancadas / total_notas_possiveis) * 100) if total_notas_possiveis > 0 else 0,
+                'alunos_completos': progresso.alunos_completos,
+                'alunos_completos_percent': int((progresso.alunos_completos / progresso.total_alunos) * 100) if progresso.total_alunos > 0 else 0,
+            })
+
+        return resultado
+
+
+class TurmaRoster:
+    """
+    Lista de alunos de uma turma (ordem alfabética) com o progresso de cada um e os
+    vizinhos anterior/próximo, montada com uma única query anotada e guardada em cache
+    por turma.
+
+    A chave inclui ProgressoTurma.data_atualizacao: o cache padrão (LocMemCache) é por
+    processo, então em vez de apagar a lista (o que só valeria para o processo atual)
+    cada mudança avança essa data e nenhum processo lê de novo a lista anterior. As
+    gravações do ProgressStore já avançam a data; os signals de Aluno chamam invalidar().
+    """
+
+    TTL_SEGUNDOS = 300
+
+    @staticmethod
+    def chave(turma_id, versao):
+        return f'turma_roster_{turma_id}_{versao.timestamp()}'
+
+    @staticmethod
+    def invalidar(turma_ids):
+        """Muda a versão da lista das turmas informadas (aluno renomeado, removido...)"""
+        if turma_ids:
+            ProgressoTurma.objects.filter(turma_id__in=turma_ids).update(data_atualizacao=timezone.now())
+
+    @staticmethod
+    def _montar(turma, comp_ids):
+        """
+        Monta a lista da turma com uma query (alunos + contagem de notas do boletim)
+
+        Returns:
+            dict: {'competencias': ids do boletim, 'alunos': [...], 'posicoes': {aluno_id: índice}}
+        """
+        if comp_ids:
+            notas_lancadas = Count(
+                'lancamentos_de_nota',
+                filter=Q(lancamentos_de_nota__competencia_id__in=comp_ids)
+            )
+        else:
+            notas_lancadas = Value(0, output_field=IntegerField())
+
+        linhas = list(
+            Aluno.objects.filter(turma_id=turma.pk)
+            .annotate(notas_lancadas=notas_lancadas)
+            .order_by('nome_completo', 'id')
+            .values('id', 'nome_completo', 'ativo', 'notas_lancadas')
+        )
+
+        total_competencias = len(comp_ids)
+        alunos = []
+        for indice, linha in enumerate(linhas):
+            alunos.append({
+                'id': linha['id'],
+                'nome_completo': linha['nome_completo'],
+                'ativo': linha['ativo'],
+                'notas_lancadas': linha['notas_lancadas'],
+                'progresso': int((linha['notas_lancadas'] / total_competencias) * 100) if total_competencias > 0 else 0,
+                'anterior': linhas[indice - 1]['id'] if indice > 0 else None,
+                'proximo': linhas[indice + 1]['id'] if indice + 1 < len(linhas) else None,
+            })
+
+        return {
+            'competencias': comp_ids,
+            'alunos': alunos,
+            'posicoes': {aluno['id']: indice for indice, aluno in enumerate(alunos)},
+        }
+
+    @staticmethod
+    def _carregar(turma):
+        """
+        Lê a lista da turma do cache (1 query para a versão), remontando-a se faltar
+        ou se o catálogo mudou. Turma ainda sem ProgressoTurma: monta sem guardar.
+        """
+        comp_ids = CompetenciaRegistry.ids(turma.boletim_tipo)
+        versao = ProgressoTurma.objects.filter(turma_id=turma.pk).values_list('data_atualizacao', flat=True).first()
+        if versao is None:
+            return TurmaRoster._montar(turma, comp_ids)
+
+        chave = TurmaRoster.chave(turma.pk, versao)
+        roster = cache.get(chave)
+        if roster is None or roster['competencias'] != comp_ids:
+            roster = TurmaRoster._montar(turma, comp_ids)
+            cache.set(chave, roster, TurmaRoster.TTL_SEGUNDOS)
+        return roster
+
+    @staticmethod
+    def alunos(turma):
+        """
+        Alunos da turma em ordem alfabética
+
+        Returns:
+            list: [{'id', 'nome_completo', 'ativo', 'notas_lancadas', 'progresso', 'anterior', 'proximo'}]
+        """
+        return TurmaRoster._carregar(turma)['alunos']
+
+    @staticmethod
+    def vizinhos(turma, aluno_id):
+        """
+        Retorna (anterior_id, proximo_id) do aluno na lista da turma, com None nas
+        pontas, ou None se o aluno não estiver na turma
+        """
+        roster = TurmaRoster._carregar(turma)
+        indice = roster['posicoes'].get(aluno_id)
+        if indice is None:
+            return None
+        aluno = roster['alunos'][indice]
+        return aluno['anterior'], aluno['proximo']
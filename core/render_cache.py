@@ -0,0 +1,197 @@
+"""
+Cache de boletins renderizados, endereçado pelo conteúdo
+
+A chave de cada boletim é o hash de: versão do renderizador + hash do template +
+todas as substituições do aluno (dados básicos, notas e nota_final). Se nada
+disso mudou, o .docx já gerado é servido direto do disco; qualquer nota ou
+template diferente gera outra chave e o boletim é renderizado de novo.
+
+Os arquivos ficam em BOLETIM_CACHE_DIR (padrão: MEDIA_ROOT/boletins/cache), com
+tamanho limitado por BOLETIM_CACHE_MAX_MB. Ao passar do limite, os boletins usados
+há mais tempo são removidos (LRU pelo mtime, atualizado a cada acerto).
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class BoletimCache:
+    """
+    Armazena e recupera boletins (.docx em bytes) pela chave de conteúdo
+    """
+
+    # Mudanças na forma de renderizar (não no template) devem incrementar a versão
+    VERSAO_RENDER = 1
+
+    # Ao estourar o limite, remove até ficar com esta fração do máximo
+    FRACAO_APOS_LIMPEZA = 0.9
+
+    _lock = threading.Lock()
+    _tamanho_estimado = None
+
+    @staticmethod
+    def diretorio():
+        return getattr(settings, 'BOLETIM_CACHE_DIR', None) or os.path.join(
+            settings.MEDIA_ROOT, 'boletins', 'cache'
+        )
+
+    @staticmethod
+    def limite_bytes():
+        """Tamanho máximo do cache em bytes (0 desativa o cache)"""
+        return getattr(settings, 'BOLETIM_CACHE_MAX_MB', 500) * 1024 * 1024
+
+    @staticmethod
+    def ativo():
+        return BoletimCache.limite_bytes() > 0
+
+    @staticmethod
+    def chave(boletim_tipo, substituicoes):
+        """
+        Chave de conteúdo de um boletim
+
+        Raises:
+            ValueError/FileNotFoundError: Se o template do boletim não existir
+        """
+        from core.utils import BoletimGenerator
+
+        conteudo = json.dumps(
+            {
+                'versao': BoletimCache.VERSAO_RENDER,
+                'template': BoletimGenerator.hash_template(boletim_tipo),
+                'boletim_tipo': boletim_tipo,
+                'substituicoes': {chave: str(valor) for chave, valor in substituicoes.items()},
+            },
+            sort_keys=True,
+            ensure_ascii=False,
+        )
+        return hashlib.sha256(conteudo.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def _caminho(chave):
+        return os.path.join(BoletimCache.diretorio(), chave[:2], f'{chave}.docx')
+
+    @staticmethod
+    def contem(chave):
+        return os.path.exists(BoletimCache._caminho(chave))
+
+    @staticmethod
+    def obter(chave):
+        """
+        Retorna os bytes do boletim em cache (ou None) e o marca como usado agora
+        """
+        caminho = BoletimCache._caminho(chave)
+        try:
+            with open(caminho, 'rb') as arquivo:
+                conteudo = arquivo.read()
+            os.utime(caminho)
+        except FileNotFoundError:
+            return None
+        return conteudo
+
+    @classmethod
+    def guardar(cls, chave, conteudo):
+        """Grava um boletim no cache (escrita atômica) e aplica o limite de tamanho"""
+        caminho = cls._caminho(chave)
+        pasta = os.path.dirname(caminho)
+        os.makedirs(pasta, exist_ok=True)
+
+        descritor, temporario = tempfile.mkstemp(dir=pasta, suffix='.tmp')
+        try:
+            with os.fdopen(descritor, 'wb') as arquivo:
+                arquivo.write(conteudo)
+            os.replace(temporario, caminho)
+        except OSError:
+            logger.exception(f'Não foi possível gravar o boletim {chave} no cache')
+            if os.path.exists(temporario):
+                os.remove(temporario)
+            return
+
+        with cls._lock:
+            if cls._tamanho_estimado is None:
+                cls._tamanho_estimado = sum(tamanho for _, _, tamanho in cls._entradas())
+            else:
+                cls._tamanho_estimado += len(conteudo)
+            estourou = cls._tamanho_estimado > cls.limite_bytes()
+
+        if estourou:
+            cls.limpar()
+
+    @staticmethod
+    def _entradas():
+        """Lista (caminho, mtime, tamanho) de todos os boletins em cache"""
+        entradas = []
+        diretorio = BoletimCache.diretorio()
+        if not os.path.isdir(diretorio):
+            return entradas
+        for pasta, _, arquivos in os.walk(diretorio):
+            for nome in arquivos:
+                if not nome.endswith('.docx'):
+                    continue
+                caminho = os.path.join(pasta, nome)
+                try:
+                    stat = os.stat(caminho)
+                except FileNotFoundError:
+                    continue
+                entradas.append((caminho, stat.st_mtime, stat.st_size))
+        return entradas
+
+    @classmethod
+    def limpar(cls, max_bytes=None, idade_maxima=None, tudo=False):
+        """
+        Remove boletins do cache, dos usados há mais tempo para os mais recentes
+
+        Args:
+            max_bytes: Limite a respeitar (padrão: BOLETIM_CACHE_MAX_MB). Se passar
+                       dele, o cache é reduzido a FRACAO_APOS_LIMPEZA do limite.
+            idade_maxima: Remove também boletins não usados há mais de N segundos
+            tudo: Esvazia o cache
+
+        Returns:
+            dict: {'removidos', 'bytes_liberados', 'restantes', 'bytes_restantes'}
+        """
+        limite = cls.limite_bytes() if max_bytes is None else max_bytes
+        entradas = sorted(cls._entradas(), key=lambda entrada: entrada[1])
+        total = sum(tamanho for _, _, tamanho in entradas)
+        agora = time.time()
+
+        alvo = total
+        if tudo:
+            alvo = 0
+        elif total > limite:
+            alvo = int(limite * cls.FRACAO_APOS_LIMPEZA)
+
+        removidos = 0
+        liberados = 0
+        restantes = []
+        for caminho, mtime, tamanho in entradas:
+            expirado = idade_maxima is not None and agora - mtime > idade_maxima
+            if total - liberados > alvo or expirado:
+                try:
+                    os.remove(caminho)
+                except FileNotFoundError:
+                    pass
+                removidos += 1
+                liberados += tamanho
+            else:
+                restantes.append(tamanho)
+
+        with cls._lock:
+            cls._tamanho_estimado = sum(restantes)
+
+        if removidos:
+            logger.info(f'Cache de boletins: {removidos} removido(s), {liberados} bytes liberados')
+        return {
+            'removidos': removidos,
+            'bytes_liberados': liberados,
+            'restantes': len(restantes),
+            'bytes_restantes': sum(restantes),
+        }
@@ -0,0 +1,121 @@
+"""
+Signals do Sistema de Notas
+
+Mantêm as tabelas de progresso (ProgressoTurma/ProgressoAluno) sincronizadas
+com os lançamentos de notas, alunos, turmas e competências, o valor numérico
+das notas (nota_numerica) coerente com o tipo de nota da competência e o
+catálogo de competências por boletim (CompetenciaBoletim) atualizado.
+"""
+
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from core.models import Turma, Aluno, Competencia, CompetenciaBoletim, LancamentoDeNota
+from core.catalog import CompetenciaRegistry
+from core.progress import ProgressStore, TurmaRoster
+
+
+@receiver(post_save, sender=LancamentoDeNota)
+def nota_salva(sender, instance, created, raw=False, **kwargs):
+    """Nova nota: incrementa os contadores do aluno e da turma"""
+    if raw or not created:
+        return
+    ProgressStore.registrar_nota(instance.aluno_id, instance.competencia_id, 1)
+
+
+@receiver(post_delete, sender=LancamentoDeNota)
+def nota_removida(sender, instance, **kwargs):
+    """Nota excluída: decrementa os contadores do aluno e da turma"""
+    ProgressStore.registrar_nota(instance.aluno_id, instance.competencia_id, -1)
+
+
+@receiver(pre_save, sender=Aluno)
+def aluno_antes_de_salvar(sender, instance, raw=False, **kwargs):
+    """Guarda turma e status anteriores para detectar mudanças"""
+    if raw or instance.pk is None:
+        instance._estado_anterior = None
+        return
+    instance._estado_anterior = Aluno.objects.filter(pk=instance.pk).values_list('turma_id', 'ativo').first()
+
+
+@receiver(post_save, sender=Aluno)
+def aluno_salvo(sender, instance, created, raw=False, **kwargs):
+    """Aluno novo, transferido ou (des)ativado: recalcula sua linha de progresso"""
+    if raw:
+        return
+    estado_anterior = getattr(instance, '_estado_anterior', None)
+    if created or estado_anterior != (instance.turma_id, instance.ativo):
+        ProgressStore.recalcular_aluno(instance.pk)
+    else:
+        # Nome ou outros dados alterados: a ordem da lista da turma pode mudar
+        TurmaRoster.invalidar([instance.turma_id])
+
+
+@receiver(post_delete, sender=Aluno)
+def aluno_removido(sender, instance, **kwargs):
+    """Aluno excluído: reagrega a turma (a linha do aluno sai em cascata e a lista da turma muda de versão)"""
+    ProgressStore.agregar_turma(instance.turma_id)
+
+
+@receiver(pre_save, sender=Turma)
+def turma_antes_de_salvar(sender, instance, raw=False, **kwargs):
+    """Guarda o tipo de boletim anterior para detectar mudanças"""
+    if raw or instance.pk is None:
+        instance._boletim_tipo_anterior = None
+        return
+    instance._boletim_tipo_anterior = Turma.objects.filter(pk=instance.pk).values_list('boletim_tipo', flat=True).first()
+
+
+@receiver(post_save, sender=Turma)
+def turma_salva(sender, instance, created, raw=False, **kwargs):
+    """Turma nova ou com boletim alterado: reconstrói o progresso da turma"""
+    if raw:
+        return
+    if created or getattr(instance, '_boletim_tipo_anterior', None) != instance.boletim_tipo:
+        ProgressStore.reconstruir([instance.pk])
+
+
+@receiver(pre_save, sender=Competencia)
+def competencia_antes_de_salvar(sender, instance, raw=False, **kwargs):
+    """Guarda nome e tipo de nota anteriores para detectar mudanças"""
+    if raw or instance.pk is None:
+        instance._estado_anterior = None
+        return
+    instance._estado_anterior = Competencia.objects.filter(pk=instance.pk).values_list('nome', 'tipo_nota').first()
+
+
+@receiver(post_save, sender=Competencia)
+def competencia_salva(sender, instance, created, raw=False, **kwargs):
+    """Competência nova ou renomeada: atualiza o catálogo dos boletins"""
+    if raw:
+        return
+    estado_anterior = getattr(instance, '_estado_anterior', None)
+    if created or estado_anterior is None or estado_anterior[0] != instance.nome:
+        CompetenciaRegistry.sincronizar_competencia(instance)
+
+
+@receiver(post_save, sender=Competencia)
+def competencia_tipo_nota_alterado(sender, instance, created, raw=False, **kwargs):
+    """Tipo de nota alterado: reconverte as notas já lançadas na competência"""
+    if raw or created:
+        return
+    estado_anterior = getattr(instance, '_estado_anterior', None)
+    if estado_anterior is not None and estado_anterior[1] != instance.tipo_nota:
+        LancamentoDeNota.atualizar_notas_numericas(instance.lancamentos_de_nota.all())
+
+
+@receiver(post_save, sender=Competencia)
+@receiver(post_delete, sender=Competencia)
+def competencia_alterada(sender, instance, raw=False, **kwargs):
+    """Competências mudam o total exigido por boletim: reconstrói todo o store"""
+    if raw:
+        return
+    CompetenciaRegistry.invalidar()
+    ProgressStore.reconstruir()
+
+
+@receiver(post_save, sender=CompetenciaBoletim)
+@receiver(post_delete, sender=CompetenciaBoletim)
+def catalogo_alterado(sender, instance, raw=False, **kwargs):
+    """Linha do catálogo alterada: descarta o catálogo em memória"""
+    CompetenciaRegistry.invalidar()
@@ -3,18 +3,75 @@ Testes Automatizados para o Sistema de Notas
 Execute com: python manage.py test
 """
 
-from django.test import TestCase, Client
+from django.test import TestCase, Client, override_settings
 from django.contrib.auth.models import User, Group
 from django.urls import reverse
 from django.core.files.uploadedfile import SimpleUploadedFile
 import json
 import io
+import re
+import unittest
 
 from core.models import (
     Professor, TipoTurma, Turma, Competencia, 
     Aluno, LancamentoDeNota, ConfiguracaoSistema
 )
 
+# Storage sem manifest para testes que renderizam templates (dispensa o collectstatic)
+STORAGES_TESTE = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+}
+
+
+class FabricaDadosMixin:
+    """
+    Fábricas compartilhadas pelos TestCases: competências do boletim adolescentes_adultos,
+    turmas com alunos e notas, e contagem de queries
+    """
+    
+    def _criar_competencias(self, tipo_nota='NUM'):
+        """Cria as competências do boletim adolescentes_adultos, na ordem do boletim"""
+        from core.catalog import CompetenciaRegistry
+        
+        competencias = [
+            Competencia.objects.create(nome=nome, tipo_nota=tipo_nota)
+            for nome in Turma.COMPETENCIAS_POR_BOLETIM['adolescentes_adultos']
+        ]
+        CompetenciaRegistry.invalidar()
+        return competencias
+    
+    def _criar_turma(self, identificador, notas_por_aluno=()):
+        """
+        Turma adolescentes_adultos de self.tipo_turma e self.professor, com um aluno
+        para cada item de notas_por_aluno ({competencia: valor})
+        """
+        turma = Turma.objects.create(
+            tipo_turma=self.tipo_turma,
+            identificador_turma=identificador,
+            professor_responsavel=self.professor,
+            boletim_tipo='adolescentes_adultos'
+        )
+        self._adicionar_alunos(turma, notas_por_aluno)
+        return turma
+    
+    def _adicionar_alunos(self, turma, notas_por_aluno):
+        """Cria um aluno por item de notas_por_aluno, numerados a partir dos que a turma já tem"""
+        inicio = turma.alunos.count()
+        for i, notas in enumerate(notas_por_aluno, start=inicio):
+            aluno = Aluno.objects.create(nome_completo=f'Aluno {turma.identificador_turma}-{i:02d}', turma=turma)
+            for competencia, valor in notas.items():
+                LancamentoDeNota.objects.create(aluno=aluno, competencia=competencia, nota_valor=valor)
+    
+    def _contar_queries(self, funcao, *args, **kwargs):
+        """Executa funcao(*args, **kwargs) e retorna (número de queries, resultado)"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        
+        with CaptureQueriesContext(connection) as contexto:
+            resultado = funcao(*args, **kwargs)
+        return len(contexto.captured_queries), resultado
+
 class ModelTestCase(TestCase):
     """Testes para os modelos do sistema"""
     
@@ -509,4 +566,2195 @@ class IntegrationTestCase(TestCase):
         # 5. Verificar dashboard
         response = self.client.get(reverse('teacher_portal:dashboard'))
         self.assertEqual(response.status_code, 200)
-        self.assertContains(response, turma.nome)
\ No newline at end of file
+        self.assertContains(response, turma.nome)
+
+class ProgressEngineTestCase(FabricaDadosMixin, TestCase):
+    """Testes para o motor de progresso em lote"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(username='prof_progresso', password='123')
+        self.professor = Professor.objects.create(user=self.user)
+        self.tipo_turma = TipoTurma.objects.create(nome='Teens 1')
+        self.competencias = self._criar_competencias()
+        
+        self.turma = self._criar_turma('TT20')
+        self.aluno_completo = Aluno.objects.create(nome_completo='Aluno Completo', turma=self.turma)
+        self.aluno_parcial = Aluno.objects.create(nome_completo='Aluno Parcial', turma=self.turma)
+        
+        for competencia in self.competencias:
+            LancamentoDeNota.objects.create(aluno=self.aluno_completo, competencia=competencia, nota_valor='80')
+        LancamentoDeNota.objects.create(aluno=self.aluno_parcial, competencia=self.competencias[0], nota_valor='70')
+    
+    def test_progresso_turma(self):
+        """Testa as estatísticas calculadas para uma turma"""
+        from core.progress import ProgressEngine
+        
+        info = ProgressEngine.progresso_turmas()[0]
+        
+        self.assertEqual(info['turma'], self.turma)
+        self.assertEqual(info['total_alunos'], 2)
+        self.assertEqual(info['total_competencias'], 3)
+        self.assertEqual(info['notas_lancadas'], 4)
+        self.assertEqual(info['total_notas_possiveis'], 6)
+        self.assertEqual(info['progresso_turma'], 66)
+        self.assertEqual(info['alunos_completos'], 1)
+        self.assertEqual(info['alunos_completos_percent'], 50)
+    
+    def test_progresso_ignora_competencias_fora_do_boletim(self):
+        """Notas de competências que não pertencem ao boletim não contam"""
+        from core.progress import ProgressEngine
+        
+        extra = Competencia.objects.create(nome='Engajamento', tipo_nota='ABC')
+        LancamentoDeNota.objects.create(aluno=self.aluno_parcial, competencia=extra, nota_valor='A')
+        
+        info = ProgressEngine.progresso_turmas()[0]
+        self.assertEqual(info['notas_lancadas'], 4)
+    
+    def test_numero_de_queries_constante(self):
+        """O número de queries não depende da quantidade de turmas"""
+        from core.catalog import CompetenciaRegistry
+        from core.progress import ProgressEngine
+        
+        CompetenciaRegistry.invalidar()
+        with self.assertNumQueries(4):  # catálogo + turmas + notas + alunos completos
+            ProgressEngine.progresso_turmas()
+        
+        for i in range(5):
+            self._criar_turma(f'MW{i}', [{self.competencias[0]: '90'}] * 4)
+        
+        with self.assertNumQueries(3):  # catálogo já em memória
+            resultado = ProgressEngine.progresso_turmas(professor=self.professor)
+        self.assertEqual(len(resultado), 6)
+
+
+class ProgressStoreTestCase(FabricaDadosMixin, TestCase):
+    """Testes para os contadores de progresso mantidos incrementalmente"""
+    
+    def setUp(self):
+        self.tipo_turma = TipoTurma.objects.create(nome='Teens 2')
+        self.competencias = self._criar_competencias()
+        self.turma = Turma.objects.create(
+            tipo_turma=self.tipo_turma,
+            identificador_turma='SAT09',
+            boletim_tipo='adolescentes_adultos'
+        )
+        self.outra_turma = Turma.objects.create(
+            tipo_turma=self.tipo_turma,
+            identificador_turma='SAT11',
+            boletim_tipo='adolescentes_adultos'
+        )
+        self.aluno = Aluno.objects.create(nome_completo='Aluno Store', turma=self.turma)
+    
+    def _progresso(self, turma):
+        from core.models import ProgressoTurma
+        return ProgressoTurma.objects.get(turma=turma)
+    
+    def _assert_store_confere(self):
+        from core.progress import ProgressStore
+        self.assertEqual(ProgressStore.verificar(), [])
+    
+    def test_lancamento_e_exclusao_de_notas(self):
+        """Criar e excluir notas atualiza os contadores"""
+        notas = [
+            LancamentoDeNota.objects.create(aluno=self.aluno, competencia=c, nota_valor='80')
+            for c in self.competencias
+        ]
+        progresso = self._progresso(self.turma)
+        self.assertEqual(progresso.notas_lancadas, 3)
+        self.assertEqual(progresso.alunos_completos, 1)
+        self.assertTrue(self.aluno.progresso.completo)
+        
+        notas[0].delete()
+        progresso = self._progresso(self.turma)
+        self.assertEqual(progresso.notas_lancadas, 2)
+        self.assertEqual(progresso.alunos_completos, 0)
+        self._assert_store_confere()
+    
+    def test_transferencia_e_status_do_aluno(self):
+        """Mudar o aluno de turma ou de status atualiza as duas turmas"""
+        LancamentoDeNota.objects.create(aluno=self.aluno, competencia=self.competencias[0], nota_valor='80')
+        
+        self.aluno.turma = self.outra_turma
+        self.aluno.save()
+        self.assertEqual(self._progresso(self.turma).total_alunos, 0)
+        self.assertEqual(self._progresso(self.turma).notas_lancadas, 0)
+        self.assertEqual(self._progresso(self.outra_turma).notas_lancadas, 1)
+        
+        self.aluno.ativo = False
+        self.aluno.save()
+        self.assertEqual(self._progresso(self.outra_turma).alunos_ativos, 0)
+        self._assert_store_confere()
+    
+    def test_mudanca_de_boletim(self):
+        """Mudar o boletim da turma recalcula as competências exigidas"""
+        LancamentoDeNota.objects.create(aluno=self.aluno, competencia=self.competencias[0], nota_valor='80')
+        
+        self.turma.boletim_tipo = 'lion_stars'
+        self.turma.save()
+        progresso = self._progresso(self.turma)
+        self.assertEqual(progresso.total_competencias, 0)
+        self.assertEqual(progresso.notas_lancadas, 0)
+        self._assert_store_confere()
+    
+    def test_exclusao_de_aluno_e_turma(self):
+        """Excluir aluno ou turma mantém o store consistente"""
+        LancamentoDeNota.objects.create(aluno=self.aluno, competencia=self.competencias[0], nota_valor='80')
+        
+        self.aluno.delete()
+        self.assertEqual(self._progresso(self.turma).total_alunos, 0)
+        self.assertEqual(self._progresso(self.turma).notas_lancadas, 0)
+        
+        self.turma.delete()
+        self._assert_store_confere()
+    
+    def test_comando_recompute_progress(self):
+        """O comando reconstrói o store e confere com os dados reais"""
+        from django.core.management import call_command
+        from core.models import ProgressoTurma
+        
+        LancamentoDeNota.objects.create(aluno=self.aluno, competencia=self.competencias[0], nota_valor='80')
+        ProgressoTurma.objects.filter(turma=self.turma).update(notas_lancadas=99)
+        
+        saida = io.StringIO()
+        call_command('recompute_progress', '--verificar', stdout=saida)
+        self.assertIn('divergência', saida.getvalue())
+        
+        saida = io.StringIO()
+        call_command('recompute_progress', stdout=saida)
+        self.assertIn('confere', saida.getvalue())
+        self.assertEqual(self._progresso(self.turma).notas_lancadas, 1)
+
+
+@override_settings(STORAGES=STORAGES_TESTE)
+class DashboardProfessorTestCase(FabricaDadosMixin, TestCase):
+    """Testes do dashboard do professor na reta final da data limite"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(username='prof_dashboard', password='123')
+        self.professor = Professor.objects.create(user=self.user)
+        self.tipo_turma = TipoTurma.objects.create(nome='Teens 3')
+        self.competencias = self._criar_competencias()
+        self.client = Client()
+        self.client.login(username='prof_dashboard', password='123')
+    
+    def test_queries_nao_dependem_do_numero_de_alunos(self):
+        """O dashboard faz o mesmo número de queries com 2 ou 40 alunos"""
+        def notas(total_alunos):
+            # Metade dos alunos com todas as notas, metade só com a primeira
+            return [
+                dict.fromkeys(self.competencias if i % 2 == 0 else self.competencias[:1], '75')
+                for i in range(total_alunos)
+            ]
+        
+        url = reverse('teacher_portal:dashboard')
+        self._criar_turma('TT18', notas(2))
+        queries_poucos_alunos, _ = self._contar_queries(self.client.get, url)
+        
+        self._criar_turma('MW20', notas(20))
+        self._criar_turma('FR19', notas(18))
+        queries_muitos_alunos, response = self._contar_queries(self.client.get, url)
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(queries_poucos_alunos, queries_muitos_alunos)
+        self.assertEqual(response.context['total_alunos_geral'], 40)
+        self.assertEqual(response.context['total_alunos_completos'], 20)
+    
+    def test_resumo_prazo(self):
+        """O widget da data limite é derivado das estatísticas das turmas"""
+        from datetime import date
+        from teacher_portal.views import calcular_resumo_prazo
+        
+        estatisticas = [
+            {'total_alunos': 10, 'alunos_completos': 4},
+            {'total_alunos': 5, 'alunos_completos': 5},
+        ]
+        with self.assertNumQueries(0):
+            resumo = calcular_resumo_prazo(estatisticas, date(2025, 11, 10), date(2025, 11, 6))
+        
+        self.assertEqual(resumo['dias_restantes'], 4)
+        self.assertEqual(resumo['total_alunos_pendentes'], 6)
+        self.assertEqual(resumo['alunos_por_dia'], 2)
+        self.assertEqual(resumo['progresso_geral'], 60)
+        self.assertEqual(resumo['deadline_status'], 'deadline-urgent')
+
+
+class AnalyticsDataTestCase(FabricaDadosMixin, TestCase):
+    """Testes do endpoint de dados do dashboard de analytics"""
+    
+    def setUp(self):
+        self.admin = User.objects.create_superuser(username='admin_analytics', password='123')
+        self.user = User.objects.create_user(
+            username='prof_analytics', password='123', first_name='Ana', last_name='Lima'
+        )
+        self.professor = Professor.objects.create(user=self.user)
+        self.tipo_turma = TipoTurma.objects.create(nome='Teens 2')
+        self.oral, self.escrita, self.progresso = self._criar_competencias()
+        self.engajamento = Competencia.objects.create(nome='Engajamento', tipo_nota='ABC')
+        self.client = Client()
+        self.client.login(username='admin_analytics', password='123')
+    
+    def _obter_dados(self):
+        queries, response = self._contar_queries(self.client.get, reverse('admin_panel:analytics_data'))
+        self.assertEqual(response.status_code, 200)
+        return queries, response.json()
+    
+    def test_payload(self):
+        """O payload mantém o formato e os valores calculados anteriormente"""
+        self._criar_turma('TT21', [
+            {self.oral: '30', self.escrita: '55.5', self.progresso: '100', self.engajamento: 'A'},
+            {self.oral: '90', self.escrita: 'abc'},
+        ])
+        
+        _, dados = self._obter_dados()
+        
+        self.assertEqual(dados, {
+            'tipos_progresso': [{
+                'nome': 'Teens 2', 'progresso': 83, 'notas_lancadas': 5,
+                'notas_possiveis': 6, 'turmas_count': 1, 'alunos_count': 2,
+            }],
+            'tipos_desempenho': [{
+                'nome': 'Teens 2', 'media': 68.9, 'total_notas': 4,
+                'total_alunos': 2, 'turmas_count': 1,
+            }],
+            'professores_detalhados': [{
+                'nome': 'Ana Lima', 'progresso_geral': 83,
+                'turmas': [{
+                    'turma': 'TT21', 'progresso': 83, 'alunos': 2,
+                    'notas_lancadas': 5, 'notas_possiveis': 6,
+                }],
+                'total_alunos': 2, 'total_notas_lancadas': 5, 'total_notas_possiveis': 6,
+            }],
+            'ranking_competencias': [
+                {'nome': 'Avaliações de Progresso', 'media': 100.0, 'total_avaliacoes': 1,
+                 'min_nota': 100.0, 'max_nota': 100.0},
+                {'nome': 'Produção Oral', 'media': 60.0, 'total_avaliacoes': 2,
+                 'min_nota': 30.0, 'max_nota': 90.0},
+                {'nome': 'Produção Escrita', 'media': 55.5, 'total_avaliacoes': 1,
+                 'min_nota': 55.5, 'max_nota': 55.5},
+            ],
+            'distribuicao_notas': {
+                'Insuficiente (0-40)': 25.0,
+                'Regular (41-60)': 25.0,
+                'Bom (61-80)': 0.0,
+                'Excelente (81-100)': 50.0,
+            },
+            'total_notas_numericas': 4,
+            'resumo': {
+                'total_turmas': 1, 'total_alunos': 2, 'total_notas': 6,
+                'total_professores': 1, 'total_competencias': 4, 'media_geral': 71.8,
+            },
+        })
+    
+    def test_numero_de_queries_constante(self):
+        """O endpoint faz o mesmo número de queries independente do volume"""
+        self._criar_turma('TT22', [{self.oral: '70'}])
+        queries_pouco_volume, _ = self._obter_dados()
+        
+        outro_tipo = TipoTurma.objects.create(nome='Kids 1')
+        outro_professor = Professor.objects.create(
+            user=User.objects.create_user(username='prof_analytics_2', password='123')
+        )
+        turma = self._criar_turma('MW21', [
+            {self.oral: str(40 + i), self.escrita: str(60 + i), self.progresso: '85'}
+            for i in range(15)
+        ])
+        turma.tipo_turma = outro_tipo
+        turma.professor_responsavel = outro_professor
+        turma.save()
+        queries_muito_volume, dados = self._obter_dados()
+        
+        self.assertEqual(queries_pouco_volume, queries_muito_volume)
+        self.assertEqual(dados['total_notas_numericas'], 46)
+        self.assertEqual(len(dados['tipos_desempenho']), 2)
+        self.assertEqual(len(dados['professores_detalhados']), 2)
+
+
+class NotaNumericaTestCase(TestCase):
+    """Testes da coluna numérica (nota_numerica) dos lançamentos de notas"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(username='prof_numerica', password='123')
+        self.professor = Professor.objects.create(user=self.user)
+        self.tipo_turma = TipoTurma.objects.create(nome='Teens 4')
+        self.turma = Turma.objects.create(
+            tipo_turma=self.tipo_turma,
+            identificador_turma='TT23',
+            professor_responsavel=self.professor,
+            boletim_tipo='adolescentes_adultos'
+        )
+        self.aluno = Aluno.objects.create(nome_completo='Aluno Numérico', turma=self.turma)
+        self.competencia_num = Competencia.objects.create(nome='Produção Oral', tipo_nota='NUM')
+        self.competencia_abc = Competencia.objects.create(nome='Produção Escrita', tipo_nota='ABC')
+    
+    def test_preenchida_ao_salvar(self):
+        """NUM guarda o número e ABC guarda o ordinal do conceito"""
+        nota_num = LancamentoDeNota.objects.create(aluno=self.aluno, competencia=self.competencia_num, nota_valor=' 85.5 ')
+        nota_abc = LancamentoDeNota.objects.create(aluno=self.aluno, competencia=self.competencia_abc, nota_valor='b')
+        self.assertEqual(nota_num.nota_numerica, 85.5)
+        self.assertEqual(nota_abc.nota_numerica, 3)
+        
+        nota_num.nota_valor = 'abc'
+        nota_num.save(update_fields=['nota_valor'])
+        nota_num.refresh_from_db()
+        self.assertIsNone(nota_num.nota_numerica)
+    
+    def test_salvar_nao_carrega_a_competencia_inteira(self):
+        """save() só busca o tipo_nota da competência, e nada quando ela já veio carregada"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        
+        nota = LancamentoDeNota.objects.create(aluno=self.aluno, competencia=self.competencia_abc, nota_valor='B')
+        
+        nota = LancamentoDeNota.objects.get(pk=nota.pk)
+        nota.nota_valor = 'A'
+        with CaptureQueriesContext(connection) as consultas:
+            nota.save(update_fields=['nota_valor'])
+        sql_competencia = [q['sql'] for q in consultas if 'FROM "core_competencia"' in q['sql']]
+        self.assertEqual(len(sql_competencia), 1)
+        self.assertNotIn('"core_competencia"."nome"', sql_competencia[0].split(' FROM ')[0])
+        self.assertFalse(LancamentoDeNota.competencia.is_cached(nota))
+        self.assertEqual(nota.nota_numerica, 4)
+        
+        nota = LancamentoDeNota.objects.select_related('competencia').get(pk=nota.pk)
+        nota.nota_valor = 'C'
+        with CaptureQueriesContext(connection) as consultas:
+            nota.save(update_fields=['nota_valor'])
+        self.assertFalse([q for q in consultas if 'FROM "core_competencia"' in q['sql']])
+        self.assertEqual(nota.nota_numerica, 2)
+    
+    def test_media_geral_e_nota_final(self):
+        """A média do aluno e a nota final usam a coluna numérica"""
+        from core.grading import NotaFinalEngine
+        
+        LancamentoDeNota.objects.create(aluno=self.aluno, competencia=self.competencia_num, nota_valor='70')
+        LancamentoDeNota.objects.create(aluno=self.aluno, competencia=self.competencia_abc, nota_valor='A')
+        
+        self.assertEqual(self.aluno.get_media_geral(), 70.0)
+        # Oral 70 e Escrita A (= 95), sem avaliações de progresso: média simples
+        self.assertEqual(
+            NotaFinalEngine.calcular_de_notas(self.turma.boletim_tipo, self.aluno.get_notas_boletim()),
+            (82.5, 'B')
+        )
+    
+    def test_mudanca_de_tipo_da_competencia(self):
+        """Trocar o tipo de nota da competência reconverte as notas já lançadas"""
+        nota = LancamentoDeNota.objects.create(aluno=self.aluno, competencia=self.competencia_abc, nota_valor='C')
+        
+        self.competencia_abc.tipo_nota = 'NUM'
+        self.competencia_abc.save()
+        nota.refresh_from_db()
+        self.assertIsNone(nota.nota_numerica)
+    
+    def test_comando_backfill(self):
+        """O comando de backfill corrige valores desatualizados em lote"""
+        from django.core.management import call_command
+        
+        nota = LancamentoDeNota.objects.create(aluno=self.aluno, competencia=self.competencia_num, nota_valor='60')
+        LancamentoDeNota.objects.filter(pk=nota.pk).update(nota_numerica=None)
+        
+        saida = io.StringIO()
+        call_command('backfill_notas_numericas', stdout=saida)
+        
+        nota.refresh_from_db()
+        self.assertEqual(nota.nota_numerica, 60.0)
+        self.assertIn('1 nota(s) atualizada(s)', saida.getvalue())
+
+
+class AnalyticsSnapshotTestCase(TestCase):
+    """Testes dos snapshots materializados do dashboard de analytics"""
+    
+    def setUp(self):
+        User.objects.create_superuser(username='admin_snapshot', password='123')
+        self.professor = Professor.objects.create(
+            user=User.objects.create_user(username='prof_snapshot', password='123')
+        )
+        self.tipo_turma = TipoTurma.objects.create(nome='Teens 5')
+        self.outro_tipo = TipoTurma.objects.create(nome='Kids 2')
+        self.competencia = Competencia.objects.create(nome='Produção Oral', tipo_nota='NUM')
+        self.turma = Turma.objects.create(
+            tipo_turma=self.tipo_turma,
+            identificador_turma='TT24',
+            professor_responsavel=self.professor,
+            boletim_tipo='adolescentes_adultos'
+        )
+        self.outra_turma = Turma.objects.create(
+            tipo_turma=self.outro_tipo,
+            identificador_turma='KD01',
+            boletim_tipo='adolescentes_adultos'
+        )
+        for turma, valor in [(self.turma, '80'), (self.outra_turma, '40')]:
+            aluno = Aluno.objects.create(nome_completo=f'Aluno {turma.identificador_turma}', turma=turma)
+            LancamentoDeNota.objects.create(aluno=aluno, competencia=self.competencia, nota_valor=valor)
+        self.client = Client()
+        self.client.login(username='admin_snapshot', password='123')
+    
+    def _obter_dados(self, **params):
+        response = self.client.get(reverse('admin_panel:analytics_data'), params)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('X-Analytics-Gerado-Em', response)
+        return response.json()
+    
+    def test_comando_gera_snapshots_por_escopo(self):
+        """O comando materializa o payload geral, por tipo de turma e por professor"""
+        from django.core.management import call_command
+        from core.models import AnalyticsSnapshot
+        
+        call_command('gerar_snapshot_analytics', stdout=io.StringIO())
+        
+        escopos = sorted(AnalyticsSnapshot.objects.values_list('escopo', 'referencia_id'), key=str)
+        self.assertEqual(escopos, sorted([
+            ('GERAL', None),
+            ('TIPO_TURMA', self.tipo_turma.pk),
+            ('TIPO_TURMA', self.outro_tipo.pk),
+            ('PROFESSOR', self.professor.pk),
+        ], key=str))
+        
+        por_tipo = AnalyticsSnapshot.ultimo('TIPO_TURMA', self.outro_tipo.pk).dados
+        self.assertEqual(por_tipo['resumo']['total_turmas'], 1)
+        self.assertEqual(por_tipo['ranking_competencias'][0]['media'], 40.0)
+        por_professor = AnalyticsSnapshot.ultimo('PROFESSOR', self.professor.pk).dados
+        self.assertEqual(por_professor['resumo']['total_professores'], 1)
+        self.assertEqual(por_professor['ranking_competencias'][0]['media'], 80.0)
+    
+    def test_endpoint_serve_snapshot_e_fresh(self):
+        """O endpoint serve o último snapshot; ?fresh=1 calcula ao vivo"""
+        from core.analytics import AnalyticsEngine
+        
+        AnalyticsEngine.gerar_snapshots()
+        aluno = Aluno.objects.create(nome_completo='Aluno Novo', turma=self.turma)
+        LancamentoDeNota.objects.create(aluno=aluno, competencia=self.competencia, nota_valor='100')
+        
+        with self.assertNumQueries(5):  # sessão, usuário, versão dos dados (1 query) e snapshot (2)
+            snapshot = self._obter_dados()
+        self.assertEqual(snapshot['total_notas_numericas'], 2)
+        self.assertEqual(self._obter_dados(fresh='1')['total_notas_numericas'], 3)
+        self.assertEqual(
+            self._obter_dados(tipo_turma=self.tipo_turma.pk)['total_notas_numericas'], 1
+        )
+        self.assertEqual(
+            self._obter_dados(tipo_turma=self.tipo_turma.pk, fresh='1')['total_notas_numericas'], 2
+        )
+    
+    def test_limpeza_de_snapshots_antigos(self):
+        """Apenas os snapshots mais recentes de cada escopo são mantidos"""
+        from core.analytics import AnalyticsEngine
+        from core.models import AnalyticsSnapshot
+        
+        for _ in range(3):
+            AnalyticsEngine.gerar_snapshots(manter=2)
+        
+        self.assertEqual(AnalyticsSnapshot.objects.filter(escopo='GERAL').count(), 2)
+        self.assertEqual(AnalyticsSnapshot.objects.count(), 8)
+
+
+@override_settings(STORAGES=STORAGES_TESTE)
+class ConditionalGetTestCase(TestCase):
+    """Testes do GET condicional (ETag/Last-Modified) baseado na versão dos dados"""
+    
+    def setUp(self):
+        User.objects.create_superuser(username='admin_etag', password='123')
+        self.user = User.objects.create_user(username='prof_etag', password='123')
+        self.professor = Professor.objects.create(user=self.user)
+        self.competencia = Competencia.objects.create(nome='Produção Oral', tipo_nota='NUM')
+        self.turma = Turma.objects.create(
+            tipo_turma=TipoTurma.objects.create(nome='Teens 6'),
+            identificador_turma='TT25',
+            professor_responsavel=self.professor,
+            boletim_tipo='adolescentes_adultos'
+        )
+        self.aluno = Aluno.objects.create(nome_completo='Aluno ETag', turma=self.turma)
+        self.client = Client()
+    
+    def _get(self, nome_url, etag=None):
+        headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        return self.client.get(reverse(nome_url), **headers)
+    
+    def test_analytics_responde_304_ate_os_dados_mudarem(self):
+        """O endpoint de analytics responde 304 enquanto a versão dos dados não muda"""
+        from core.analytics import AnalyticsEngine
+        
+        self.client.login(username='admin_etag', password='123')
+        response = self._get('admin_panel:analytics_data')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Last-Modified', response)
+        self.assertIn('private', response['Cache-Control'])
+        etag = response['ETag']
+        
+        response = self._get('admin_panel:analytics_data', etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        
+        LancamentoDeNota.objects.create(aluno=self.aluno, competencia=self.competencia, nota_valor='90')
+        response = self._get('admin_panel:analytics_data', etag)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        
+        AnalyticsEngine.gerar_snapshots()
+        self.assertEqual(self._get('admin_panel:analytics_data', etag).status_code, 200)
+    
+    def test_exclusao_muda_a_versao(self):
+        """Excluir um aluno (sem nova escrita) também invalida o ETag"""
+        self.client.login(username='admin_etag', password='123')
+        etag = self._get('admin_panel:analytics_data')['ETag']
+        
+        Aluno.objects.create(nome_completo='Aluno Extra', turma=self.turma).delete()
+        self.assertEqual(self._get('admin_panel:analytics_data', etag).status_code, 304)
+        
+        self.aluno.delete()
+        self.assertEqual(self._get('admin_panel:analytics_data', etag).status_code, 200)
+    
+    def test_cadastros_renomeados_mudam_a_versao(self):
+        """Renomear competência, tipo de turma ou professor (nomes exibidos nas páginas) invalida o ETag"""
+        from core.models import CompetenciaBoletim
+        
+        self.client.login(username='admin_etag', password='123')
+        renomear = [
+            (self.competencia, 'nome', 'Produção Oral Revisada'),
+            (self.turma.tipo_turma, 'nome', 'Teens 6B'),
+            (self.professor, 'nome_completo', 'Prof. ETag'),
+            (CompetenciaBoletim.objects.first(), 'ordem', 5),
+        ]
+        for objeto, campo, valor in renomear:
+            etag = self._get('admin_panel:analytics_data')['ETag']
+            self.assertEqual(self._get('admin_panel:analytics_data', etag).status_code, 304)
+            setattr(objeto, campo, valor)
+            objeto.save()
+            self.assertEqual(self._get('admin_panel:analytics_data', etag).status_code, 200, objeto)
+    
+    def test_dashboard_professor(self):
+        """O dashboard do professor revalida por usuário e preferências"""
+        from core.models import UserPreference
+        
+        self.client.login(username='prof_etag', password='123')
+        self._get('teacher_portal:dashboard')  # Primeira visita cria o cookie CSRF (como no login real)
+        response = self._get('teacher_portal:dashboard')
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        
+        self.assertEqual(self._get('teacher_portal:dashboard', etag).status_code, 304)
+        
+        UserPreference.objects.create(user=self.user, dashboard_emoji='🚀')
+        self.assertEqual(self._get('teacher_portal:dashboard', etag).status_code, 200)
+
+
+class CompetenciaCatalogoTestCase(TestCase):
+    """Testes do catálogo de competências por tipo de boletim"""
+    
+    def setUp(self):
+        self.turma = Turma.objects.create(
+            tipo_turma=TipoTurma.objects.create(nome='Teens 7'),
+            identificador_turma='TT26',
+            boletim_tipo='adolescentes_adultos'
+        )
+        self.oral = Competencia.objects.create(nome='Produção Oral', tipo_nota='NUM')
+        self.avaliacoes = Competencia.objects.create(nome='Avaliações de Progresso', tipo_nota='NUM')
+        self.extra = Competencia.objects.create(nome='Pronúncia', tipo_nota='NUM')
+    
+    def test_catalogo_em_ordem_do_boletim(self):
+        """O catálogo segue a ordem do boletim e ignora competências fora dele"""
+        from core.catalog import CompetenciaRegistry
+        from core.models import CompetenciaBoletim
+        
+        self.assertEqual(
+            list(CompetenciaBoletim.objects.filter(boletim_tipo='adolescentes_adultos').values_list('competencia__nome', 'ordem')),
+            [('Produção Oral', 0), ('Avaliações de Progresso', 2)]
+        )
+        self.assertEqual(CompetenciaRegistry.ids('adolescentes_adultos'), [self.oral.id, self.avaliacoes.id])
+        self.assertEqual(CompetenciaRegistry.ids('material_antigo'), [self.oral.id])
+    
+    def test_competencias_da_turma_com_no_maximo_uma_query(self):
+        """Resolver as competências de uma turma custa uma query com o catálogo em memória"""
+        from core.catalog import CompetenciaRegistry
+        
+        CompetenciaRegistry.ids('junior')  # Aquece o catálogo
+        with self.assertNumQueries(1):
+            competencias = list(self.turma.competencias)
+        self.assertEqual(competencias, [self.avaliacoes, self.oral])
+        with self.assertNumQueries(0):
+            CompetenciaRegistry.mapa()
+    
+    def test_renomear_e_excluir_atualizam_o_catalogo(self):
+        """Renomear ou excluir uma competência atualiza o catálogo e o progresso"""
+        from core.catalog import CompetenciaRegistry
+        
+        self.extra.nome = 'Produção Escrita'
+        self.extra.save()
+        self.assertEqual(
+            CompetenciaRegistry.ids('adolescentes_adultos'),
+            [self.oral.id, self.extra.id, self.avaliacoes.id]
+        )
+        self.assertEqual(self.turma.progresso.total_competencias, 3)
+        
+        self.oral.nome = 'Oralidade'
+        self.oral.save()
+        self.avaliacoes.delete()
+        self.assertEqual(CompetenciaRegistry.ids('adolescentes_adultos'), [self.extra.id])
+    
+    def test_gerenciar_competencias_invalida_o_catalogo(self):
+        """Editar competências pelo painel recarrega o catálogo"""
+        from core.catalog import CompetenciaRegistry
+        
+        User.objects.create_superuser(username='admin_catalogo', password='123')
+        client = Client()
+        client.login(username='admin_catalogo', password='123')
+        
+        CompetenciaRegistry.ids('junior')
+        client.post(reverse('admin_panel:gerenciar_competencias'), {
+            'action': 'create', 'nome': 'Engajamento', 'tipo_nota': 'ABC'
+        })
+        self.assertIsNone(CompetenciaRegistry._competencias)
+        self.assertEqual(len(CompetenciaRegistry.ids('junior')), 1)
+
+
+class TemplateBoletimCacheTestCase(TestCase):
+    """Testes do cache em memória dos templates de boletim (.docx)"""
+    
+    def setUp(self):
+        from core.utils import BoletimGenerator
+        BoletimGenerator.limpar_cache_templates()
+        self.addCleanup(BoletimGenerator.limpar_cache_templates)
+    
+    def test_template_parseado_uma_vez_e_clonado(self):
+        """O .docx é parseado uma vez; cada boletim recebe um clone independente"""
+        from unittest import mock
+        from core.utils import BoletimGenerator
+        import docx
+        
+        with mock.patch('docx.Document', wraps=docx.Document) as document:
+            primeiro = BoletimGenerator._carregar_template('junior')
+            segundo = BoletimGenerator._carregar_template('junior')
+        self.assertEqual(document.call_count, 1)
+        self.assertIsNot(primeiro, segundo)
+        
+        primeiro.paragraphs[0].text = 'ALTERADO'
+        self.assertNotEqual(segundo.paragraphs[0].text, 'ALTERADO')
+        self.assertNotEqual(BoletimGenerator._carregar_template('junior').paragraphs[0].text, 'ALTERADO')
+    
+    def test_template_recarregado_quando_arquivo_muda(self):
+        """Mudança de mtime sem mudar o conteúdo mantém o cache; mudança de conteúdo recarrega"""
+        import os
+        import shutil
+        import tempfile
+        from django.conf import settings
+        from core.utils import BoletimGenerator
+        
+        original = BoletimGenerator._get_template_path('junior')
+        with tempfile.TemporaryDirectory() as base_dir:
+            pasta = os.path.join(base_dir, 'core', 'templates', 'boletins')
+            os.makedirs(pasta)
+            copia = os.path.join(pasta, os.path.basename(original))
+            shutil.copy(original, copia)
+            
+            with override_settings(BASE_DIR=base_dir):
+                BoletimGenerator._carregar_template('junior')
+                documento = BoletimGenerator._templates_cache[copia]['documento']
+                
+                # Apenas o mtime muda: mesmo sha1, mesma árvore
+                stat = os.stat(copia)
+                os.utime(copia, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+                BoletimGenerator._carregar_template('junior')
+                self.assertIs(BoletimGenerator._templates_cache[copia]['documento'], documento)
+                
+                # Conteúdo novo: template recarregado
+                novo = BoletimGenerator._carregar_template('junior')
+                novo.paragraphs[0].text = 'Template revisado'
+                novo.save(copia)
+                os.utime(copia, ns=(stat.st_atime_ns, stat.st_mtime_ns + 2 * 10**9))
+                recarregado = BoletimGenerator._carregar_template('junior')
+                self.assertIsNot(BoletimGenerator._templates_cache[copia]['documento'], documento)
+                self.assertEqual(recarregado.paragraphs[0].text, 'Template revisado')
+    
+    def test_plano_substitui_tokens_fragmentados_em_runs(self):
+        """O plano localiza tokens quebrados em vários runs e preserva o resto do parágrafo"""
+        from docx import Document
+        from core.utils import BoletimGenerator
+        
+        documento = Document()
+        paragrafo = documento.add_paragraph('Aluno(a): ')
+        paragrafo.runs[0].bold = True
+        for texto in ('<<', 'alu', 'no>> e <<nív', 'el>>', ' <<outro>>'):
+            paragrafo.add_run(texto)
+        documento.add_paragraph('Sem placeholders')
+        documento.add_table(rows=1, cols=2).cell(0, 1).text = '<<colaboração>>'
+        
+        plano = BoletimGenerator._montar_plano(documento)
+        self.assertEqual(len(plano), 2)
+        self.assertEqual(
+            [token[0] for item in plano for token in item['tokens']],
+            ['aluno', 'nivel', 'outro', 'colaboracao']
+        )
+        
+        total = BoletimGenerator._aplicar_plano(documento, plano, {
+            'aluno': 'Ana', 'nivel': 'Teens 1', 'colaboracao': 'A'
+        })
+        self.assertEqual(total, 3)
+        self.assertEqual(documento.paragraphs[0].text, 'Aluno(a): Ana e Teens 1 <<outro>>')
+        self.assertTrue(documento.paragraphs[0].runs[0].bold)
+        self.assertEqual(documento.tables[0].cell(0, 1).text, 'A')
+    
+    def test_boletim_gerado_sem_placeholders_restantes(self):
+        """Os templates reais não deixam placeholders conhecidos sem substituir"""
+        from core.utils import BoletimGenerator
+        
+        for boletim_tipo, placeholders in BoletimGenerator.COMPETENCIA_PLACEHOLDERS.items():
+            documento, plano = BoletimGenerator._preparar_template(boletim_tipo)
+            chaves = {token[0] for item in plano for token in item['tokens']}
+            self.assertTrue({'aluno', 'nivel', 'professor'} <= chaves, boletim_tipo)
+            self.assertTrue(set(placeholders) <= chaves, boletim_tipo)
+            
+            BoletimGenerator._aplicar_plano(documento, plano, {chave: 'X' for chave in chaves})
+            self.assertEqual(BoletimGenerator._montar_plano(documento), [])
+
+
+class BoletimBatchTestCase(FabricaDadosMixin, TestCase):
+    """Testes da geração de boletins em lote (pool de processos)"""
+    
+    def setUp(self):
+        import shutil
+        import tempfile
+        from core.batch import BoletimBatchRenderer
+        self.addCleanup(BoletimBatchRenderer.encerrar_pool)
+        
+        self.cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_dir, ignore_errors=True)
+        cache = override_settings(BOLETIM_CACHE_DIR=self.cache_dir)
+        cache.enable()
+        self.addCleanup(cache.disable)
+        
+        self.turma = Turma.objects.create(
+            tipo_turma=TipoTurma.objects.create(nome='Teens Lote'),
+            identificador_turma='TL1',
+            boletim_tipo='adolescentes_adultos'
+        )
+        self.competencias = self._criar_competencias()
+        self.alunos = []
+        for indice, nome in enumerate(['Carla', 'Ana', 'Bruno', 'Davi']):
+            aluno = Aluno.objects.create(nome_completo=nome, turma=self.turma)
+            for competencia in self.competencias:
+                LancamentoDeNota.objects.create(aluno=aluno, competencia=competencia, nota_valor=str(70 + indice * 8))
+            self.alunos.append(aluno)
+    
+    def _texto(self, conteudo):
+        from docx import Document
+        documento = Document(io.BytesIO(conteudo))
+        paragrafos = list(documento.paragraphs)
+        paragrafos += [p for t in documento.tables for r in t.rows for c in r.cells for p in c.paragraphs]
+        return [p.text for p in paragrafos]
+    
+    @override_settings(BOLETIM_CACHE_MAX_MB=0)
+    def test_lote_em_paralelo_igual_ao_serial_e_em_ordem(self):
+        """O pool gera os mesmos boletins que a renderização serial, na ordem recebida"""
+        from core.batch import BoletimBatchRenderer
+        from core.utils import BoletimGenerator
+        
+        serial = BoletimBatchRenderer.renderizar(self.alunos, workers=1)
+        paralelo = BoletimBatchRenderer.renderizar(self.alunos, workers=2)
+        
+        self.assertEqual([r['aluno_id'] for r in paralelo], [aluno.id for aluno in self.alunos])
+        self.assertEqual([r['arquivo'] for r in paralelo], [f'boletim_{aluno.nome_completo}_{aluno.id}.docx' for aluno in self.alunos])
+        for r_serial, r_paralelo, aluno in zip(serial, paralelo, self.alunos):
+            self.assertIsNone(r_paralelo['erro'])
+            self.assertEqual(self._texto(r_paralelo['conteudo']), self._texto(r_serial['conteudo']))
+            buffer = io.BytesIO()
+            BoletimGenerator.gerar_boletim(aluno).save(buffer)
+            self.assertEqual(self._texto(r_paralelo['conteudo']), self._texto(buffer.getvalue()))
+    
+    def test_falha_reportada_por_aluno(self):
+        """Um boletim que falha não interrompe o lote"""
+        from core.batch import BoletimBatchRenderer
+        
+        outra = Turma.objects.create(
+            tipo_turma=TipoTurma.objects.create(nome='Legado'),
+            identificador_turma='LG1',
+            boletim_tipo='junior'
+        )
+        Turma.objects.filter(pk=outra.pk).update(boletim_tipo='inexistente')
+        sem_template = Aluno.objects.create(nome_completo='Eva', turma=Turma.objects.get(pk=outra.pk))
+        
+        resultados = BoletimBatchRenderer.renderizar([self.alunos[0], sem_template, self.alunos[1]], workers=2)
+        
+        self.assertEqual([r['nome'] for r in resultados], ['Carla', 'Eva', 'Ana'])
+        self.assertIsNone(resultados[0]['erro'])
+        self.assertIsNone(resultados[2]['erro'])
+        self.assertIsNone(resultados[1]['conteudo'])
+        self.assertIn('inexistente', resultados[1]['erro'])
+    
+    def test_comando_grava_boletins_da_turma(self):
+        """O comando gerar_boletins grava um .docx por aluno na pasta da turma"""
+        import os
+        import tempfile
+        from django.core.management import call_command
+        
+        with tempfile.TemporaryDirectory() as saida:
+            call_command('gerar_boletins', turma=[self.turma.id], saida=saida, workers=1, stdout=io.StringIO())
+            self.assertEqual(
+                sorted(os.listdir(os.path.join(saida, 'TL1'))),
+                sorted(f'boletim_{aluno.nome_completo}_{aluno.id}.docx' for aluno in self.alunos)
+            )
+    
+    @override_settings(BOLETIM_WORKERS=1)
+    def test_zip_da_turma_enviado_por_streaming(self):
+        """O ZIP da turma sai em pedaços: o primeiro chega antes do último boletim ser renderizado"""
+        import zipfile
+        from unittest import mock
+        from django.http import StreamingHttpResponse
+        from core import batch
+        
+        User.objects.create_superuser(username='admin_zip', password='123')
+        client = Client()
+        client.login(username='admin_zip', password='123')
+        
+        with mock.patch('core.batch._renderizar_em_bytes', wraps=batch._renderizar_em_bytes) as renderizar:
+            response = client.get(reverse('admin_panel:gerar_boletins_turma', args=[self.turma.id]))
+            self.assertIsInstance(response, StreamingHttpResponse)
+            self.assertEqual(renderizar.call_count, 0)
+            
+            pedacos = iter(response.streaming_content)
+            conteudo = next(pedacos)
+            self.assertEqual(renderizar.call_count, 1)
+            conteudo += b''.join(pedacos)
+            self.assertEqual(renderizar.call_count, 4)
+        
+        with zipfile.ZipFile(io.BytesIO(conteudo)) as zip_file:
+            self.assertEqual(
+                zip_file.namelist(),
+                sorted(f'boletim_{aluno.nome_completo}_{aluno.id}.docx' for aluno in self.alunos)
+            )
+            self.assertIn('Aluno(a): Ana\n', self._texto(zip_file.read(f'boletim_Ana_{self.alunos[1].id}.docx')))
+
+
+@override_settings(BOLETIM_WORKERS=1)
+class ExportacaoBoletinsTestCase(FabricaDadosMixin, TestCase):
+    """Testes da exportação de boletins de várias turmas"""
+    
+    def setUp(self):
+        import shutil
+        import tempfile
+        
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=self.media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        
+        competencias = self._criar_competencias()
+        tipo = TipoTurma.objects.create(nome='Teens 3')
+        self.turmas = []
+        for identificador, nomes in (('A1', ['Ana', 'Bia']), ('B2', ['Caio', 'Duda'])):
+            turma = Turma.objects.create(tipo_turma=tipo, identificador_turma=identificador, boletim_tipo='adolescentes_adultos')
+            for nome in nomes:
+                aluno = Aluno.objects.create(nome_completo=nome, turma=turma)
+                for competencia in competencias:
+                    LancamentoDeNota.objects.create(aluno=aluno, competencia=competencia, nota_valor='80')
+            self.turmas.append(turma)
+        # Aluno sem notas: fica registrado como sem boletim
+        Aluno.objects.create(nome_completo='Edu', turma=self.turmas[1])
+    
+    def test_exportacao_gera_pastas_por_turma_e_zip(self):
+        """A exportação grava uma pasta por turma e um ZIP com manifesto"""
+        import os
+        import zipfile
+        from core.export import ExportacaoService
+        
+        exportacao = ExportacaoService.criar()
+        self.assertTrue(ExportacaoService.executar(exportacao.pk))
+        exportacao.refresh_from_db()
+        
+        self.assertEqual(exportacao.status, 'CONCLUIDA')
+        arquivos = [
+            f'Teens_3/{turma.identificador_turma}_{turma.id}/boletim_{aluno.nome_completo}_{aluno.id}.docx'
+            for turma in self.turmas for aluno in turma.alunos.order_by('nome_completo') if aluno.nome_completo != 'Edu'
+        ]
+        pasta = os.path.join(self.media_root, 'boletins', 'exportacoes', str(exportacao.pk))
+        self.assertTrue(os.path.exists(os.path.join(pasta, *arquivos[2].split('/'))))
+        with zipfile.ZipFile(os.path.join(self.media_root, exportacao.arquivo)) as zip_file:
+            self.assertEqual(sorted(zip_file.namelist()), sorted(arquivos) + ['manifesto.json'])
+            manifesto = json.loads(zip_file.read('manifesto.json'))
+        self.assertEqual(manifesto['turmas'][1]['falhas'], [{'aluno': 'Edu', 'erro': 'Notas incompletas'}])
+        
+        status = ExportacaoService.status(exportacao)
+        self.assertEqual((status['turmas_concluidas'], status['boletins_gerados'], status['percentual']), (2, 4, 100))
+    
+    def test_turmas_e_alunos_homonimos_nao_se_sobrescrevem(self):
+        """Turmas sem tipo com o mesmo identificador e alunos homônimos (ou com '/') têm arquivos próprios"""
+        import os
+        import zipfile
+        from core.export import ExportacaoService
+        
+        turmas = [Turma.objects.create(identificador_turma='X 1', boletim_tipo='adolescentes_adultos') for _ in range(2)]
+        for turma in turmas:
+            for nome in ('Ana Souza', 'Ana Souza?', '../Ana/Souza'):
+                aluno = Aluno.objects.create(nome_completo=nome, turma=turma)
+                for competencia in Competencia.objects.all():
+                    LancamentoDeNota.objects.create(aluno=aluno, competencia=competencia, nota_valor='80')
+        
+        exportacao = ExportacaoService.criar(tipo_turma=None)
+        exportacao.turmas.exclude(turma__in=turmas).delete()
+        self.assertTrue(ExportacaoService.executar(exportacao.pk))
+        exportacao.refresh_from_db()
+        
+        with zipfile.ZipFile(os.path.join(self.media_root, exportacao.arquivo)) as zip_file:
+            nomes = [nome for nome in zip_file.namelist() if nome != 'manifesto.json']
+        self.assertEqual(len(nomes), 6)
+        self.assertEqual({nome.rsplit('/', 1)[0] for nome in nomes}, {f'Sem_Tipo/X_1_{turma.id}' for turma in turmas})
+        self.assertTrue(all(nome.count('/') == 2 for nome in nomes))
+    
+    def test_retomar_depois_de_queda_entre_rename_e_status(self):
+        """A pasta publicada por uma execução que caiu antes de marcar a turma é refeita ao retomar"""
+        import os
+        from unittest import mock
+        from core.export import ExportacaoService
+        
+        exportacao = ExportacaoService.criar(tipo_turma=self.turmas[0].tipo_turma)
+        pasta = os.path.join(self.media_root, exportacao.pasta, ExportacaoService.pasta_turma(self.turmas[0]))
+        rename = os.rename
+        
+        def cair_depois_do_rename(origem, destino):
+            rename(origem, destino)
+            raise OSError('Processo interrompido')
+        
+        with mock.patch('core.export.os.rename', side_effect=cair_depois_do_rename):
+            self.assertFalse(ExportacaoService.executar(exportacao.pk))
+        self.assertTrue(os.path.isdir(pasta))
+        self.assertEqual(exportacao.turmas.get(turma=self.turmas[0]).status, 'ERRO')
+        with open(os.path.join(pasta, 'sobra.docx'), 'wb') as arquivo:
+            arquivo.write(b'x')
+        
+        self.assertTrue(ExportacaoService.pode_retomar(exportacao))
+        self.assertTrue(ExportacaoService.executar(exportacao.pk))
+        exportacao.refresh_from_db()
+        self.assertEqual(exportacao.status, 'CONCLUIDA')
+        self.assertEqual(set(exportacao.turmas.values_list('status', flat=True)), {'CONCLUIDA'})
+        self.assertNotIn('sobra.docx', os.listdir(pasta))
+        self.assertTrue(os.listdir(pasta))
+    
+    def test_retomar_nao_refaz_turmas_concluidas(self):
+        """Depois de uma falha, a exportação continua da turma que parou"""
+        from unittest import mock
+        from core.export import ExportacaoService
+        
+        exportacao = ExportacaoService.criar(tipo_turma=self.turmas[0].tipo_turma)
+        original = ExportacaoService._exportar_turma
+        
+        def falhar_na_segunda(exportacao, item, workers=None):
+            if item.turma_id == self.turmas[1].id:
+                raise OSError('Disco cheio')
+            return original(exportacao, item, workers)
+        
+        with mock.patch.object(ExportacaoService, '_exportar_turma', side_effect=falhar_na_segunda):
+            self.assertFalse(ExportacaoService.executar(exportacao.pk))
+        exportacao.refresh_from_db()
+        self.assertEqual(exportacao.status, 'ERRO')
+        self.assertEqual(exportacao.erro, 'Disco cheio')
+        self.assertEqual(list(exportacao.turmas.values_list('status', flat=True)), ['CONCLUIDA', 'ERRO'])
+        self.assertTrue(ExportacaoService.pode_retomar(exportacao))
+        
+        with mock.patch.object(ExportacaoService, '_exportar_turma', wraps=original) as exportar:
+            self.assertTrue(ExportacaoService.executar(exportacao.pk))
+        self.assertEqual([chamada.args[1].turma_id for chamada in exportar.call_args_list], [self.turmas[1].id])
+        exportacao.refresh_from_db()
+        self.assertEqual(exportacao.status, 'CONCLUIDA')
+    
+    def test_exportacao_em_execucao_nao_roda_duas_vezes(self):
+        """Uma exportação com sinal de vida recente não pode ser iniciada de novo"""
+        from datetime import timedelta
+        from django.utils import timezone
+        from core.export import ExportacaoService
+        from core.models import ExportacaoBoletins
+        
+        exportacao = ExportacaoService.criar()
+        ExportacaoBoletins.objects.filter(pk=exportacao.pk).update(status='EXECUTANDO', data_atualizacao=timezone.now())
+        self.assertFalse(ExportacaoService.executar(exportacao.pk))
+        
+        # Sem sinal de vida: considerada interrompida
+        ExportacaoBoletins.objects.filter(pk=exportacao.pk).update(data_atualizacao=timezone.now() - timedelta(hours=1))
+        exportacao.refresh_from_db()
+        self.assertTrue(ExportacaoService.pode_retomar(exportacao))
+        self.assertTrue(ExportacaoService.executar(exportacao.pk))
+    
+    def test_paginas_de_exportacao(self):
+        """A secretaria inicia a exportação e acompanha o status por polling"""
+        from unittest import mock
+        from core.export import ExportacaoService
+        from core.models import ExportacaoBoletins
+        
+        User.objects.create_superuser(username='secretaria_export', password='123')
+        client = Client()
+        client.login(username='secretaria_export', password='123')
+        
+        response = client.get(reverse('admin_panel:exportacoes_boletins'))
+        self.assertContains(response, 'Nova exportação')
+        
+        with mock.patch.object(ExportacaoService, 'iniciar_em_background') as iniciar:
+            response = client.post(reverse('admin_panel:exportacoes_boletins'), {'unidade': ''})
+        exportacao = ExportacaoBoletins.objects.get()
+        iniciar.assert_called_once_with(exportacao.pk)
+        self.assertRedirects(response, reverse('admin_panel:exportacao_boletins_status', args=[exportacao.pk]))
+        
+        ExportacaoService.executar(exportacao.pk)
+        dados = client.get(reverse('admin_panel:exportacao_boletins_status_data', args=[exportacao.pk])).json()
+        self.assertEqual(dados['status'], 'CONCLUIDA')
+        self.assertTrue(dados['arquivo_disponivel'])
+        
+        response = client.get(reverse('admin_panel:exportacao_boletins_status', args=[exportacao.pk]))
+        self.assertContains(response, 'Baixar ZIP')
+        response = client.get(reverse('admin_panel:exportacao_boletins_download', args=[exportacao.pk]))
+        self.assertEqual(response['Content-Type'], 'application/zip')
+        response.close()
+
+
+@override_settings(BOLETIM_WORKERS=1)
+class BoletimCacheTestCase(FabricaDadosMixin, TestCase):
+    """Testes do cache de boletins renderizados"""
+    
+    def setUp(self):
+        import shutil
+        import tempfile
+        from core.render_cache import BoletimCache
+        
+        self.cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_dir, ignore_errors=True)
+        cache = override_settings(BOLETIM_CACHE_DIR=self.cache_dir)
+        cache.enable()
+        self.addCleanup(cache.disable)
+        BoletimCache._tamanho_estimado = None
+        
+        turma = Turma.objects.create(
+            tipo_turma=TipoTurma.objects.create(nome='Teens Cache'),
+            identificador_turma='TC1',
+            boletim_tipo='adolescentes_adultos'
+        )
+        competencias = self._criar_competencias()
+        self.alunos = [Aluno.objects.create(nome_completo=nome, turma=turma) for nome in ('Ana', 'Bia')]
+        for aluno in self.alunos:
+            for competencia in competencias:
+                LancamentoDeNota.objects.create(aluno=aluno, competencia=competencia, nota_valor='80')
+    
+    def test_boletins_inalterados_servidos_do_cache(self):
+        """Só o aluno cuja nota mudou é renderizado de novo"""
+        from unittest import mock
+        from core import batch
+        
+        primeira = batch.BoletimBatchRenderer.renderizar(self.alunos)
+        self.assertEqual([r['em_cache'] for r in primeira], [False, False])
+        
+        with mock.patch('core.batch._renderizar_em_bytes', wraps=batch._renderizar_em_bytes) as renderizar:
+            segunda = batch.BoletimBatchRenderer.renderizar(self.alunos)
+            self.assertEqual(renderizar.call_count, 0)
+            self.assertEqual([r['conteudo'] for r in segunda], [r['conteudo'] for r in primeira])
+            
+            nota = LancamentoDeNota.objects.filter(aluno=self.alunos[1]).first()
+            nota.nota_valor = '55'
+            nota.save()
+            terceira = batch.BoletimBatchRenderer.renderizar(self.alunos)
+            self.assertEqual(renderizar.call_count, 1)
+        self.assertEqual([r['em_cache'] for r in terceira], [True, False])
+    
+    def test_chave_muda_com_template_e_nota_final(self):
+        """A chave depende do hash do template e das substituições (incluindo nota_final)"""
+        from unittest import mock
+        from core.render_cache import BoletimCache
+        from core.utils import BoletimGenerator
+        
+        substituicoes = BoletimGenerator.montar_substituicoes(self.alunos[0])
+        chave = BoletimCache.chave('adolescentes_adultos', substituicoes)
+        self.assertEqual(chave, BoletimCache.chave('adolescentes_adultos', dict(substituicoes)))
+        self.assertNotEqual(chave, BoletimCache.chave('adolescentes_adultos', {**substituicoes, 'nota_final': 'D'}))
+        with mock.patch.object(BoletimGenerator, 'hash_template', return_value='outro-template'):
+            self.assertNotEqual(chave, BoletimCache.chave('adolescentes_adultos', substituicoes))
+    
+    def test_limpeza_remove_os_menos_usados(self):
+        """Acima do limite, saem primeiro os boletins usados há mais tempo"""
+        import os
+        from core.render_cache import BoletimCache
+        
+        for indice, chave in enumerate(['aa01', 'bb02', 'cc03']):
+            BoletimCache.guardar(chave, b'x' * 100)
+            os.utime(BoletimCache._caminho(chave), (1000 + indice, 1000 + indice))
+        BoletimCache.obter('aa01')  # Usado agora: passa a ser o mais recente
+        
+        resultado = BoletimCache.limpar(max_bytes=250)
+        self.assertEqual((resultado['removidos'], resultado['bytes_restantes']), (1, 200))
+        self.assertTrue(BoletimCache.contem('aa01'))
+        self.assertFalse(BoletimCache.contem('bb02'))
+        self.assertTrue(BoletimCache.contem('cc03'))
+    
+    def test_comando_limpar_cache(self):
+        """O comando limpar_cache_boletins --tudo esvazia o cache"""
+        from django.core.management import call_command
+        from core.render_cache import BoletimCache
+        
+        BoletimCache.guardar('dd04', b'x' * 10)
+        saida = io.StringIO()
+        call_command('limpar_cache_boletins', tudo=True, stdout=saida)
+        self.assertIn('1 boletim(ns) removido(s)', saida.getvalue())
+        self.assertFalse(BoletimCache.contem('dd04'))
+
+
+def _weasyprint_disponivel():
+    try:
+        import weasyprint  # noqa: F401
+    except (ImportError, OSError):
+        return False
+    return True
+
+
+class BoletimPdfTestCase(FabricaDadosMixin, TestCase):
+    """Testes dos boletins em PDF gerados a partir dos templates HTML"""
+    
+    def setUp(self):
+        self.turma = Turma.objects.create(
+            tipo_turma=TipoTurma.objects.create(nome='Teens PDF'),
+            identificador_turma='TP1',
+            boletim_tipo='adolescentes_adultos'
+        )
+        competencias = self._criar_competencias()
+        self.alunos = []
+        for nome in ['Carla', 'Ana', 'Bruno']:
+            aluno = Aluno.objects.create(nome_completo=nome, turma=self.turma)
+            for competencia in competencias:
+                LancamentoDeNota.objects.create(aluno=aluno, competencia=competencia, nota_valor='85')
+            self.alunos.append(aluno)
+    
+    def test_template_html_por_tipo_de_boletim(self):
+        """Cada tipo de boletim tem um template HTML que usa todos os seus placeholders"""
+        from core.pdf import BoletimPdfRenderer
+        from core.utils import BoletimGenerator
+        
+        for boletim_tipo, placeholders in BoletimGenerator.COMPETENCIA_PLACEHOLDERS.items():
+            substituicoes = {'aluno': 'Ana', 'nivel': 'Nível X', 'professor': 'Prof Y'}
+            substituicoes.update({chave: f'[{chave}]' for chave in placeholders})
+            html = BoletimPdfRenderer.renderizar_html(boletim_tipo, substituicoes)
+            self.assertIn(f'boletim-{boletim_tipo}', html)
+            for valor in substituicoes.values():
+                self.assertIn(valor, html, boletim_tipo)
+        
+        with self.assertRaises(ValueError):
+            BoletimPdfRenderer.renderizar_html('inexistente', {})
+    
+    def test_documento_unico_com_os_boletins_da_turma(self):
+        """Os boletins da turma vão num único documento HTML, na ordem recebida"""
+        from core.pdf import BoletimPdfRenderer
+        
+        Turma.objects.filter(pk=self.turma.pk).update(boletim_tipo='inexistente')
+        sem_template = Aluno.objects.create(nome_completo='Eva', turma=Turma.objects.get(pk=self.turma.pk))
+        
+        html, gerados, falhas = BoletimPdfRenderer.montar_documento(self.alunos + [sem_template])
+        
+        self.assertEqual(gerados, 3)
+        self.assertEqual(html.count('<section class="boletim'), 3)
+        self.assertLess(html.index('Carla'), html.index('Ana'))
+        self.assertLess(html.index('Ana'), html.index('Bruno'))
+        self.assertEqual(html.count('<td class="nota">85</td>'), 9)
+        self.assertEqual([falha['aluno'] for falha in falhas], ['Eva'])
+    
+    def test_pdf_indisponivel_volta_para_a_turma(self):
+        """Sem o WeasyPrint, a view avisa e volta para a página da turma"""
+        from unittest import mock
+        from core.pdf import BoletimPdfRenderer, PdfIndisponivelError
+        
+        User.objects.create_superuser(username='admin_pdf', password='123')
+        client = Client()
+        client.login(username='admin_pdf', password='123')
+        
+        with mock.patch.object(BoletimPdfRenderer, '_weasyprint', side_effect=PdfIndisponivelError('sem pango')):
+            response = client.get(reverse('admin_panel:gerar_boletins_turma_pdf', args=[self.turma.id]))
+        self.assertRedirects(
+            response, reverse('admin_panel:detalhes_turma', args=[self.turma.id]), fetch_redirect_response=False
+        )
+    
+    @unittest.skipUnless(_weasyprint_disponivel(), 'WeasyPrint indisponível neste ambiente')
+    def test_pdf_da_turma_com_estilo_compartilhado(self):
+        """Um PDF por turma, uma página por aluno, com a mesma folha de estilo compilada"""
+        from core.pdf import BoletimPdfRenderer
+        
+        BoletimPdfRenderer.limpar_cache_estilo()
+        pdf, falhas = BoletimPdfRenderer.gerar_pdf_turma(self.turma)
+        self.assertEqual(falhas, [])
+        self.assertTrue(pdf.startswith(b'%PDF'))
+        self.assertEqual(len(re.findall(rb'/Type\s*/Page\b', pdf)), 3)
+        
+        css = BoletimPdfRenderer._folha_de_estilo()[0]
+        BoletimPdfRenderer.gerar_pdf(self.alunos[:1])
+        self.assertIs(BoletimPdfRenderer._folha_de_estilo()[0], css)
+
+
+class NotaFinalEngineTestCase(TestCase):
+    """Testes do cálculo vetorizado da nota final"""
+    
+    def setUp(self):
+        from core.catalog import CompetenciaRegistry
+        
+        self.competencias = {
+            nome: Competencia.objects.create(nome=nome, tipo_nota='ABC' if nome == 'Checkpoints' else 'NUM')
+            for nome in ('Produção Oral', 'Produção Escrita', 'Avaliações de Progresso', 'Compreensão Oral', 'Checkpoints')
+        }
+        CompetenciaRegistry.invalidar()
+        self.teens = Turma.objects.create(
+            tipo_turma=TipoTurma.objects.create(nome='Teens Final'),
+            identificador_turma='TF1',
+            boletim_tipo='adolescentes_adultos'
+        )
+        self.antigo = Turma.objects.create(
+            tipo_turma=TipoTurma.objects.create(nome='Antigo Final'),
+            identificador_turma='AF1',
+            boletim_tipo='material_antigo'
+        )
+        self.kids = Turma.objects.create(
+            tipo_turma=TipoTurma.objects.create(nome='Kids Final'),
+            identificador_turma='KF1',
+            boletim_tipo='lion_stars'
+        )
+    
+    def _aluno(self, nome, turma, notas):
+        aluno = Aluno.objects.create(nome_completo=nome, turma=turma)
+        for competencia, valor in notas.items():
+            LancamentoDeNota.objects.create(aluno=aluno, competencia=self.competencias[competencia], nota_valor=valor)
+        return aluno
+    
+    def test_regras_de_cada_tipo_de_boletim(self):
+        """40/40/20, média das produções sem avaliações, média simples e conceitos convertidos"""
+        from core.grading import NotaFinalEngine
+        
+        ponderado = self._aluno('Ponderado', self.teens, {'Produção Oral': '70', 'Produção Escrita': '80', 'Avaliações de Progresso': '90'})
+        sem_avaliacoes = self._aluno('Sem Avaliações', self.teens, {'Produção Oral': '95', 'Produção Escrita': '85'})
+        so_oral = self._aluno('Só Oral', self.teens, {'Produção Oral': '95', 'Avaliações de Progresso': '95'})
+        media_simples = self._aluno('Média Simples', self.antigo, {'Produção Oral': '40', 'Compreensão Oral': '60', 'Checkpoints': 'C'})
+        sem_notas = self._aluno('Sem Notas', self.antigo, {})
+        kids = self._aluno('Kids', self.kids, {'Compreensão Oral': '90'})
+        
+        resultado = NotaFinalEngine.calcular()
+        
+        self.assertAlmostEqual(resultado.loc[ponderado.id, 'media'], 78.0)
+        self.assertEqual(resultado.loc[ponderado.id, 'nota_final'], 'B')
+        self.assertEqual(resultado.loc[sem_avaliacoes.id, 'nota_final'], 'A')
+        self.assertEqual(resultado.loc[so_oral.id, 'nota_final'], 'N/A')
+        self.assertAlmostEqual(resultado.loc[media_simples.id, 'media'], (40 + 60 + 67) / 3)
+        self.assertEqual(resultado.loc[media_simples.id, 'nota_final'], 'D')
+        self.assertEqual(resultado.loc[sem_notas.id, 'nota_final'], 'N/A')
+        self.assertIsNone(resultado.loc[kids.id, 'nota_final'])
+    
+    def test_mesmo_resultado_no_boletim_e_numero_fixo_de_queries(self):
+        """O boletim usa o mesmo cálculo; a escola toda é lida com as mesmas queries"""
+        from unittest import mock
+        from core.grading import NotaFinalEngine
+        from core.utils import BoletimGenerator
+        
+        alunos = [
+            self._aluno(f'Aluno {i}', self.teens, {
+                'Produção Oral': str(50 + i * 5), 'Produção Escrita': str(60 + i * 4), 'Avaliações de Progresso': str(70 + i * 3)
+            })
+            for i in range(6)
+        ]
+        NotaFinalEngine.calcular()  # Carrega o catálogo de competências
+        with self.assertNumQueries(2):
+            resultado = NotaFinalEngine.calcular(turmas=Turma.objects.all())
+        
+        for aluno in alunos:
+            with mock.patch('builtins.print'):
+                substituicoes = BoletimGenerator.montar_substituicoes(aluno)
+            self.assertEqual(substituicoes['nota_final'], resultado.loc[aluno.id, 'nota_final'])
+    
+    def test_calculo_escalar_igual_ao_vetorizado(self):
+        """O cálculo de um aluno só (sem pandas) dá o mesmo resultado do cálculo em lote"""
+        from core.grading import NotaFinalEngine
+        
+        alunos = [
+            self._aluno('Ponderado', self.teens, {'Produção Oral': '70', 'Produção Escrita': '80', 'Avaliações de Progresso': '90'}),
+            self._aluno('Sem Avaliações', self.teens, {'Produção Oral': '95', 'Produção Escrita': '85'}),
+            self._aluno('Só Oral', self.teens, {'Produção Oral': '95'}),
+            self._aluno('Média Simples', self.antigo, {'Produção Oral': '40', 'Compreensão Oral': '60', 'Checkpoints': 'C'}),
+            self._aluno('Sem Notas', self.antigo, {}),
+            self._aluno('Kids', self.kids, {'Compreensão Oral': '90'}),
+        ]
+        resultado = NotaFinalEngine.calcular(alunos=alunos)
+        
+        for aluno in alunos:
+            media, nota_final = NotaFinalEngine.calcular_de_notas(aluno.turma.boletim_tipo, aluno.get_notas_boletim())
+            self.assertEqual(nota_final, resultado.loc[aluno.id, 'nota_final'], aluno.nome_completo)
+            if media is None:
+                self.assertNotEqual(resultado.loc[aluno.id, 'media'], resultado.loc[aluno.id, 'media'])  # NaN
+            else:
+                self.assertAlmostEqual(media, resultado.loc[aluno.id, 'media'])
+    
+    def test_lote_calcula_nota_final_numa_passada(self):
+        """Os boletins de uma turma calculam a nota final de todos os alunos de uma vez"""
+        from unittest import mock
+        from core.batch import BoletimBatchRenderer
+        from core.grading import NotaFinalEngine
+        
+        alunos = [
+            self._aluno(f'Aluno {i}', self.teens, {'Produção Oral': str(60 + i * 10), 'Produção Escrita': '80'})
+            for i in range(4)
+        ]
+        with mock.patch('builtins.print'), \
+                mock.patch.object(NotaFinalEngine, 'calcular_matriz', wraps=NotaFinalEngine.calcular_matriz) as matriz, \
+                mock.patch.object(NotaFinalEngine, 'calcular_de_notas') as escalar:
+            lote = BoletimBatchRenderer.preparar(alunos)
+        
+        self.assertEqual(matriz.call_count, 1)
+        escalar.assert_not_called()
+        self.assertEqual([dados['substituicoes']['nota_final'] for dados in lote], ['C', 'B', 'B', 'B'])
+    
+    def test_comando_relatorio(self):
+        """O comando relatorio_notas_finais grava um CSV com todos os alunos"""
+        import csv
+        import os
+        import tempfile
+        from django.core.management import call_command
+        
+        self._aluno('Ponderado', self.teens, {'Produção Oral': '70', 'Produção Escrita': '80', 'Avaliações de Progresso': '90'})
+        self._aluno('Kids', self.kids, {})
+        
+        with tempfile.TemporaryDirectory() as pasta:
+            saida = os.path.join(pasta, 'notas.csv')
+            call_command('relatorio_notas_finais', tipo_turma='Teens Final', saida=saida, stdout=io.StringIO())
+            with open(saida, encoding='utf-8') as arquivo:
+                linhas = list(csv.DictReader(arquivo))
+        
+        self.assertEqual(len(linhas), 1)
+        self.assertEqual((linhas[0]['aluno'], linhas[0]['media'], linhas[0]['nota_final']), ('Ponderado', '78.0', 'B'))
+
+
+class BoletimDataLoaderTestCase(FabricaDadosMixin, TestCase):
+    """Testes do carregamento em lote dos dados dos boletins"""
+    
+    def setUp(self):
+        professor = Professor.objects.create(
+            user=User.objects.create_user(username='prof_loader', password='123'), nome_completo='Prof Loader'
+        )
+        self.turma = Turma.objects.create(
+            tipo_turma=TipoTurma.objects.create(nome='Teens Loader'),
+            identificador_turma='TD1',
+            professor_responsavel=professor,
+            boletim_tipo='adolescentes_adultos'
+        )
+        self.competencias = self._criar_competencias()
+    
+    def _notas(self, quantidade):
+        # A última competência fica sem nota
+        return [dict.fromkeys(self.competencias[:2], str(60 + i)) for i in range(quantidade)]
+    
+    def _preparar(self):
+        from core.batch import BoletimBatchRenderer
+        
+        # Sem select_related: o loader busca as relações de uma vez
+        alunos = list(Aluno.objects.filter(turma=self.turma))
+        queries, lote = self._contar_queries(BoletimBatchRenderer.preparar, alunos)
+        self.assertTrue(all(dados['erro'] is None for dados in lote))
+        return queries, lote
+    
+    def test_mesmas_notas_que_get_notas_boletim(self):
+        """O loader entrega as notas no mesmo formato e ordem de Aluno.get_notas_boletim()"""
+        from core.boletim_data import BoletimDataLoader
+        
+        self._adicionar_alunos(self.turma, self._notas(3))
+        for dados in BoletimDataLoader.carregar_turma(self.turma):
+            self.assertEqual(dados['notas'], dados['aluno'].get_notas_boletim())
+    
+    def test_numero_de_queries_nao_cresce_com_a_turma(self):
+        """Preparar os boletins de 2 ou de 12 alunos custa as mesmas queries"""
+        self._adicionar_alunos(self.turma, self._notas(2))
+        self._preparar()  # Carrega o catálogo de competências
+        queries_turma_pequena, _ = self._preparar()
+        
+        self._adicionar_alunos(self.turma, self._notas(10))
+        queries_turma_grande, lote = self._preparar()
+        
+        self.assertEqual(queries_turma_pequena, queries_turma_grande)
+        self.assertEqual(len(lote), 12)
+        self.assertEqual(lote[0]['substituicoes']['professor'], 'Prof Loader')
+        self.assertEqual(lote[0]['substituicoes']['producao_oral'], '60')
+        self.assertEqual(lote[0]['substituicoes']['avaliacoes_de_progresso'], 'N/A')
+
+
+class CompletudeAlunosTestCase(FabricaDadosMixin, TestCase):
+    """Testes da verificação em lote das notas completas dos alunos"""
+    
+    def setUp(self):
+        self.turma = Turma.objects.create(
+            tipo_turma=TipoTurma.objects.create(nome='Teens Completude'),
+            identificador_turma='TC1',
+            boletim_tipo='adolescentes_adultos'
+        )
+        self.competencias = self._criar_competencias()
+        User.objects.create_superuser(username='admin_completude', password='123')
+        self.client = Client()
+        self.client.login(username='admin_completude', password='123')
+    
+    def _notas(self, quantidade):
+        # Alunos pares com todas as notas, ímpares só com a primeira
+        return [dict.fromkeys(self.competencias[:3 if i % 2 == 0 else 1], '80') for i in range(quantidade)]
+    
+    def test_mesmo_resultado_que_os_metodos_do_aluno(self):
+        """A verificação em lote confere com tem_notas_completas() e get_progresso_completo()"""
+        from core.progress import ProgressEngine
+        
+        self._adicionar_alunos(self.turma, self._notas(4))
+        Aluno.objects.create(nome_completo='Inativo', turma=self.turma, ativo=False)
+        
+        completude = ProgressEngine.completude_alunos(self.turma)
+        
+        alunos = list(self.turma.alunos.filter(ativo=True))
+        self.assertEqual(list(completude), [aluno.id for aluno in alunos])
+        for aluno in alunos:
+            info = completude[aluno.id]
+            self.assertEqual(info['completo'], aluno.tem_notas_completas())
+            self.assertEqual(info['progresso'], aluno.get_progresso_completo())
+        self.assertEqual(completude[alunos[1].id]['faltando'], ['Produção Escrita', 'Avaliações de Progresso'])
+        self.assertEqual(completude[alunos[1].id]['notas_lancadas'], 1)
+    
+    def test_verificar_notas_turma_com_queries_constantes(self):
+        """O status JSON custa as mesmas queries para 2 ou 10 alunos"""
+        url = reverse('admin_panel:verificar_notas_turma', args=[self.turma.id])
+        self._adicionar_alunos(self.turma, self._notas(2))
+        self.client.get(url)  # Carrega o catálogo de competências
+        queries_turma_pequena, _ = self._contar_queries(self.client.get, url)
+        
+        self._adicionar_alunos(self.turma, self._notas(8))
+        queries_turma_grande, response = self._contar_queries(self.client.get, url)
+        dados = response.json()
+        
+        self.assertEqual(queries_turma_pequena, queries_turma_grande)
+        self.assertEqual((dados['alunos_completos'], dados['alunos_incompletos']), (5, 5))
+        self.assertEqual(dados['alunos_status'][1]['competencias_faltando'], ['Produção Escrita', 'Avaliações de Progresso'])
+
+
+class MapaPlaceholdersTestCase(TestCase):
+    """Testes do mapa competência → placeholder compilado por boletim"""
+    
+    def setUp(self):
+        from core.catalog import CompetenciaRegistry
+        from core.utils import BoletimGenerator
+        
+        BoletimGenerator._mapas_placeholders.clear()
+        self.turma = Turma.objects.create(
+            tipo_turma=TipoTurma.objects.create(nome='Junior Mapa'),
+            identificador_turma='JM1',
+            boletim_tipo='junior'
+        )
+        self.competencias = {
+            nome: Competencia.objects.create(nome=nome, tipo_nota='NUM')
+            for nome in Turma.COMPETENCIAS_POR_BOLETIM['junior']
+        }
+        CompetenciaRegistry.invalidar()
+    
+    def test_aliases_e_match_parcial(self):
+        """'Compreensão de Leitura' preenche compreensao_escrita pelo alias"""
+        from core.boletim_data import BoletimDataLoader
+        from core.utils import BoletimGenerator
+        
+        mapa = BoletimGenerator.mapa_placeholders('junior', BoletimDataLoader.competencias('junior'))
+        
+        self.assertEqual(list(mapa), BoletimGenerator.COMPETENCIA_PLACEHOLDERS['junior'])
+        self.assertEqual(mapa['compreensao_escrita'], self.competencias['Compreensão de Leitura'].id)
+        self.assertEqual(mapa['interesse_pela_aprendizagem'], self.competencias['Interesse pela Aprendizagem'].id)
+    
+    def test_compilado_uma_vez_ate_as_competencias_mudarem(self):
+        """Os nomes são normalizados uma vez por boletim, não por aluno; renomear gera outro mapa"""
+        from unittest import mock
+        from core.batch import BoletimBatchRenderer
+        from core.catalog import CompetenciaRegistry
+        from core.utils import BoletimGenerator
+        
+        alunos = []
+        for i in range(5):
+            aluno = Aluno.objects.create(nome_completo=f'Aluno {i}', turma=self.turma)
+            LancamentoDeNota.objects.create(
+                aluno=aluno, competencia=self.competencias['Compreensão de Leitura'], nota_valor=str(70 + i)
+            )
+            alunos.append(aluno)
+        
+        with mock.patch('builtins.print'), \
+                mock.patch.object(BoletimGenerator, 'COMPETENCIA_ALIASES', wraps=BoletimGenerator.COMPETENCIA_ALIASES) as aliases:
+            lote = BoletimBatchRenderer.preparar(alunos)
+        self.assertEqual(aliases.get.call_count, len(BoletimGenerator.COMPETENCIA_PLACEHOLDERS['junior']))
+        self.assertEqual([dados['substituicoes']['compreensao_escrita'] for dados in lote], ['70', '71', '72', '73', '74'])
+        self.assertEqual(lote[0]['substituicoes']['colaboracao'], 'N/A')
+        
+        competencia = self.competencias['Compreensão de Leitura']
+        competencia.nome = 'Leitura'
+        competencia.save()
+        CompetenciaRegistry.invalidar()
+        with mock.patch('builtins.print'):
+            lote = BoletimBatchRenderer.preparar(alunos[:1])
+        self.assertEqual(lote[0]['substituicoes']['compreensao_escrita'], 'N/A')
+        self.assertEqual(len(BoletimGenerator._mapas_placeholders), 2)
+
+
+class BenchmarkBoletinsTestCase(TestCase):
+    """Testes do benchmark de geração de boletins"""
+    
+    def test_resultado_em_json_sem_deixar_dados(self):
+        """O benchmark grava todos os cenários em JSON e desfaz as turmas sintéticas"""
+        import os
+        import tempfile
+        from django.core.management import call_command
+        
+        with tempfile.TemporaryDirectory() as pasta:
+            saida = os.path.join(pasta, 'benchmark.json')
+            call_command(
+                'benchmark_boletins', tamanhos=[2], tipos=['junior'], workers=1, repeticoes=1,
+                json=saida, stdout=io.StringIO()
+            )
+            with open(saida, encoding='utf-8') as arquivo:
+                resultado = json.load(arquivo)
+        
+        self.assertEqual(
+            [cenario['cenario'] for cenario in resultado['cenarios']],
+            ['template', 'individual', 'etapas', 'turma', 'escola']
+        )
+        etapas = resultado['cenarios'][2]
+        self.assertEqual(etapas['documentos'], 2)
+        self.assertEqual(set(etapas['etapas_ms']), {'busca_dados', 'substituicao', 'serializacao', 'zip'})
+        for cenario in resultado['cenarios'][1:]:
+            self.assertGreater(cenario['docs_por_segundo'], 0)
+            self.assertGreater(cenario['pico_memoria_mb'], 0)
+        self.assertFalse(Turma.objects.exists())
+        self.assertFalse(Aluno.objects.exists())
+
+
+@override_settings(STORAGES=STORAGES_TESTE)
+class GradeNotasTestCase(TestCase):
+    """Testes da grade de notas da turma inteira (upsert em lote)"""
+    
+    def setUp(self):
+        from core.catalog import CompetenciaRegistry
+        
+        self.user = User.objects.create_user(username='prof_grade', password='123')
+        self.professor = Professor.objects.create(user=self.user)
+        self.turma = Turma.objects.create(
+            tipo_turma=TipoTurma.objects.create(nome='Teens Grade'),
+            identificador_turma='TG1',
+            professor_responsavel=self.professor,
+            boletim_tipo='adolescentes_adultos'
+        )
+        self.oral = Competencia.objects.create(nome='Produção Oral', tipo_nota='NUM')
+        self.escrita = Competencia.objects.create(nome='Produção Escrita', tipo_nota='ABC')
+        CompetenciaRegistry.invalidar()
+        self.client = Client()
+        self.client.login(username='prof_grade', password='123')
+        self.url = reverse('teacher_portal:lancamento_notas_grade', args=[self.turma.id])
+    
+    def _alunos(self, quantidade):
+        inicio = self.turma.alunos.count()
+        return [
+            Aluno.objects.create(nome_completo=f'Aluno Grade {i:02d}', turma=self.turma)
+            for i in range(inicio, inicio + quantidade)
+        ]
+    
+    def _post(self, celulas):
+        return self.client.post(self.url, json.dumps({'celulas': celulas}), content_type='application/json')
+    
+    def test_grava_criacoes_e_atualizacoes(self):
+        """Notas novas e alteradas são gravadas com nota_numerica e o progresso atualizado"""
+        from core.models import ProgressoAluno
+        
+        aluno, outro = self._alunos(2)
+        LancamentoDeNota.objects.create(aluno=aluno, competencia=self.oral, nota_valor='50')
+        
+        response = self._post([
+            {'aluno': aluno.id, 'competencia': self.oral.id, 'valor': '85'},
+            {'aluno': aluno.id, 'competencia': self.escrita.id, 'valor': 'b'},
+            {'aluno': outro.id, 'competencia': self.oral.id, 'valor': ' 70 '},
+            {'aluno': outro.id, 'competencia': self.escrita.id, 'valor': ''},
+        ])
+        
+        self.assertEqual(
+            response.json(),
+            {'sucesso': True, 'salvas': 3, 'criadas': 2, 'atualizadas': 1, 'erros': []}
+        )
+        notas = {
+            (nota.aluno_id, nota.competencia_id): (nota.nota_valor, nota.nota_numerica)
+            for nota in LancamentoDeNota.objects.all()
+        }
+        self.assertEqual(notas, {
+            (aluno.id, self.oral.id): ('85', 85.0),
+            (aluno.id, self.escrita.id): ('B', 3),
+            (outro.id, self.oral.id): ('70', 70.0),
+        })
+        self.assertTrue(ProgressoAluno.objects.get(aluno=aluno).completo)
+        self.assertEqual(ProgressoAluno.objects.get(aluno=outro).notas_lancadas, 1)
+    
+    def test_celula_invalida_nao_grava_nada(self):
+        """Uma célula inválida rejeita a submissão inteira com o erro por célula"""
+        aluno = self._alunos(1)[0]
+        de_outra_turma = Aluno.objects.create(
+            nome_completo='Intruso',
+            turma=Turma.objects.create(tipo_turma=self.turma.tipo_turma, identificador_turma='TG2')
+        )
+        
+        response = self._post([
+            {'aluno': aluno.id, 'competencia': self.oral.id, 'valor': '85'},
+            {'aluno': aluno.id, 'competencia': self.escrita.id, 'valor': 'E'},
+            {'aluno': de_outra_turma.id, 'competencia': self.oral.id, 'valor': '90'},
+        ])
+        
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            [(erro['aluno'], erro['competencia']) for erro in response.json()['erros']],
+            [(aluno.id, self.escrita.id), (de_outra_turma.id, self.oral.id)]
+        )
+        self.assertFalse(LancamentoDeNota.objects.exists())
+    
+    def test_salvar_a_turma_com_queries_constantes(self):
+        """Salvar 3 ou 21 alunos custa as mesmas queries"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        
+        def celulas(alunos, nota_oral):
+            return [
+                {'aluno': aluno.id, 'competencia': competencia.id, 'valor': valor}
+                for aluno in alunos
+                for competencia, valor in ((self.oral, nota_oral), (self.escrita, 'A'))
+            ]
+        
+        primeiros = self._alunos(1)
+        self._post(celulas(primeiros, '60'))  # Carrega o catálogo de competências
+        
+        # Em cada envio, os alunos já lançados mudam a nota oral e os novos recebem as duas
+        poucos = self._alunos(2)
+        with CaptureQueriesContext(connection) as turma_pequena:
+            self._post(celulas(primeiros + poucos, '70'))
+        
+        muitos = self._alunos(18)
+        with CaptureQueriesContext(connection) as turma_grande:
+            response = self._post(celulas(primeiros + poucos + muitos, '80'))
+        
+        self.assertEqual(response.json()['criadas'], 36)
+        self.assertEqual(response.json()['atualizadas'], 3)
+        self.assertEqual(len(turma_pequena.captured_queries), len(turma_grande.captured_queries))
+        self.assertEqual(LancamentoDeNota.objects.filter(nota_valor='80').count(), 21)
+    
+    def test_grade_exibe_notas_e_bloqueia_outros_professores(self):
+        """A grade mostra as notas existentes e só abre para o professor da turma"""
+        aluno = self._alunos(1)[0]
+        LancamentoDeNota.objects.create(aluno=aluno, competencia=self.oral, nota_valor='77')
+        
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'value="77"')
+        self.assertContains(response, aluno.nome_completo)
+        
+        User.objects.create_user(username='outro_prof', password='123')
+        self.client.login(username='outro_prof', password='123')
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+        self.assertEqual(self._post([{'aluno': aluno.id, 'competencia': self.oral.id, 'valor': '10'}]).status_code, 404)
+
+
+class LancamentoServiceTestCase(TestCase):
+    """Testes da gravação de notas por aluno (diff, transação e auditoria)"""
+    
+    def setUp(self):
+        from core.catalog import CompetenciaRegistry
+        
+        self.user = User.objects.create_user(username='prof_servico', password='123')
+        Professor.objects.create(user=self.user)
+        self.turma = Turma.objects.create(
+            tipo_turma=TipoTurma.objects.create(nome='Teens Servico'),
+            identificador_turma='TS1',
+            professor_responsavel=self.user.professor,
+            boletim_tipo='adolescentes_adultos'
+        )
+        self.competencias = [
+            Competencia.objects.create(nome=nome, tipo_nota=tipo_nota)
+            for nome, tipo_nota in (('Produção Oral', 'NUM'), ('Produção Escrita', 'ABC'), ('Avaliações de Progresso', 'NUM'))
+        ]
+        CompetenciaRegistry.invalidar()
+        self.aluno = Aluno.objects.create(nome_completo='Aluno Servico', turma=self.turma)
+        self.client = Client()
+        self.client.login(username='prof_servico', password='123')
+        self.url = reverse('teacher_portal:lancamento_notas_aluno', args=[self.turma.id, self.aluno.id])
+    
+    def _post(self, oral, escrita, avaliacoes=''):
+        oral_id, escrita_id, avaliacoes_id = (competencia.id for competencia in self.competencias)
+        return self.client.post(self.url, {
+            f'nota-{oral_id}': oral,
+            f'nota-{escrita_id}': escrita,
+            f'nota-{avaliacoes_id}': avaliacoes,
+            'acao': 'salvar_voltar',
+        })
+    
+    def test_um_registro_de_auditoria_por_envio(self):
+        """Cada envio gera um único AuditLog com as células alteradas em detalhes_json"""
+        from core.models import AuditLog, ProgressoAluno
+        
+        self._post('80', 'b')
+        oral, escrita, _ = self.competencias
+        
+        log = AuditLog.objects.get()
+        self.assertEqual((log.usuario, log.acao, log.modelo_afetado), (self.user, 'CREATE', 'LancamentoDeNota'))
+        self.assertEqual(log.detalhes_json['origem'], 'aluno')
+        self.assertCountEqual(log.detalhes_json['alteracoes'], [
+            {'aluno': self.aluno.id, 'competencia': oral.id, 'anterior': None, 'novo': '80'},
+            {'aluno': self.aluno.id, 'competencia': escrita.id, 'anterior': None, 'novo': 'B'},
+        ])
+        self.assertEqual(ProgressoAluno.objects.get(aluno=self.aluno).notas_lancadas, 2)
+        
+        self._post('85', 'B', '70')
+        log = AuditLog.objects.order_by('-pk').first()
+        self.assertEqual(AuditLog.objects.count(), 2)
+        self.assertEqual(log.acao, 'UPDATE')
+        self.assertEqual((log.detalhes_json['criadas'], log.detalhes_json['atualizadas']), (1, 1))
+        self.assertCountEqual(
+            [(alteracao['anterior'], alteracao['novo']) for alteracao in log.detalhes_json['alteracoes']],
+            [('80', '85'), (None, '70')]
+        )
+        self.assertTrue(ProgressoAluno.objects.get(aluno=self.aluno).completo)
+    
+    def test_reenvio_sem_mudancas_nao_escreve(self):
+        """Reenviar os mesmos valores não faz escrita nem gera log"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from core.models import AuditLog
+        
+        self._post('80', 'B', '70')
+        data_atualizacao = LancamentoDeNota.objects.get(competencia=self.competencias[0]).data_atualizacao
+        
+        with CaptureQueriesContext(connection) as consultas:
+            response = self._post('80', 'B', '70')
+        
+        self.assertEqual(response.status_code, 302)
+        escritas = [
+            query['sql'] for query in consultas.captured_queries
+            if re.match(r'\s*(INSERT|UPDATE|DELETE)', query['sql']) and 'core_lancamentodenota' in query['sql']
+        ]
+        self.assertEqual(escritas, [])
+        self.assertEqual(AuditLog.objects.count(), 1)
+        self.assertEqual(
+            LancamentoDeNota.objects.get(competencia=self.competencias[0]).data_atualizacao, data_atualizacao
+        )
+    
+    def test_nota_invalida_nao_grava_nada(self):
+        """Uma nota inválida volta para o formulário sem gravar as demais"""
+        response = self._post('80', 'E')
+        
+        self.assertRedirects(response, self.url, fetch_redirect_response=False)
+        self.assertFalse(LancamentoDeNota.objects.exists())
+    
+    def test_upsert_em_conflito_incrementa_a_versao(self):
+        """Nota criada por outra requisição entre a leitura e o upsert ganha versão nova"""
+        from unittest import mock
+        from core.lancamentos import LancamentoService
+        
+        oral, escrita, _ = self.competencias
+        existente = LancamentoDeNota.objects.create(aluno=self.aluno, competencia=oral, nota_valor='40')
+        self.assertEqual(existente.versao, 1)
+        
+        # A leitura das notas atuais não vê a nota recém-criada: as duas células vão pelo upsert
+        with mock.patch('django.db.models.query.QuerySet.values_list', return_value=[]):
+            gravacao = LancamentoService.gravar(
+                {(self.aluno.id, oral.id): '90', (self.aluno.id, escrita.id): 'B'},
+                {competencia.id: competencia for competencia in self.competencias},
+            )
+        
+        self.assertEqual(gravacao['criadas'], 2)
+        self.assertEqual(
+            dict(LancamentoDeNota.objects.values_list('competencia_id', 'versao')),
+            {oral.id: 2, escrita.id: 1},
+        )
+        self.assertEqual(LancamentoDeNota.objects.get(competencia=oral).nota_valor, '90')
+
+
+@override_settings(STORAGES=STORAGES_TESTE)
+class AutosaveNotaTestCase(TestCase):
+    """Testes do autosave de uma célula com controle de concorrência otimista"""
+    
+    def setUp(self):
+        from core.catalog import CompetenciaRegistry
+        
+        self.user = User.objects.create_user(username='prof_autosave', password='123')
+        Professor.objects.create(user=self.user)
+        self.turma = Turma.objects.create(
+            tipo_turma=TipoTurma.objects.create(nome='Teens Autosave'),
+            identificador_turma='TA1',
+            professor_responsavel=self.user.professor,
+            boletim_tipo='adolescentes_adultos'
+        )
+        self.competencia = Competencia.objects.create(nome='Produção Oral', tipo_nota='NUM')
+        CompetenciaRegistry.invalidar()
+        self.aluno = Aluno.objects.create(nome_completo='Aluno Autosave', turma=self.turma)
+        self.client = Client()
+        self.client.login(username='prof_autosave', password='123')
+        self.url = reverse('teacher_portal:autosalvar_nota', args=[self.turma.id])
+    
+    def _autosave(self, valor, versao):
+        return self.client.post(self.url, json.dumps({
+            'aluno': self.aluno.id, 'competencia': self.competencia.id, 'valor': valor, 'versao': versao,
+        }), content_type='application/json')
+    
+    def test_versao_avanca_a_cada_gravacao(self):
+        """Criar e alterar a célula devolvem a nova versão; valor igual não grava"""
+        from core.models import AuditLog, ProgressoAluno
+        
+        response = self._autosave('80', 0)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['versao'], 1)
+        self.assertEqual(ProgressoAluno.objects.get(aluno=self.aluno).notas_lancadas, 1)
+        
+        response = self._autosave('85', 1)
+        self.assertEqual(response.json()['versao'], 2)
+        nota = LancamentoDeNota.objects.get()
+        self.assertEqual((nota.nota_valor, nota.nota_numerica, nota.versao), ('85', 85.0, 2))
+        
+        self.assertEqual(self._autosave('85', 2).json()['versao'], 2)
+        self.assertEqual(AuditLog.objects.filter(detalhes_json__origem='autosave').count(), 2)
+        
+        response = self.client.get(
+            reverse('teacher_portal:lancamento_notas_aluno', args=[self.turma.id, self.aluno.id])
+        )
+        self.assertContains(response, 'data-versao="2"')
+    
+    def test_gravacao_desatualizada_responde_409(self):
+        """Uma alteração feita por outra pessoa (ex: admin) faz o autosave antigo falhar com 409"""
+        self._autosave('80', 0)
+        nota = LancamentoDeNota.objects.get()
+        nota.nota_valor = '60'
+        nota.save()
+        
+        response = self._autosave('90', 1)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual((response.json()['nota_valor'], response.json()['versao']), ('60', 2))
+        self.assertEqual(LancamentoDeNota.objects.get().nota_valor, '60')
+        
+        # Célula vazia na página, mas já criada por outra pessoa
+        self.assertEqual(self._autosave('70', 0).status_code, 409)
+        # Depois de ver a nota atual, o professor pode sobrescrever com a versão nova
+        self.assertEqual(self._autosave('90', 2).status_code, 200)
+    
+    def test_nota_invalida_responde_400(self):
+        """Notas inválidas e alunos de outra turma são recusados sem gravar"""
+        response = self._autosave('150', 0)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('entre 0 e 100', response.json()['erro'])
+        
+        outra = Turma.objects.create(tipo_turma=self.turma.tipo_turma, identificador_turma='TA2')
+        self.aluno = Aluno.objects.create(nome_completo='Intruso', turma=outra)
+        self.assertEqual(self._autosave('80', 0).status_code, 400)
+        self.assertFalse(LancamentoDeNota.objects.exists())
+    
+    def test_gravacao_em_lote_e_admin_respeitam_a_versao(self):
+        """O salvamento em lote incrementa a versão e o admin recusa formulários desatualizados"""
+        from core.admin import LancamentoDeNotaAdminForm
+        from core.lancamentos import LancamentoService
+        
+        self._autosave('80', 0)
+        nota = LancamentoDeNota.objects.get()
+        dados_admin = {'aluno': self.aluno.id, 'competencia': self.competencia.id, 'nota_valor': '50', 'versao_lida': 1}
+        
+        LancamentoService.salvar_grade(self.turma, [
+            {'aluno': self.aluno.id, 'competencia': self.competencia.id, 'valor': '75'}
+        ])
+        self.assertEqual(LancamentoDeNota.objects.get().versao, 2)
+        
+        formulario = LancamentoDeNotaAdminForm(dados_admin, instance=nota)
+        self.assertFalse(formulario.is_valid())
+        
+        formulario = LancamentoDeNotaAdminForm({**dados_admin, 'versao_lida': 2}, instance=LancamentoDeNota.objects.get())
+        self.assertTrue(formulario.is_valid(), formulario.errors)
+        formulario.save()
+        self.assertEqual(LancamentoDeNota.objects.get().versao, 3)
+        
+        from admin_panel.admin_custom import admin_site
+        self.assertIs(admin_site._registry[LancamentoDeNota].form, LancamentoDeNotaAdminForm)
+    
+    def test_admin_grava_com_update_condicional(self):
+        """Se a nota muda entre a validação e a gravação, o admin não sobrescreve e avisa do conflito"""
+        from unittest import mock
+        from django.contrib.admin.models import LogEntry
+        from core.admin import LancamentoDeNotaAdminForm
+        
+        User.objects.create_superuser(username='admin_versao', password='123')
+        admin_client = Client()
+        admin_client.login(username='admin_versao', password='123')
+        self._autosave('80', 0)
+        nota = LancamentoDeNota.objects.get()
+        url = reverse('custom_admin:core_lancamentodenota_change', args=[nota.pk])
+        self.assertContains(admin_client.get(url), 'name="versao_lida"')
+        dados = {'aluno': self.aluno.id, 'competencia': self.competencia.id, 'nota_valor': '50', 'versao_lida': 1}
+        
+        # Outra gravação acontece depois do clean() (simulado sem a verificação do formulário)
+        self._autosave('60', 1)
+        with mock.patch.object(LancamentoDeNotaAdminForm, 'clean', lambda form: form.cleaned_data):
+            response = admin_client.post(url, dados)
+        self.assertRedirects(response, url, fetch_redirect_response=False)
+        self.assertEqual((LancamentoDeNota.objects.get().nota_valor, LancamentoDeNota.objects.get().versao), ('60', 2))
+        self.assertFalse(LogEntry.objects.exists())
+        
+        response = admin_client.post(url, {**dados, 'versao_lida': 2})
+        self.assertEqual(response.status_code, 302)
+        self.assertNotEqual(response['Location'], url)
+        self.assertEqual((LancamentoDeNota.objects.get().nota_valor, LancamentoDeNota.objects.get().versao), ('50', 3))
+
+
+@override_settings(STORAGES=STORAGES_TESTE)
+class SincronizacaoOfflineTestCase(TestCase):
+    """Testes da sincronização em lote das notas lançadas offline"""
+    
+    def setUp(self):
+        from core.catalog import CompetenciaRegistry
+        
+        self.user = User.objects.create_user(username='prof_offline', password='123')
+        Professor.objects.create(user=self.user)
+        tipo_turma = TipoTurma.objects.create(nome='Teens Offline')
+        self.turma = Turma.objects.create(
+            tipo_turma=tipo_turma,
+            identificador_turma='TO1',
+            professor_responsavel=self.user.professor,
+            boletim_tipo='adolescentes_adultos'
+        )
+        self.outra_turma = Turma.objects.create(
+            tipo_turma=tipo_turma,
+            identificador_turma='TO2',
+            professor_responsavel=Professor.objects.create(user=User.objects.create_user(username='outro_offline')),
+            boletim_tipo='adolescentes_adultos'
+        )
+        self.oral = Competencia.objects.create(nome='Produção Oral', tipo_nota='NUM')
+        self.escrita = Competencia.objects.create(nome='Produção Escrita', tipo_nota='ABC')
+        CompetenciaRegistry.invalidar()
+        self.alunos = [
+            Aluno.objects.create(nome_completo=f'Aluno Offline {i}', turma=self.turma) for i in range(2)
+        ]
+        self.aluno_alheio = Aluno.objects.create(nome_completo='Aluno Alheio', turma=self.outra_turma)
+        self.client = Client()
+        self.client.login(username='prof_offline', password='123')
+        self.url = reverse('teacher_portal:sincronizar_notas')
+    
+    def _sincronizar(self, alteracoes, gzip_=True, usuario=None):
+        import gzip
+        
+        lote = {'alteracoes': alteracoes}
+        if usuario is not None:
+            lote['usuario'] = usuario
+        corpo = json.dumps(lote).encode('utf-8')
+        cabecalhos = {}
+        if gzip_:
+            corpo = gzip.compress(corpo)
+            cabecalhos['HTTP_CONTENT_ENCODING'] = 'gzip'
+        return self.client.post(self.url, corpo, content_type='application/json', **cabecalhos)
+    
+    def _celula(self, aluno, competencia, valor, versao=0, turma=None):
+        turma = turma or self.turma
+        return {
+            'id': f'{turma.id}-{aluno.id}-{competencia.id}', 'turma': turma.id,
+            'aluno': aluno.id, 'competencia': competencia.id, 'valor': valor, 'versao': versao,
+        }
+    
+    def test_lote_compactado_com_resultado_por_celula(self):
+        """Um lote gzip grava as células válidas e devolve conflito/inválida nas demais"""
+        from core.models import AuditLog, ProgressoAluno
+        
+        primeiro, segundo = self.alunos
+        existente = LancamentoDeNota.objects.create(aluno=segundo, competencia=self.oral, nota_valor='40')
+        existente.nota_valor = '45'
+        existente.save()  # versão 2
+        
+        response = self._sincronizar([
+            self._celula(primeiro, self.oral, '80'),
+            self._celula(primeiro, self.escrita, 'a'),
+            self._celula(segundo, self.oral, '90', versao=1),
+            self._celula(segundo, self.escrita, 'Z'),
+            self._celula(self.aluno_alheio, self.oral, '70', turma=self.outra_turma),
+        ])
+        
+        dados = response.json()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((dados['salvas'], dados['conflitos'], dados['invalidas']), (2, 1, 2))
+        self.assertEqual(
+            [(resultado['id'], resultado['status']) for resultado in dados['resultados']],
+            [
+                (f'{self.turma.id}-{primeiro.id}-{self.oral.id}', 'salva'),
+                (f'{self.turma.id}-{primeiro.id}-{self.escrita.id}', 'salva'),
+                (f'{self.turma.id}-{segundo.id}-{self.oral.id}', 'conflito'),
+                (f'{self.turma.id}-{segundo.id}-{self.escrita.id}', 'invalida'),
+                (f'{self.outra_turma.id}-{self.aluno_alheio.id}-{self.oral.id}', 'invalida'),
+            ]
+        )
+        self.assertEqual((dados['resultados'][2]['nota_valor'], dados['resultados'][2]['versao']), ('45', 2))
+        # Só a recusa por permissão é marcada: o service worker mantém essa célula na fila
+        self.assertTrue(dados['resultados'][4]['sem_permissao'])
+        self.assertNotIn('sem_permissao', dados['resultados'][3])
+        self.assertEqual(LancamentoDeNota.objects.get(aluno=primeiro, competencia=self.escrita).nota_valor, 'A')
+        self.assertEqual(LancamentoDeNota.objects.get(aluno=segundo).nota_valor, '45')
+        self.assertFalse(LancamentoDeNota.objects.filter(aluno=self.aluno_alheio).exists())
+        self.assertTrue(ProgressoAluno.objects.get(aluno=primeiro).completo)
+        self.assertEqual(AuditLog.objects.filter(detalhes_json__origem='sincronizacao').count(), 1)
+    
+    def test_reenviar_o_lote_e_idempotente(self):
+        """Repetir um lote já aplicado (ex: resposta perdida) não gera conflito nem escrita"""
+        from core.models import AuditLog
+        
+        primeiro, segundo = self.alunos
+        LancamentoDeNota.objects.create(aluno=segundo, competencia=self.oral, nota_valor='40')
+        lote = [self._celula(primeiro, self.oral, '80'), self._celula(segundo, self.oral, '90', versao=1)]
+        
+        primeira = self._sincronizar(lote).json()
+        segunda = self._sincronizar(lote, gzip_=False).json()
+        
+        self.assertEqual(segunda['salvas'], 2)
+        self.assertEqual(
+            [(resultado['nota_valor'], resultado['versao']) for resultado in segunda['resultados']],
+            [(resultado['nota_valor'], resultado['versao']) for resultado in primeira['resultados']],
+        )
+        self.assertEqual(LancamentoDeNota.objects.get(aluno=segundo).versao, 2)
+        self.assertEqual(AuditLog.objects.count(), 1)
+    
+    def test_lote_de_outro_usuario_e_recusado(self):
+        """Num aparelho compartilhado, a fila guardada por outro professor não é aplicada nesta sessão"""
+        celula = self._celula(self.alunos[0], self.oral, '80')
+        
+        response = self._sincronizar([celula], usuario=self.user.pk + 1000)
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(LancamentoDeNota.objects.exists())
+        
+        self.assertEqual(self._sincronizar([celula], usuario=self.user.pk).json()['salvas'], 1)
+    
+    def test_lotes_invalidos(self):
+        """Corpo compactado corrompido, codificação desconhecida e lotes grandes demais são recusados"""
+        from teacher_portal.views import MAX_ALTERACOES_POR_LOTE
+        
+        response = self.client.post(self.url, b'nao e gzip', content_type='application/json', HTTP_CONTENT_ENCODING='gzip')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post(self.url, b'{}', content_type='application/json', HTTP_CONTENT_ENCODING='br')
+        self.assertEqual(response.status_code, 415)
+        
+        celula = self._celula(self.alunos[0], self.oral, '80')
+        self.assertEqual(self._sincronizar([celula] * (MAX_ALTERACOES_POR_LOTE + 1)).status_code, 413)
+        self.assertFalse(LancamentoDeNota.objects.exists())
+    
+    def test_service_worker_e_paginas(self):
+        """O service worker é servido como JavaScript e as páginas de lançamento o registram"""
+        response = self.client.get(reverse('teacher_portal:service_worker'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/javascript')
+        self.assertContains(response, self.url)
+        # O logout apaga as páginas guardadas no aparelho
+        self.assertContains(response, reverse('teacher_portal:logout'))
+        
+        for url in (
+            reverse('teacher_portal:lancamento_notas_grade', args=[self.turma.id]),
+            reverse('teacher_portal:lancamento_notas_aluno', args=[self.turma.id, self.alunos[0].id]),
+        ):
+            response = self.client.get(url)
+            self.assertContains(response, reverse('teacher_portal:service_worker'))
+            self.assertContains(response, f'const usuario = {self.user.pk};')
+
+
+@override_settings(STORAGES=STORAGES_TESTE)
+class TurmaRosterTestCase(TestCase):
+    """Testes da lista de alunos da turma em cache (progresso e navegação entre alunos)"""
+    
+    def setUp(self):
+        from django.core.cache import cache
+        from core.catalog import CompetenciaRegistry
+        
+        cache.clear()
+        self.user = User.objects.create_user(username='prof_roster', password='123')
+        Professor.objects.create(user=self.user)
+        self.turma = Turma.objects.create(
+            tipo_turma=TipoTurma.objects.create(nome='Teens Roster'),
+            identificador_turma='TR1',
+            professor_responsavel=self.user.professor,
+            boletim_tipo='adolescentes_adultos'
+        )
+        self.oral = Competencia.objects.create(nome='Produção Oral', tipo_nota='NUM')
+        self.escrita = Competencia.objects.create(nome='Produção Escrita', tipo_nota='ABC')
+        CompetenciaRegistry.invalidar()
+        # Criados fora da ordem alfabética
+        self.carla, self.ana, self.bruno = (
+            Aluno.objects.create(nome_completo=nome, turma=self.turma) for nome in ('Carla', 'Ana', 'Bruno')
+        )
+        self.client = Client()
+        self.client.login(username='prof_roster', password='123')
+    
+    def _proximo(self, aluno):
+        url = reverse('teacher_portal:lancamento_notas_aluno', args=[self.turma.id, aluno.id])
+        return self.client.post(url, {f'nota-{self.oral.id}': '80', 'acao': 'salvar_proximo'})
+    
+    def test_lista_ordenada_com_progresso_e_vizinhos(self):
+        """Uma query monta a lista; as leituras seguintes vêm do cache (só a versão da turma é lida)"""
+        from core.progress import TurmaRoster
+        
+        LancamentoDeNota.objects.create(aluno=self.bruno, competencia=self.oral, nota_valor='80')
+        
+        with self.assertNumQueries(2):
+            alunos = TurmaRoster.alunos(self.turma)
+        self.assertEqual(
+            [(a['nome_completo'], a['progresso'], a['anterior'], a['proximo']) for a in alunos],
+            [('Ana', 0, None, self.bruno.id), ('Bruno', 50, self.ana.id, self.carla.id), ('Carla', 0, self.bruno.id, None)],
+        )
+        with self.assertNumQueries(2):
+            self.assertEqual(TurmaRoster.vizinhos(self.turma, self.carla.id), (self.bruno.id, None))
+            self.assertIsNone(TurmaRoster.vizinhos(self.turma, 0))
+        
+        response = self.client.get(reverse('teacher_portal:lancamento_notas', args=[self.turma.id]))
+        self.assertContains(response, 'style="width: 50%"')
+    
+    def test_invalidada_por_notas_e_alunos(self):
+        """Notas criadas/removidas, gravações em lote e alunos alterados descartam a lista em cache"""
+        from core.lancamentos import LancamentoService
+        from core.progress import TurmaRoster
+        
+        def progresso(aluno):
+            return next(a['progresso'] for a in TurmaRoster.alunos(self.turma) if a['id'] == aluno.id)
+        
+        self.assertEqual(progresso(self.ana), 0)
+        nota = LancamentoDeNota.objects.create(aluno=self.ana, competencia=self.oral, nota_valor='90')
+        self.assertEqual(progresso(self.ana), 50)
+        nota.delete()
+        self.assertEqual(progresso(self.ana), 0)
+        
+        LancamentoService.salvar_grade(self.turma, [
+            {'aluno': aluno.id, 'competencia': competencia.id, 'valor': valor}
+            for aluno in (self.ana, self.bruno) for competencia, valor in ((self.oral, '70'), (self.escrita, 'A'))
+        ])
+        self.assertEqual(progresso(self.bruno), 100)
+        
+        self.ana.nome_completo = 'Zuleica'
+        self.ana.save()
+        self.assertEqual([a['id'] for a in TurmaRoster.alunos(self.turma)], [self.bruno.id, self.carla.id, self.ana.id])
+        self.carla.delete()
+        self.assertEqual(TurmaRoster.vizinhos(self.turma, self.bruno.id), (None, self.ana.id))
+    
+    def test_outro_processo_nao_le_lista_desatualizada(self):
+        """Com cache por processo, a mudança de versão basta: outro processo não lê a lista anterior"""
+        from unittest import mock
+        from django.core.cache.backends.locmem import LocMemCache
+        from core.progress import TurmaRoster
+        import core.progress
+        
+        # "Outro processo": um LocMemCache próprio, que não vê as exclusões deste processo
+        outro = LocMemCache('outro-processo', {})
+        with mock.patch.object(core.progress, 'cache', outro):
+            self.assertEqual(TurmaRoster.alunos(self.turma)[0]['progresso'], 0)
+        
+        LancamentoDeNota.objects.create(aluno=self.ana, competencia=self.oral, nota_valor='90')
+        self.ana.nome_completo = 'Zuleica'
+        self.ana.save()
+        with mock.patch.object(core.progress, 'cache', outro):
+            alunos = TurmaRoster.alunos(self.turma)
+        self.assertEqual([(a['id'], a['progresso']) for a in alunos], [(self.bruno.id, 0), (self.carla.id, 0), (self.ana.id, 50)])
+    
+    def test_salvar_proximo_com_queries_constantes(self):
+        """Salvar e ir para o próximo aluno custa o mesmo número de queries em qualquer posição"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        
+        for i in range(10):
+            Aluno.objects.create(nome_completo=f'Daniel {i:02d}', turma=self.turma)
+        
+        with CaptureQueriesContext(connection) as primeiro:
+            response = self._proximo(self.ana)
+        self.assertRedirects(
+            response, reverse('teacher_portal:lancamento_notas_aluno', args=[self.turma.id, self.bruno.id]),
+            fetch_redirect_response=False
+        )
+        with CaptureQueriesContext(connection) as segundo:
+            self._proximo(self.bruno)
+        self.assertEqual(len(primeiro), len(segundo))
+        
+        ultimo = Aluno.objects.order_by('-nome_completo').first()
+        self.assertRedirects(
+            self._proximo(ultimo), reverse('teacher_portal:lancamento_notas', args=[self.turma.id]),
+            fetch_redirect_response=False
+        )
@@ -3,7 +3,11 @@ from django.db.models import Prefetch, Count, Q
 from django.core.cache import cache
 from django.conf import settings
 from core.models import Turma, Aluno, LancamentoDeNota, Professor, Competencia
+from core.grading import NotaFinalEngine
+import functools
 import logging
+import re
+import threading
 
 logger = logging.getLogger(__name__)
 
@@ -193,7 +197,8 @@ class ProgressCalculator:
         """
         Calcula progresso de uma turma de forma otimizada
         """
-        if not turma.competencias.exists():
+        competencias = list(turma.competencias)
+        if not competencias:
             return {
                 'progresso_percentual': 0,
                 'alunos_completos': 0,
@@ -203,7 +208,6 @@ class ProgressCalculator:
             }
         
         alunos = turma.alunos.all()
-        competencias = turma.competencias.all()
         
         total_alunos = len(alunos)
         total_competencias = len(competencias)
@@ -413,6 +417,184 @@ class BoletimGenerator:
         
         return template_path
     
+    # Templates já carregados neste processo:
+    # {caminho: {'mtime_ns', 'tamanho', 'sha1', 'documento', 'plano'}}
+    _templates_cache = {}
+    _templates_lock = threading.Lock()
+    
+    # Placeholder no template: <<nome>> (o nome pode ter acentos, ex: <<nível>>)
+    PLACEHOLDER_REGEX = re.compile(r'<<(\w+)>>')
+    
+    @staticmethod
+    def _entrada_template(boletim_tipo):
+        """
+        Retorna a entrada do cache do template de boletim, carregando-o se preciso.
+        
+        O .docx é lido e parseado uma vez por processo. A entrada é renovada quando o
+        mtime/tamanho do arquivo muda e o conteúdo (sha1) não é mais o mesmo.
+        """
+        import hashlib
+        import io
+        import os
+        from docx import Document
+        
+        template_path = BoletimGenerator._get_template_path(boletim_tipo)
+        stat = os.stat(template_path)
+        
+        with BoletimGenerator._templates_lock:
+            entrada = BoletimGenerator._templates_cache.get(template_path)
+            
+            if entrada is None or (entrada['mtime_ns'], entrada['tamanho']) != (stat.st_mtime_ns, stat.st_size):
+                with open(template_path, 'rb') as arquivo:
+                    conteudo = arquivo.read()
+                sha1 = hashlib.sha1(conteudo).hexdigest()
+                
+                if entrada is None or entrada['sha1'] != sha1:
+                    documento = Document(io.BytesIO(conteudo))
+                    entrada = {
+                        'sha1': sha1,
+                        'documento': documento,
+                        'plano': BoletimGenerator._montar_plano(documento),
+                    }
+                    logger.info(f"Template de boletim carregado: {template_path}")
+                entrada['mtime_ns'] = stat.st_mtime_ns
+                entrada['tamanho'] = stat.st_size
+                BoletimGenerator._templates_cache[template_path] = entrada
+            
+            return entrada
+    
+    @staticmethod
+    def _preparar_template(boletim_tipo):
+        """
+        Retorna (documento, plano): um clone (deepcopy) do template pronto para ser
+        preenchido e o plano de renderização do template.
+        """
+        import copy
+        
+        entrada = BoletimGenerator._entrada_template(boletim_tipo)
+        # A árvore original nunca é alterada, então pode ser clonada fora do lock
+        return copy.deepcopy(entrada['documento']), entrada['plano']
+    
+    @staticmethod
+    def _carregar_template(boletim_tipo):
+        """
+        Retorna uma cópia do template de boletim pronta para ser preenchida
+        """
+        return BoletimGenerator._preparar_template(boletim_tipo)[0]
+    
+    @staticmethod
+    def hash_template(boletim_tipo):
+        """sha1 do conteúdo atual do template (identifica a versão do template)"""
+        return BoletimGenerator._entrada_template(boletim_tipo)['sha1']
+    
+    @staticmethod
+    def limpar_cache_templates():
+        """Descarta os templates em memória (recarregados no próximo uso)"""
+        with BoletimGenerator._templates_lock:
+            BoletimGenerator._templates_cache.clear()
+    
+    @staticmethod
+    def _montar_plano(documento):
+        """
+        Monta o plano de renderização de um template: onde está cada placeholder.
+        
+        Percorre uma única vez os parágrafos do corpo e das células de tabela e registra,
+        para cada parágrafo com <<placeholder>>, o caminho do elemento a partir do corpo
+        do documento e a posição de cada token nos runs (um token pode começar em um
+        run e terminar em outro, ex: '<<', 'aluno', '>>').
+        
+        Returns:
+            list: [{'caminho': (índices a partir do body), 'tokens': [
+                      (chave, run_inicio, offset_inicio, run_fim, offset_fim), ...]}]
+        """
+        from docx.text.paragraph import Paragraph
+        
+        # Trabalha direto no XML do corpo: documento.paragraphs/tables criariam um _Body
+        # no template original, que o deepcopy clonaria separado da árvore salva
+        corpo = documento.element.body
+        
+        plano = []
+        for elemento_p in corpo.xpath('./w:p | ./w:tbl/w:tr/w:tc/w:p'):
+            paragraph = Paragraph(elemento_p, None)
+            textos = [run.text for run in paragraph.runs]
+            texto = ''.join(textos)
+            if '<<' not in texto:
+                continue
+            
+            # Offset de início de cada run no texto completo do parágrafo
+            inicios = []
+            posicao = 0
+            for texto_run in textos:
+                inicios.append(posicao)
+                posicao += len(texto_run)
+            
+            def localizar(offset, fim=False):
+                """Converte um offset do parágrafo em (índice do run, offset no run)"""
+                for indice in range(len(textos) - 1, -1, -1):
+                    inicio = inicios[indice]
+                    if (inicio < offset if fim else inicio <= offset) and textos[indice]:
+                        return indice, offset - inicio
+                return 0, offset
+            
+            tokens = []
+            for match in BoletimGenerator.PLACEHOLDER_REGEX.finditer(texto):
+                chave = BoletimGenerator._normalizar_texto(match.group(1))
+                run_inicio, offset_inicio = localizar(match.start())
+                run_fim, offset_fim = localizar(match.end(), fim=True)
+                tokens.append((chave, run_inicio, offset_inicio, run_fim, offset_fim))
+            
+            if tokens:
+                caminho = []
+                elemento = elemento_p
+                while elemento is not corpo:
+                    pai = elemento.getparent()
+                    caminho.append(pai.index(elemento))
+                    elemento = pai
+                plano.append({'caminho': tuple(reversed(caminho)), 'tokens': tokens})
+        
+        return plano
+    
+    @staticmethod
+    def _aplicar_plano(documento, plano, substituicoes):
+        """
+        Preenche os placeholders de um clone do template seguindo o plano de renderização.
+        
+        Só os parágrafos e runs registrados no plano são visitados. Cada token é trocado
+        pelo valor no run onde começa; os demais runs do token perdem apenas o trecho
+        do token, preservando a formatação do restante do parágrafo. Tokens sem valor
+        em substituicoes ficam como estão.
+        
+        Returns:
+            int: Quantidade de placeholders substituídos
+        """
+        from docx.text.paragraph import Paragraph
+        
+        corpo = documento.element.body
+        total = 0
+        for item in plano:
+            elemento = corpo
+            for indice in item['caminho']:
+                elemento = elemento[indice]
+            runs = Paragraph(elemento, None).runs
+            
+            # De trás para frente: os offsets dos tokens anteriores continuam válidos
+            for chave, run_inicio, offset_inicio, run_fim, offset_fim in reversed(item['tokens']):
+                if chave not in substituicoes:
+                    continue
+                valor = str(substituicoes[chave])
+                
+                if run_inicio == run_fim:
+                    texto = runs[run_inicio].text
+                    runs[run_inicio].text = texto[:offset_inicio] + valor + texto[offset_fim:]
+                else:
+                    runs[run_inicio].text = runs[run_inicio].text[:offset_inicio] + valor
+                    for indice in range(run_inicio + 1, run_fim):
+                        runs[indice].text = ''
+                    runs[run_fim].text = runs[run_fim].text[offset_fim:]
+                total += 1
+        
+        return total
+    
     # Mapeamento de aliases de competências
     # Usado quando uma competência tem nomes diferentes mas representa a mesma coisa
     COMPETENCIA_ALIASES = {
@@ -420,7 +602,55 @@ class BoletimGenerator:
         'compreensao_escrita': ['compreensao_de_leitura'],
     }
     
+    # Mapas placeholder → competência já compilados, por boletim e conjunto de competências
+    _mapas_placeholders = {}
+    _mapas_lock = threading.Lock()
+    MAX_MAPAS_PLACEHOLDERS = 64
+    
+    @staticmethod
+    def mapa_placeholders(boletim_tipo, competencias):
+        """
+        Retorna {placeholder: id da competência (ou None)} do boletim
+        
+        Para cada placeholder (e seus aliases) vale a primeira competência, na
+        ordem recebida, cujo nome normalizado é igual ao placeholder ou o contém.
+        O resultado só depende do boletim e das competências (id e nome), então é
+        compilado uma vez e reaproveitado para todos os alunos; competências
+        renomeadas ou trocadas geram outra chave e um novo mapa.
+        
+        Args:
+            boletim_tipo: Tipo de boletim da turma
+            competencias: Competências na ordem de Aluno.get_notas_boletim()
+        """
+        chave = (boletim_tipo, tuple((c.id, c.nome) for c in competencias if c is not None))
+        mapa = BoletimGenerator._mapas_placeholders.get(chave)
+        if mapa is not None:
+            return mapa
+        
+        normalizadas = [
+            (competencia_id, BoletimGenerator._normalizar_nome_competencia(nome))
+            for competencia_id, nome in chave[1]
+        ]
+        mapa = {}
+        for placeholder in BoletimGenerator.COMPETENCIA_PLACEHOLDERS.get(boletim_tipo, []):
+            # Lista de nomes a buscar (placeholder + seus aliases)
+            nomes_busca = [placeholder] + BoletimGenerator.COMPETENCIA_ALIASES.get(placeholder, [])
+            mapa[placeholder] = next(
+                (
+                    competencia_id for competencia_id, normalizada in normalizadas
+                    if normalizada in nomes_busca or any(nome in normalizada for nome in nomes_busca)
+                ),
+                None
+            )
+        
+        with BoletimGenerator._mapas_lock:
+            if len(BoletimGenerator._mapas_placeholders) >= BoletimGenerator.MAX_MAPAS_PLACEHOLDERS:
+                BoletimGenerator._mapas_placeholders.clear()
+            BoletimGenerator._mapas_placeholders[chave] = mapa
+        return mapa
+    
     @staticmethod
+    @functools.lru_cache(maxsize=1024)
     def _normalizar_nome_competencia(nome_competencia):
         """
         Normaliza o nome da competência para corresponder aos placeholders
@@ -455,75 +685,23 @@ class BoletimGenerator:
         return "".join([c for c in nfkd if not unicodedata.combining(c)])
     
     @staticmethod
-    def _substituir_em_paragraph(paragraph, substituicoes):
-        """
-        Substitui placeholders em um parágrafo, lidando com runs fragmentados e acentos
-        """
-        texto_original = paragraph.text
-        texto_normalizado = BoletimGenerator._normalizar_texto(texto_original)
-        substituiu_algo = False
-        
-        # Tenta encontrar placeholders normalizados
-        for placeholder, valor in substituicoes.items():
-            # Busca com e sem acentos
-            placeholder_com_acentos_patterns = [
-                f'<<{placeholder}>>',  # sem acentos (ex: <<nivel>>)
-            ]
-            
-            # Gera variações com possíveis acentos
-            if placeholder == 'nivel':
-                placeholder_com_acentos_patterns.append('<<nível>>')
-            elif placeholder == 'colaboracao':
-                placeholder_com_acentos_patterns.append('<<colaboração>>')
-            
-            for pattern in placeholder_com_acentos_patterns:
-                if pattern in texto_original:
-                    print(f"  → Encontrado '{pattern}' no texto: '{texto_original[:50]}...'")
-                    
-                    # Substitui no texto completo
-                    novo_texto = texto_original.replace(pattern, str(valor))
-                    
-                    # Limpa todos os runs
-                    for run in paragraph.runs:
-                        run.text = ''
-                    
-                    # Adiciona o texto substituído no primeiro run
-                    if paragraph.runs:
-                        paragraph.runs[0].text = novo_texto
-                    else:
-                        paragraph.add_run(novo_texto)
-                    
-                    print(f"  ✓ Substituído para: '{novo_texto[:50]}...'")
-                    texto_original = novo_texto  # Atualiza para próximas substituições
-                    substituiu_algo = True
-                    break
-        
-        return substituiu_algo
-    
-    @staticmethod
-    def gerar_boletim(aluno):
+    def montar_substituicoes(aluno, notas=None, nota_final=None):
         """
-        Gera o boletim personalizado para um aluno específico a partir de template Word (.docx)
+        Reúne do banco tudo o que o boletim de um aluno precisa
         
         Args:
             aluno: Instância do model Aluno
+            notas: Notas já carregadas (BoletimDataLoader), no formato de
+                   Aluno.get_notas_boletim(); se omitidas, são lidas do banco
+            nota_final: (media, conceito) já calculados para o lote inteiro
+                        (BoletimDataLoader); se omitido, calculado só para este aluno
             
         Returns:
-            Document: Objeto Document do python-docx com placeholders preenchidos
-            
-        Raises:
-            ValueError: Se o tipo de boletim da turma não for válido
-            FileNotFoundError: Se o template não for encontrado
+            dict: {placeholder: valor} com dados básicos, notas e nota_final
         """
-        from docx import Document
-        
         turma = aluno.turma
         boletim_tipo = turma.boletim_tipo
         
-        # Carrega o template Word
-        template_path = BoletimGenerator._get_template_path(boletim_tipo)
-        doc = Document(template_path)
-        
         # Dados básicos do aluno
         professor_nome = 'N/A'
         if turma.professor_responsavel:
@@ -539,217 +717,85 @@ class BoletimGenerator:
             'professor': professor_nome,
         }
         
-        print(f"\n{'='*80}")
-        print(f"DEBUG - Dados básicos:")
-        print(f"  aluno: {dados_basicos['aluno']}")
-        print(f"  nivel: {dados_basicos['nivel']}")
-        print(f"  professor: {dados_basicos['professor']}")
-        print(f"{'='*80}\n")
-        
         # Busca as notas do aluno (retorna uma lista)
-        notas_list = aluno.get_notas_boletim()
+        notas_list = aluno.get_notas_boletim() if notas is None else notas
         
         # Preparar todos os placeholders para substituição
         placeholders_esperados = BoletimGenerator.COMPETENCIA_PLACEHOLDERS.get(boletim_tipo, [])
         
-        print(f"Boletim tipo: {boletim_tipo}")
-        print(f"Placeholders esperados: {placeholders_esperados}")
-        print(f"Total de notas: {len(notas_list)}")
+        logger.debug(f"Aluno #{aluno.pk}: boletim {boletim_tipo}, {len(notas_list)} nota(s), {len(placeholders_esperados)} placeholder(s)")
         
         # Dicionário completo de substituições
         substituicoes = dados_basicos.copy()
         
-        # Adicionar notas ao dicionário de substituições
-        print("\nBUSCANDO NOTAS:")
-        for placeholder in placeholders_esperados:
+        # Adicionar notas ao dicionário de substituições: o mapa placeholder → competência
+        # é compilado uma vez por conjunto de competências, aqui é só consulta
+        competencias = [nota_info.get('competencia') for nota_info in notas_list]
+        mapa = BoletimGenerator.mapa_placeholders(boletim_tipo, competencias)
+        notas_por_competencia = {
+            nota_info['competencia'].id: nota_info
+            for nota_info in notas_list if nota_info.get('competencia')
+        }
+        for placeholder, competencia_id in mapa.items():
             nota_encontrada = 'N/A'
-            print(f"\n  Procurando por placeholder: '{placeholder}'")
-            
-            # Lista de nomes a buscar (placeholder + seus aliases)
-            nomes_busca = [placeholder]
-            if placeholder in BoletimGenerator.COMPETENCIA_ALIASES:
-                nomes_busca.extend(BoletimGenerator.COMPETENCIA_ALIASES[placeholder])
-                print(f"    (Aliases: {BoletimGenerator.COMPETENCIA_ALIASES[placeholder]})")
-            
-            # notas_list é uma lista de dicionários com 'competencia', 'nota', 'data_lancamento'
-            for nota_info in notas_list:
-                competencia = nota_info.get('competencia')
-                if competencia:
-                    competencia_normalizada = BoletimGenerator._normalizar_nome_competencia(competencia.nome)
-                    print(f"    Comparando: '{competencia.nome}' -> '{competencia_normalizada}'")
-                    
-                    # Verifica match exato com o placeholder ou qualquer um dos aliases
-                    if competencia_normalizada in nomes_busca:
-                        nota_valor = nota_info.get('nota', 'N/A')
-                        nota_encontrada = str(nota_valor) if nota_valor != '-' else 'N/A'
-                        print(f"    ✓ MATCH EXATO! Nota: {nota_encontrada}")
-                        break
-                    # Verifica match parcial apenas se não houver match exato
-                    elif any(nome in competencia_normalizada for nome in nomes_busca):
-                        nota_valor = nota_info.get('nota', 'N/A')
-                        nota_encontrada = str(nota_valor) if nota_valor != '-' else 'N/A'
-                        print(f"    ✓ MATCH PARCIAL! Nota: {nota_encontrada}")
-                        break
-            
-            if nota_encontrada == 'N/A':
-                print(f"    ✗ Nenhuma correspondência encontrada")
-            
+            if competencia_id is not None:
+                nota_valor = notas_por_competencia[competencia_id].get('nota', 'N/A')
+                nota_encontrada = str(nota_valor) if nota_valor != '-' else 'N/A'
             substituicoes[placeholder] = nota_encontrada
         
         # Calcular nota_final se for material_antigo ou adolescentes_adultos
-        if boletim_tipo in ['material_antigo', 'adolescentes_adultos']:
-            # Mapeamento de conceitos para valores numéricos para calcular média
-            conceito_para_numero = {
-                'A': 95,  # 100-90%
-                'B': 82,  # 89-75%
-                'C': 67,  # 74-60%
-                'D': 50,  # 59% ou menos
-            }
+        # (40/40/20 ou média simples, ver NotaFinalEngine)
+        if nota_final is None:
+            nota_final = NotaFinalEngine.calcular_de_notas(boletim_tipo, notas_list, aluno.id)
+        media, conceito = nota_final
+        if conceito is not None:
+            substituicoes['nota_final'] = conceito
+            logger.debug(f"Nota final do aluno #{aluno.pk}: {conceito} (média {media})")
+        
+        return substituicoes
+    
+    @staticmethod
+    def renderizar_boletim(boletim_tipo, substituicoes):
+        """
+        Preenche um clone do template com as substituições (não acessa o banco)
+        
+        Args:
+            boletim_tipo: Tipo de boletim da turma
+            substituicoes: dict retornado por montar_substituicoes
             
-            # Para adolescentes_adultos: producao_oral (40%) + producao_escrita (40%) + avaliacoes_de_progresso (20%)
-            if boletim_tipo == 'adolescentes_adultos':
-                nota_producao_oral = None
-                nota_producao_escrita = None
-                nota_avaliacoes = None
-                
-                for nota_info in notas_list:
-                    competencia = nota_info.get('competencia')
-                    nota_valor = nota_info.get('nota')
-                    
-                    if competencia and nota_valor and nota_valor != '-':
-                        competencia_norm = BoletimGenerator._normalizar_nome_competencia(competencia.nome)
-                        
-                        # Converte conceito para número
-                        valor_numerico = None
-                        if str(nota_valor).upper() in conceito_para_numero:
-                            valor_numerico = conceito_para_numero[str(nota_valor).upper()]
-                        else:
-                            try:
-                                valor_numerico = float(nota_valor)
-                            except (ValueError, TypeError):
-                                pass
-                        
-                        if valor_numerico is not None:
-                            if competencia_norm == 'producao_oral':
-                                nota_producao_oral = valor_numerico
-                            elif competencia_norm == 'producao_escrita':
-                                nota_producao_escrita = valor_numerico
-                            elif competencia_norm == 'avaliacoes_de_progresso':
-                                nota_avaliacoes = valor_numerico
-                
-                # Calcula média ponderada: 40% + 40% + 20%
-                if nota_producao_oral is not None and nota_producao_escrita is not None and nota_avaliacoes is not None:
-                    media = (nota_producao_oral * 0.4) + (nota_producao_escrita * 0.4) + (nota_avaliacoes * 0.2)
-                    print(f"\n  📊 Cálculo ponderado:")
-                    print(f"      Produção Oral (40%): {nota_producao_oral:.1f}")
-                    print(f"      Produção Escrita (40%): {nota_producao_escrita:.1f}")
-                    print(f"      Avaliações de Progresso (20%): {nota_avaliacoes:.1f}")
-                    print(f"      Média ponderada: {media:.1f}")
-                elif nota_producao_oral is not None and nota_producao_escrita is not None:
-                    # Se não tem avaliacoes, faz média das duas (50% cada)
-                    media = (nota_producao_oral + nota_producao_escrita) / 2
-                    print(f"\n  📊 Cálculo sem avaliações (média simples de 2 notas): {media:.1f}")
-                else:
-                    media = None
-                    print(f"\n  ⚠️ Notas insuficientes para calcular média")
-                
-                if media is not None:
-                    # Converte média numérica de volta para conceito
-                    if media >= 90:
-                        nota_final_conceito = 'A'
-                    elif media >= 75:
-                        nota_final_conceito = 'B'
-                    elif media >= 60:
-                        nota_final_conceito = 'C'
-                    else:
-                        nota_final_conceito = 'D'
-                    
-                    substituicoes['nota_final'] = nota_final_conceito
-                    print(f"      Nota Final: {nota_final_conceito}")
-                else:
-                    substituicoes['nota_final'] = 'N/A'
+        Returns:
+            Document: Objeto Document do python-docx com placeholders preenchidos
             
-            # Para material_antigo: média simples de todas as notas
-            else:
-                valores_para_media = []
-                
-                for nota_info in notas_list:
-                    nota_valor = nota_info.get('nota')
-                    if nota_valor and nota_valor != '-':
-                        # Converte conceito para número
-                        if str(nota_valor).upper() in conceito_para_numero:
-                            valores_para_media.append(conceito_para_numero[str(nota_valor).upper()])
-                        else:
-                            # Se for numérico, usa direto
-                            try:
-                                nota_num = float(nota_valor)
-                                valores_para_media.append(nota_num)
-                            except (ValueError, TypeError):
-                                pass
-                
-                # Calcula a média e converte de volta para conceito
-                if valores_para_media:
-                    media = sum(valores_para_media) / len(valores_para_media)
-                    
-                    # Converte média numérica de volta para conceito
-                    if media >= 90:
-                        nota_final_conceito = 'A'
-                    elif media >= 75:
-                        nota_final_conceito = 'B'
-                    elif media >= 60:
-                        nota_final_conceito = 'C'
-                    else:
-                        nota_final_conceito = 'D'
-                    
-                    substituicoes['nota_final'] = nota_final_conceito
-                    print(f"\n  📊 Nota Final calculada: {nota_final_conceito} (média {media:.1f} de {len(valores_para_media)} notas)")
-                else:
-                    substituicoes['nota_final'] = 'N/A'
-                    print(f"\n  ⚠️ Nota Final: N/A (sem notas válidas)")
-        
-        print(f"\nDicionário de substituições completo:")
-        for key, value in substituicoes.items():
-            print(f"  <<{key}>> → {value}")
-        print()
-        
-        # DEBUG: Mostrar todos os textos do documento
-        print("="*80)
-        print("TEXTOS ENCONTRADOS NO DOCUMENTO:")
-        print("="*80)
-        print("\nParágrafos:")
-        for i, paragraph in enumerate(doc.paragraphs):
-            if paragraph.text.strip():
-                print(f"  [{i}] {paragraph.text[:100]}")
-        
-        print("\nTabelas:")
-        for ti, table in enumerate(doc.tables):
-            for ri, row in enumerate(table.rows):
-                for ci, cell in enumerate(row.cells):
-                    for pi, paragraph in enumerate(cell.paragraphs):
-                        if paragraph.text.strip():
-                            print(f"  [T{ti}-R{ri}-C{ci}-P{pi}] {paragraph.text[:100]}")
-        print("="*80)
-        print()
-        
-        # Substituir placeholders no documento Word
-        substituicoes_feitas = []
-        
-        print("INICIANDO SUBSTITUIÇÕES:")
-        # Substituir em parágrafos
-        for paragraph in doc.paragraphs:
-            if BoletimGenerator._substituir_em_paragraph(paragraph, substituicoes):
-                substituicoes_feitas.append(f"Parágrafo substituído")
-        
-        # Substituir em tabelas
-        for table in doc.tables:
-            for row in table.rows:
-                for cell in row.cells:
-                    for paragraph in cell.paragraphs:
-                        if BoletimGenerator._substituir_em_paragraph(paragraph, substituicoes):
-                            substituicoes_feitas.append(f"Célula de tabela substituída")
-        
-        print(f"Total de parágrafos/células processados: {len(substituicoes_feitas)}")
-        print()
+        Raises:
+            ValueError: Se o tipo de boletim não for válido
+            FileNotFoundError: Se o template não for encontrado
+        """
+        # Clona o template Word (parseado uma vez por processo) e seu plano de renderização
+        doc, plano = BoletimGenerator._preparar_template(boletim_tipo)
+        
+        # Substituir placeholders no documento Word (só nos pontos mapeados no plano)
+        BoletimGenerator._aplicar_plano(doc, plano, substituicoes)
+        
+        return doc
+    
+    @staticmethod
+    def gerar_boletim(aluno):
+        """
+        Gera o boletim personalizado para um aluno específico a partir de template Word (.docx)
+        
+        Args:
+            aluno: Instância do model Aluno
+            
+        Returns:
+            Document: Objeto Document do python-docx com placeholders preenchidos
+            
+        Raises:
+            ValueError: Se o tipo de boletim da turma não for válido
+            FileNotFoundError: Se o template não for encontrado
+        """
+        turma = aluno.turma
+        substituicoes = BoletimGenerator.montar_substituicoes(aluno)
+        doc = BoletimGenerator.renderizar_boletim(turma.boletim_tipo, substituicoes)
         
         logger.info(f"Boletim gerado com sucesso para aluno {aluno.nome_completo} (Turma: {turma.nome})")
         
@@ -0,0 +1,256 @@
+// Service worker do Portal do Professor (modo offline)
+//
+// - Páginas de lançamento de notas: rede primeiro; sem conexão, a última cópia guardada.
+// - Fila de notas: as páginas mandam as células editadas sem conexão ({tipo: 'enfileirar'});
+//   a fila fica no IndexedDB (uma entrada por usuário e célula, a última edição vale) e é
+//   enviada em lotes compactados para o endpoint de sincronização quando a conexão volta.
+// - O resultado de cada célula (salva, conflito, invalida) é repassado às páginas abertas.
+// - Aparelho compartilhado: só as notas do usuário da sessão atual são enviadas (as dos
+//   outros esperam o próximo login deles) e as páginas guardadas são apagadas no logout
+//   ou quando outro usuário entra.
+
+const VERSAO_CACHE = 'portal-notas-v1';
+const URL_SINCRONIZAR = "{% url 'teacher_portal:sincronizar_notas' %}";
+const URL_SAIR = "{% url 'teacher_portal:logout' %}";
+const PREFIXO_PAGINAS = "{{ prefixo_paginas }}";
+const TAG_SYNC = 'sincronizar-notas';
+const CELULAS_POR_LOTE = 200;
+
+self.addEventListener('install', () => self.skipWaiting());
+
+self.addEventListener('activate', event => {
+    event.waitUntil(
+        caches.keys()
+            .then(nomes => Promise.all(nomes.filter(nome => nome !== VERSAO_CACHE).map(nome => caches.delete(nome))))
+            .then(() => self.clients.claim())
+    );
+});
+
+self.addEventListener('fetch', event => {
+    const requisicao = event.request;
+    const url = new URL(requisicao.url);
+    if (requisicao.method === 'POST' && url.pathname === URL_SAIR) {
+        // Logout: a requisição segue normalmente, mas as páginas guardadas saem do aparelho
+        event.waitUntil(encerrarSessao());
+        return;
+    }
+    if (requisicao.method !== 'GET' || requisicao.mode !== 'navigate' || !url.pathname.startsWith(PREFIXO_PAGINAS)) {
+        return;
+    }
+    event.respondWith(
+        fetch(requisicao)
+            .then(resposta => {
+                if (resposta.ok && !resposta.redirected) {
+                    const copia = resposta.clone();
+                    caches.open(VERSAO_CACHE).then(cache => cache.put(requisicao, copia));
+                }
+                return resposta;
+            })
+            .catch(() => caches.match(requisicao).then(copia => copia || new Response(
+                '<meta charset="utf-8"><p style="font-family: sans-serif; padding: 2rem">' +
+                '📴 Sem conexão e esta página ainda não foi aberta neste aparelho.</p>',
+                {headers: {'Content-Type': 'text/html; charset=utf-8'}}
+            )))
+    );
+});
+
+// --- Fila no IndexedDB ---
+
+function abrirBanco() {
+    return new Promise((resolve, reject) => {
+        const pedido = indexedDB.open('portal-notas', 1);
+        pedido.onupgradeneeded = () => {
+            pedido.result.createObjectStore('fila', {keyPath: 'id'});
+            pedido.result.createObjectStore('config');
+        };
+        pedido.onsuccess = () => resolve(pedido.result);
+        pedido.onerror = () => reject(pedido.error);
+    });
+}
+
+function transacao(lojas, modo, operacao) {
+    return abrirBanco().then(banco => new Promise((resolve, reject) => {
+        const tx = banco.transaction(lojas, modo);
+        const resultado = operacao(tx);
+        tx.oncomplete = () => resolve(resultado && 'result' in resultado ? resultado.result : resultado);
+        tx.onerror = () => reject(tx.error);
+    }));
+}
+
+// --- Sessão ---
+
+function apagarPaginas() {
+    return caches.keys().then(nomes => Promise.all(nomes.map(nome => caches.delete(nome))));
+}
+
+function encerrarSessao() {
+    // A fila fica (cada entrada é de um usuário); some só o que identifica a sessão
+    return Promise.all([
+        apagarPaginas(),
+        transacao(['config'], 'readwrite', tx => {
+            tx.objectStore('config').delete('csrfToken');
+            tx.objectStore('config').delete('usuario');
+        }),
+    ]);
+}
+
+function lembrarSessao(csrfToken, usuario) {
+    // Outro usuário na sessão: as páginas guardadas do anterior não podem ser abertas por ele
+    return transacao(['config'], 'readonly', tx => tx.objectStore('config').get('usuario'))
+        .then(anterior => (anterior !== undefined && anterior !== usuario ? apagarPaginas() : null))
+        .then(() => transacao(['config'], 'readwrite', tx => {
+            const config = tx.objectStore('config');
+            config.put(usuario, 'usuario');
+            if (csrfToken) {
+                config.put(csrfToken, 'csrfToken');
+            }
+        }));
+}
+
+function enfileirar(celulas, usuario) {
+    return transacao(['fila'], 'readwrite', tx => {
+        const fila = tx.objectStore('fila');
+        celulas.forEach(celula => {
+            // Uma entrada por usuário e célula: uma nova edição troca o valor, mas mantém a
+            // versão lida antes da primeira edição offline (é ela que o servidor compara)
+            const id = `${usuario}-${celula.turma}-${celula.aluno}-${celula.competencia}`;
+            const pedido = fila.get(id);
+            pedido.onsuccess = () => {
+                const existente = pedido.result;
+                fila.put({
+                    id: id,
+                    usuario: usuario,
+                    turma: celula.turma,
+                    aluno: celula.aluno,
+                    competencia: celula.competencia,
+                    valor: celula.valor,
+                    versao: existente ? existente.versao : celula.versao,
+                });
+            };
+        });
+    });
+}
+
+function lerFila() {
+    // Só as entradas do usuário da sessão atual (sem sessão conhecida, nenhuma)
+    return transacao(['fila', 'config'], 'readonly', tx => ({
+        fila: tx.objectStore('fila').getAll(),
+        csrf: tx.objectStore('config').get('csrfToken'),
+        usuario: tx.objectStore('config').get('usuario'),
+    })).then(pedidos => ({
+        fila: pedidos.fila.result.filter(entrada => entrada.usuario === pedidos.usuario.result),
+        csrfToken: pedidos.csrf.result,
+        usuario: pedidos.usuario.result,
+    }));
+}
+
+function removerDaFila(enviadas, resultados) {
+    // Só sai da fila a célula que não foi editada de novo enquanto o lote estava em trânsito.
+    // Células recusadas por permissão ficam: não são perdidas se a sessão mudou no caminho.
+    const semPermissao = new Set(resultados.filter(resultado => resultado.sem_permissao).map(resultado => resultado.id));
+    return transacao(['fila'], 'readwrite', tx => {
+        const fila = tx.objectStore('fila');
+        enviadas.filter(enviada => !semPermissao.has(enviada.id)).forEach(enviada => {
+            const pedido = fila.get(enviada.id);
+            pedido.onsuccess = () => {
+                if (pedido.result && pedido.result.valor === enviada.valor) {
+                    fila.delete(enviada.id);
+                }
+            };
+        });
+    });
+}
+
+function compactar(texto) {
+    if (typeof CompressionStream === 'undefined') {
+        return Promise.resolve({corpo: texto, codificacao: null});
+    }
+    const fluxo = new Blob([texto]).stream().pipeThrough(new CompressionStream('gzip'));
+    return new Response(fluxo).arrayBuffer().then(corpo => ({corpo: corpo, codificacao: 'gzip'}));
+}
+
+function avisarPaginas(mensagem) {
+    return self.clients.matchAll({type: 'window'}).then(paginas => paginas.forEach(pagina => pagina.postMessage(mensagem)));
+}
+
+// --- Sincronização ---
+
+let sincronizando = null;
+
+function enviarLote(lote, csrfToken, usuario) {
+    // O servidor recusa o lote inteiro (403) se a sessão não for deste usuário
+    return compactar(JSON.stringify({usuario: usuario, alteracoes: lote}))
+        .then(({corpo, codificacao}) => {
+            const cabecalhos = {'Content-Type': 'application/json', 'X-CSRFToken': csrfToken || ''};
+            if (codificacao) {
+                cabecalhos['Content-Encoding'] = codificacao;
+            }
+            return fetch(URL_SINCRONIZAR, {
+                method: 'POST', headers: cabecalhos, body: corpo, credentials: 'same-origin', redirect: 'manual',
+            });
+        })
+        .then(resposta => {
+            if (!resposta.ok) {
+                // Sessão expirada, CSRF etc.: mantém a fila para a próxima tentativa
+                throw new Error(`Sincronização recusada (HTTP ${resposta.status})`);
+            }
+            return resposta.json();
+        })
+        .then(dados => removerDaFila(lote, dados.resultados).then(() => dados.resultados));
+}
+
+function sincronizar() {
+    if (sincronizando) {
+        return sincronizando;
+    }
+    sincronizando = lerFila()
+        .then(({fila, csrfToken, usuario}) => {
+            const lotes = [];
+            for (let inicio = 0; inicio < fila.length; inicio += CELULAS_POR_LOTE) {
+                lotes.push(fila.slice(inicio, inicio + CELULAS_POR_LOTE));
+            }
+            // Lotes em sequência: um lote aceito sai da fila mesmo se o seguinte falhar
+            return lotes.reduce(
+                (anterior, lote) => anterior.then(resultados =>
+                    enviarLote(lote, csrfToken, usuario).then(novos => resultados.concat(novos))
+                ),
+                Promise.resolve([])
+            );
+        })
+        .then(resultados => lerFila().then(({fila}) => avisarPaginas({
+            tipo: 'resultado', resultados: resultados, pendentes: fila.length,
+        })))
+        .catch(erro => lerFila().then(({fila}) => {
+            avisarPaginas({tipo: 'pendentes', pendentes: fila.length, erro: String(erro)});
+            throw erro;  // O Background Sync tenta de novo mais tarde
+        }))
+        .finally(() => { sincronizando = null; });
+    return sincronizando;
+}
+
+self.addEventListener('sync', event => {
+    if (event.tag === TAG_SYNC) {
+        event.waitUntil(sincronizar());
+    }
+});
+
+self.addEventListener('message', event => {
+    const mensagem = event.data || {};
+    if (mensagem.usuario === undefined) {
+        return;
+    }
+    const sessao = lembrarSessao(mensagem.csrfToken, mensagem.usuario);
+    if (mensagem.tipo === 'enfileirar') {
+        event.waitUntil(
+            sessao
+                .then(() => enfileirar(mensagem.celulas || [], mensagem.usuario))
+                .then(() => lerFila())
+                .then(({fila}) => avisarPaginas({tipo: 'pendentes', pendentes: fila.length}))
+                .then(() => self.registration.sync
+                    ? self.registration.sync.register(TAG_SYNC).catch(() => null)
+                    : null)
+        );
+    } else if (mensagem.tipo === 'sincronizar') {
+        event.waitUntil(sessao.then(() => sincronizar()).catch(() => null));
+    }
+});
@@ -40,6 +40,28 @@ urlpatterns = [
         views.lancamento_notas_aluno_view, #
         name='lancamento_notas_aluno'
     ),
+    path(
+        'turma/<int:turma_id>/grade/',
+        views.lancamento_notas_grade_view,
+        name='lancamento_notas_grade'
+    ),
+    path(
+        'turma/<int:turma_id>/autosave/',
+        views.autosalvar_nota_view,
+        name='autosalvar_nota'
+    ),
+
+    # --- MODO OFFLINE ---
+    path(
+        'sincronizar/',
+        views.sincronizar_notas_view,
+        name='sincronizar_notas'
+    ),
+    path(
+        'sw.js',
+        views.service_worker_view,
+        name='service_worker'
+    ),
     
     # --- URLs PARA SISTEMA DE PROBLEMAS ---
     path(
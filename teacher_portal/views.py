@@ -6,14 +6,75 @@ from core.models import Turma, Aluno, LancamentoDeNota, ConfiguracaoSistema, Pro
 from django.contrib import messages
 from django.contrib.auth.views import LoginView
 from django.conf import settings
-from core.logging_utils import SimpleLogger
+from core.progress import ProgressStore, TurmaRoster
+from core.conditional import conditional_on_data_version
+from core.lancamentos import LancamentoService
+from django.db.models import Max
+from django.http import JsonResponse
+from django.views.decorators.cache import never_cache
+from django.views.decorators.http import require_http_methods
+import json
+import zlib
 import urllib.parse
 from datetime import datetime, date
 import math
 
 
+def calcular_resumo_prazo(turmas_com_estatisticas, data_limite, data_hoje=None):
+    """
+    Calcula o widget da data limite (alunos por dia, progresso geral) a partir
+    das estatísticas já calculadas das turmas, sem nenhuma query adicional.
+    """
+    data_hoje = data_hoje or date.today()
+    
+    # Calcula dias restantes
+    dias_restantes = (data_limite - data_hoje).days
+    
+    # Calcula total de ALUNOS que precisam estar 100% completos
+    total_alunos_geral = sum(turma_info['total_alunos'] for turma_info in turmas_com_estatisticas)
+    total_alunos_completos = sum(turma_info['alunos_completos'] for turma_info in turmas_com_estatisticas)
+    total_alunos_pendentes = total_alunos_geral - total_alunos_completos
+    
+    # Calcula progresso geral baseado em alunos completos
+    progresso_geral = 0
+    if total_alunos_geral > 0:
+        progresso_geral = int((total_alunos_completos / total_alunos_geral) * 100)
+    
+    # Calcula alunos por dia necessários para 100%
+    alunos_por_dia = 0
+    if dias_restantes > 0 and total_alunos_pendentes > 0:
+        alunos_por_dia = math.ceil(total_alunos_pendentes / dias_restantes)
+    
+    # Determina status da deadline
+    deadline_status = 'deadline-good'
+    if dias_restantes <= 5:
+        deadline_status = 'deadline-urgent'
+    elif dias_restantes <= 10:
+        deadline_status = 'deadline-warning'
+    
+    return {
+        'data_limite': data_limite,
+        'dias_restantes': dias_restantes,
+        'total_alunos_pendentes': total_alunos_pendentes,
+        'alunos_por_dia': alunos_por_dia,
+        'deadline_status': deadline_status,
+        'progresso_geral': progresso_geral,
+        'total_alunos_geral': total_alunos_geral,
+        'total_alunos_completos': total_alunos_completos,
+    }
+
+
+def _versao_dashboard(request):
+    """Dados do dashboard do professor além de turmas, alunos e notas"""
+    from core.models import UserPreference
+    return [
+        ConfiguracaoSistema.objects.aggregate(ultima=Max('data_atualizacao'))['ultima'],
+        list(UserPreference.objects.filter(user=request.user).values_list()),
+    ]
+
 # Esta é a view do Dashboard que estava faltando
 @login_required(login_url='teacher_portal:login')
+@conditional_on_data_version(extra=_versao_dashboard)
 def dashboard_view(request):
     """
     Página inicial do professor após o login.
@@ -28,58 +89,12 @@ def dashboard_view(request):
             professor_responsavel=professor
         ).order_by('tipo_turma__nome', 'identificador_turma')
 
-        # 3. Calcula estatísticas de progresso para cada turma
+        # 3. Lê as estatísticas de progresso pré-agregadas das turmas
         turmas_com_estatisticas = []
-        for turma in turmas_do_professor:
-            # Busca alunos e competências da turma
-            alunos_da_turma = Aluno.objects.filter(turma=turma)
-            competencias_da_turma = turma.competencias.all() if turma.competencias else []
-            
-            total_alunos = alunos_da_turma.count()
-            total_competencias = len(competencias_da_turma)
-            
-            # Calcula estatísticas
-            if total_alunos > 0 and total_competencias > 0:
-                # Total de notas possíveis na turma
-                total_notas_possiveis = total_alunos * total_competencias
-                
-                # Notas já lançadas na turma
-                notas_lancadas = LancamentoDeNota.objects.filter(
-                    aluno__turma=turma,
-                    competencia__in=competencias_da_turma
-                ).count()
-                
-                # Porcentagem de conclusão da turma
-                progresso_turma = int((notas_lancadas / total_notas_possiveis) * 100)
-                
-                # Alunos com todas as notas completas
-                alunos_completos = 0
-                for aluno in alunos_da_turma:
-                    notas_do_aluno = LancamentoDeNota.objects.filter(
-                        aluno=aluno,
-                        competencia__in=competencias_da_turma
-                    ).count()
-                    if notas_do_aluno == total_competencias:
-                        alunos_completos += 1
-                        
-                # Porcentagem de alunos com notas completas
-                alunos_completos_percent = int((alunos_completos / total_alunos) * 100) if total_alunos > 0 else 0
-            else:
-                progresso_turma = 0
-                notas_lancadas = 0
-                total_notas_possiveis = 0
-                alunos_completos = 0
-                alunos_completos_percent = 0
-            
+        for info in ProgressStore.progresso_turmas(turmas_do_professor):
+            progresso_turma = info['progresso_turma']
             turmas_com_estatisticas.append({
-                'turma': turma,
-                'total_alunos': total_alunos,
-                'total_competencias': total_competencias,
-                'notas_lancadas': notas_lancadas,
-                'total_notas_possiveis': total_notas_possiveis,
-                'progresso_turma': progresso_turma,
-                'alunos_completos': alunos_completos,
-                'alunos_completos_percent': alunos_completos_percent,
+                **info,
                 # Status visual baseado no progresso
                 'status_class': 'complete' if progresso_turma >= 90 else 'good' if progresso_turma >= 70 else 'warning' if progresso_turma >= 40 else 'critical'
             })
@@ -93,51 +108,12 @@ def dashboard_view(request):
     # ===== LÓGICA DA DATA LIMITE =====
     # Data limite para conclusão das notas (configurável)
     data_limite = ConfiguracaoSistema.get_data_limite_notas()
-    data_hoje = date.today()
-    
-    # Calcula dias restantes
-    dias_restantes = (data_limite - data_hoje).days
-    
-    # Calcula total de ALUNOS que precisam estar 100% completos
-    total_alunos_pendentes = 0
-    total_alunos_completos = 0
-    total_alunos_geral = 0
-    
-    for turma_info in turmas_com_estatisticas:
-        total_alunos_geral += turma_info['total_alunos']
-        total_alunos_completos += turma_info['alunos_completos']
-    
-    total_alunos_pendentes = total_alunos_geral - total_alunos_completos
-    
-    # Calcula progresso geral baseado em alunos completos
-    progresso_geral = 0
-    if total_alunos_geral > 0:
-        progresso_geral = int((total_alunos_completos / total_alunos_geral) * 100)
-    
-    # Calcula alunos por dia necessários para 100%
-    alunos_por_dia = 0
-    if dias_restantes > 0 and total_alunos_pendentes > 0:
-        alunos_por_dia = math.ceil(total_alunos_pendentes / dias_restantes)
-    
-    # Determina status da deadline
-    deadline_status = 'deadline-good'
-    if dias_restantes <= 5:
-        deadline_status = 'deadline-urgent'
-    elif dias_restantes <= 10:
-        deadline_status = 'deadline-warning'
 
     context = {
         'turmas': turmas_do_professor,
         'turmas_com_estatisticas': turmas_com_estatisticas,
         # Dados da data limite (nova lógica baseada em alunos)
-        'data_limite': data_limite,
-        'dias_restantes': dias_restantes,
-        'total_alunos_pendentes': total_alunos_pendentes,
-        'alunos_por_dia': alunos_por_dia,
-        'deadline_status': deadline_status,
-        'progresso_geral': progresso_geral,
-        'total_alunos_geral': total_alunos_geral,
-        'total_alunos_completos': total_alunos_completos,
+        **calcular_resumo_prazo(turmas_com_estatisticas, data_limite),
     }
     
     # Adiciona preferências do usuário se existirem
@@ -166,38 +142,11 @@ def lancamento_notas_view(request, turma_id):
         messages.error(request, "Turma não encontrada ou você não tem permissão para acessá-la.")
         return redirect('teacher_portal:dashboard')
 
-    # Busca apenas os alunos
-    alunos_da_turma = Aluno.objects.filter(
-        turma=turma
-    ).order_by('nome_completo')
-    
-    # Busca as competências da turma através do tipo de turma
-    competencias_da_turma = turma.competencias.all() if turma.competencias else []
-    total_competencias = len(competencias_da_turma)
-    
-    # Calcula o progresso de cada aluno
-    alunos_com_progresso = []
-    for aluno in alunos_da_turma:
-        # Conta quantas competências o aluno já tem nota lançada
-        notas_lancadas = LancamentoDeNota.objects.filter(
-            aluno=aluno,
-            competencia__in=competencias_da_turma
-        ).count()
-        
-        # Calcula a porcentagem
-        if total_competencias > 0:
-            progresso = int((notas_lancadas / total_competencias) * 100)
-        else:
-            progresso = 0
-            
-        alunos_com_progresso.append({
-            'aluno': aluno,
-            'progresso': progresso
-        })
+    # Alunos com o progresso de cada um: uma query anotada, guardada em cache por turma
+    alunos_com_progresso = TurmaRoster.alunos(turma)
 
     context = {
         'turma': turma,
-        'alunos': alunos_da_turma,
         'alunos_com_progresso': alunos_com_progresso,
     }
 
@@ -216,45 +165,26 @@ def lancamento_notas_aluno_view(request, turma_id, aluno_id):
     aluno = get_object_or_404(Aluno, pk=aluno_id, turma=turma)
     
     # Pega as competências que esta turma específica deve ter
-    competencias_da_turma = turma.competencias.all().order_by('nome') if turma.competencias else []
+    competencias_da_turma = list(turma.competencias)  # Já ordenadas por nome
 
     if request.method == 'POST':
         # --- LÓGICA DE SALVAR (POST) ---
         
-        for comp in competencias_da_turma:
-            # Pega o valor do input (ex: 'nota-12')
-            nota_valor_str = request.POST.get(f'nota-{comp.id}')
-
-            # Só salva se o professor digitou algo
-            if nota_valor_str is not None and nota_valor_str.strip() != '':
-                # update_or_create é perfeito aqui:
-                # Tenta achar uma nota (aluno, competencia).
-                # Se achar, ATUALIZA o valor.
-                # Se não achar, CRIA uma nova.
-                nota_obj, created = LancamentoDeNota.objects.update_or_create(
-                    aluno=aluno,
-                    competencia=comp,
-                    defaults={'nota_valor': nota_valor_str}
-                )
-                
-                # Log da ação
-                try:
-                    action = 'CREATE' if created else 'UPDATE'
-                    description = f"Nota {action.lower()} para {aluno.nome_completo} em {comp.nome}: {nota_valor_str}"
-                    SimpleLogger.log_action(
-                        user=request.user,
-                        action=action,
-                        description=description,
-                        severity='LOW',
-                        request=request
-                    )
-                except Exception as e:
-                    # Log de erro se falhar
-                    SimpleLogger.log_error(request.user, f"Erro ao registrar log de nota: {e}", request)
-                    
-            # (Opcional: se o valor for vazio, você pode querer deletar a nota)
-            # else:
-            #    LancamentoDeNota.objects.filter(aluno=aluno, competencia=comp).delete()
+        # Pega o valor de cada input (ex: 'nota-12'); campos vazios não apagam a nota
+        valores = {
+            comp.id: request.POST.get(f'nota-{comp.id}')
+            for comp in competencias_da_turma
+        }
+
+        # Valida tudo, grava só o que mudou (numa transação) e registra um único log
+        resultado = LancamentoService.salvar_aluno(
+            turma, aluno, valores, competencias_da_turma, usuario=request.user, request=request
+        )
+        if resultado['erros']:
+            nomes = {comp.id: comp.nome for comp in competencias_da_turma}
+            for erro in resultado['erros']:
+                messages.error(request, f"{nomes.get(erro['competencia'], 'Nota')}: {erro['erro']}")
+            return redirect('teacher_portal:lancamento_notas_aluno', turma_id=turma.pk, aluno_id=aluno.pk)
 
         # --- LÓGICA DE REDIRECIONAMENTO (Salvar/Voltar vs Salvar/Próximo) ---
         acao = request.POST.get('acao') # Pega o 'name' do botão clicado
@@ -264,22 +194,15 @@ def lancamento_notas_aluno_view(request, turma_id, aluno_id):
             return redirect('teacher_portal:lancamento_notas', turma_id=turma.pk)
         
         elif acao == 'salvar_proximo':
-            # 1. Pega todos os alunos da turma, na ordem correta
-            alunos_da_turma = Aluno.objects.filter(turma=turma).order_by('nome_completo')
-            
-            # 2. Transforma em uma lista de IDs para achar o próximo
-            lista_ids_alunos = list(alunos_da_turma.values_list('pk', flat=True))
-            
-            # 3. Acha o índice (posição) do aluno atual
-            try:
-                indice_atual = lista_ids_alunos.index(aluno.pk)
-            except ValueError:
+            # Próximo aluno na lista da turma (em cache por turma, sem remontar a lista de IDs)
+            vizinhos = TurmaRoster.vizinhos(turma, aluno.pk)
+            if vizinhos is None:
                 # (Segurança) Se o aluno não estiver na lista, apenas volte
                 return redirect('teacher_portal:lancamento_notas', turma_id=turma.pk)
+            proximo_aluno_id = vizinhos[1]
 
-            # 4. Verifica se há um próximo aluno
-            if indice_atual + 1 < len(lista_ids_alunos):
-                proximo_aluno_id = lista_ids_alunos[indice_atual + 1]
+            # Verifica se há um próximo aluno
+            if proximo_aluno_id is not None:
                 messages.success(request, f"Notas de {aluno.nome_completo} salvas. Carregando próximo aluno...")
                 return redirect('teacher_portal:lancamento_notas_aluno', turma_id=turma.pk, aluno_id=proximo_aluno_id)
             else:
@@ -293,19 +216,23 @@ def lancamento_notas_aluno_view(request, turma_id, aluno_id):
     else:
         # --- LÓGICA DE EXIBIÇÃO (GET) ---
         
-        # Busca as notas que JÁ EXISTEM para este aluno
-        notas_existentes_qs = LancamentoDeNota.objects.filter(aluno=aluno)
-        
-        # Converte o queryset em um dicionário para acesso rápido
-        # (Chave: comp.pk, Valor: nota_valor)
-        notas_map = {nota.competencia.pk: nota.nota_valor for nota in notas_existentes_qs}
+        # Busca as notas que JÁ EXISTEM para este aluno, num dicionário para acesso rápido
+        # (Chave: comp.pk, Valor: (nota_valor, versao) — a versão vai para o autosave)
+        notas_map = {
+            competencia_id: (nota_valor, versao)
+            for competencia_id, nota_valor, versao in LancamentoDeNota.objects.filter(
+                aluno=aluno
+            ).order_by().values_list('competencia_id', 'nota_valor', 'versao')
+        }
 
         # Prepara a lista de competências com o valor da nota (se existir)
         competencias_com_notas = []
         for comp in competencias_da_turma:
+            nota_valor, versao = notas_map.get(comp.pk, ('', 0)) # '' (vazio) se a nota não foi lançada
             competencias_com_notas.append({
                 'competencia': comp,
-                'nota_valor': notas_map.get(comp.pk, '') # Retorna '' (vazio) se a nota não foi lançada
+                'nota_valor': nota_valor,
+                'versao': versao,
             })
 
         context = {
@@ -317,6 +244,178 @@ def lancamento_notas_aluno_view(request, turma_id, aluno_id):
         return render(request, 'teacher_portal/lancamento_notas_aluno.html', context)
 
 
+@login_required(login_url='teacher_portal:login')
+@require_http_methods(['GET', 'POST'])
+def lancamento_notas_grade_view(request, turma_id):
+    """
+    Grade estilo planilha com as notas da turma inteira (alunos × competências).
+
+    GET mostra a grade; POST recebe em JSON só as células alteradas
+    ({"celulas": [{"aluno": id, "competencia": id, "valor": "85"}, ...]})
+    e grava tudo de uma vez (ver core.lancamentos.LancamentoService).
+    """
+    turma = get_object_or_404(Turma, pk=turma_id, professor_responsavel__user=request.user)
+
+    if request.method == 'POST':
+        try:
+            celulas = json.loads(request.body or b'{}').get('celulas', [])
+        except (ValueError, AttributeError):
+            return JsonResponse({'sucesso': False, 'erro': 'JSON inválido'}, status=400)
+        if not isinstance(celulas, list):
+            return JsonResponse({'sucesso': False, 'erro': '"celulas" deve ser uma lista'}, status=400)
+
+        resultado = LancamentoService.salvar_grade(turma, celulas, usuario=request.user, request=request)
+        if resultado['erros']:
+            return JsonResponse({'sucesso': False, **resultado}, status=400)
+        return JsonResponse({'sucesso': True, **resultado})
+
+    # --- LÓGICA DE EXIBIÇÃO (GET) ---
+    alunos_da_turma = list(Aluno.objects.filter(turma=turma).order_by('nome_completo', 'id'))
+    competencias_da_turma = list(turma.competencias)
+
+    # Todas as notas da turma numa única query (Chave: (aluno, competência), Valor: (nota_valor, versao))
+    notas_map = {
+        (aluno_id, competencia_id): (nota_valor, versao)
+        for aluno_id, competencia_id, nota_valor, versao in LancamentoDeNota.objects.filter(
+            aluno__turma=turma,
+            competencia__in=competencias_da_turma
+        ).order_by().values_list('aluno_id', 'competencia_id', 'nota_valor', 'versao')
+    }
+
+    linhas = []
+    for aluno in alunos_da_turma:
+        celulas = []
+        for comp in competencias_da_turma:
+            nota_valor, versao = notas_map.get((aluno.pk, comp.pk), ('', 0))
+            celulas.append({'competencia': comp, 'nota_valor': nota_valor, 'versao': versao})
+        linhas.append({'aluno': aluno, 'celulas': celulas})
+
+    context = {
+        'turma': turma,
+        'competencias': competencias_da_turma,
+        'linhas': linhas,
+    }
+    return render(request, 'teacher_portal/lancamento_notas_grade.html', context)
+
+
+@login_required(login_url='teacher_portal:login')
+@require_http_methods(['POST'])
+def autosalvar_nota_view(request, turma_id):
+    """
+    Autosave de uma única célula de nota, chamado enquanto o professor digita.
+
+    Recebe JSON {"aluno": id, "competencia": id, "valor": "85", "versao": 3}
+    com a versão da nota que a página leu (0 se estava vazia). Responde 200
+    com a nova versão, 400 se a nota for inválida ou 409 se a nota foi
+    alterada por outra pessoa (com o valor e a versão atuais).
+    """
+    turma = get_object_or_404(Turma, pk=turma_id, professor_responsavel__user=request.user)
+    try:
+        dados = json.loads(request.body or b'{}')
+        celula = {campo: dados.get(campo) for campo in ('aluno', 'competencia', 'valor', 'versao')}
+    except (ValueError, AttributeError):
+        return JsonResponse({'sucesso': False, 'erro': 'JSON inválido'}, status=400)
+
+    resultado = LancamentoService.salvar_celula(
+        turma, celula['aluno'], celula['competencia'], celula['valor'], celula['versao'],
+        usuario=request.user, request=request
+    )
+    status = {'salva': 200, 'invalida': 400, 'conflito': 409}[resultado.pop('status')]
+    return JsonResponse({'sucesso': status == 200, 'conflito': status == 409, **resultado}, status=status)
+
+
+# Limites de um lote de sincronização do modo offline
+MAX_ALTERACOES_POR_LOTE = 500
+TAMANHO_MAXIMO_LOTE = 2 * 1024 * 1024  # bytes, depois de descompactado
+
+
+class LoteInvalidoError(ValueError):
+    """Corpo da sincronização ilegível ou grande demais (status HTTP em .status)"""
+
+    def __init__(self, mensagem, status=400):
+        super().__init__(mensagem)
+        self.status = status
+
+
+def _ler_lote(request):
+    """
+    JSON do corpo da requisição, descompactando gzip/deflate (Content-Encoding)
+    com limite de tamanho para não aceitar "bombas" de compressão
+    """
+    corpo = request.body
+    codificacao = request.headers.get('Content-Encoding', '').strip().lower()
+    if codificacao in ('gzip', 'deflate'):
+        # wbits 16+MAX: gzip; MAX: zlib (deflate)
+        descompactador = zlib.decompressobj(16 + zlib.MAX_WBITS if codificacao == 'gzip' else zlib.MAX_WBITS)
+        try:
+            corpo = descompactador.decompress(corpo, TAMANHO_MAXIMO_LOTE + 1)
+        except zlib.error:
+            raise LoteInvalidoError('Corpo compactado inválido')
+    elif codificacao not in ('', 'identity'):
+        raise LoteInvalidoError(f'Content-Encoding não suportado: {codificacao}', status=415)
+    if len(corpo) > TAMANHO_MAXIMO_LOTE:
+        raise LoteInvalidoError('Lote grande demais', status=413)
+    try:
+        return json.loads(corpo or b'{}')
+    except ValueError:
+        raise LoteInvalidoError('JSON inválido')
+
+
+@login_required(login_url='teacher_portal:login')
+@require_http_methods(['POST'])
+def sincronizar_notas_view(request):
+    """
+    Sincronização do modo offline: aplica um lote de alterações guardadas no
+    aparelho do professor (JSON, de preferência compactado com gzip).
+
+    Recebe {"usuario": id, "alteracoes": [{"id": "...", "turma": id, "aluno": id,
+    "competencia": id, "valor": "85", "versao": 3}, ...]} e responde com um
+    resultado por célula ('salva', 'conflito' ou 'invalida'). Reenviar o mesmo
+    lote não grava nada de novo, então o cliente pode repetir o envio depois de
+    uma queda de conexão.
+
+    Um lote guardado por outro usuário (aparelho compartilhado) é recusado
+    inteiro com 403, e o cliente o mantém na fila para o login do dono.
+    """
+    try:
+        dados = _ler_lote(request)
+        alteracoes = dados.get('alteracoes', []) if isinstance(dados, dict) else None
+        if not isinstance(alteracoes, list):
+            raise LoteInvalidoError('"alteracoes" deve ser uma lista')
+        if len(alteracoes) > MAX_ALTERACOES_POR_LOTE:
+            raise LoteInvalidoError(f'Envie no máximo {MAX_ALTERACOES_POR_LOTE} alterações por lote', status=413)
+        if 'usuario' in dados and str(dados['usuario']) != str(request.user.pk):
+            raise LoteInvalidoError('Lote de outro usuário', status=403)
+    except LoteInvalidoError as e:
+        return JsonResponse({'sucesso': False, 'erro': str(e)}, status=e.status)
+
+    resultados = LancamentoService.sincronizar(request.user, alteracoes, request=request)
+    contagem = {status: 0 for status in ('salva', 'conflito', 'invalida')}
+    for resultado in resultados:
+        contagem[resultado['status']] += 1
+    return JsonResponse({
+        'sucesso': True,
+        'resultados': resultados,
+        'salvas': contagem['salva'],
+        'conflitos': contagem['conflito'],
+        'invalidas': contagem['invalida'],
+    })
+
+
+@never_cache
+def service_worker_view(request):
+    """
+    Service worker do modo offline (servido em /portal/ para controlar todas as
+    páginas do portal): guarda as páginas de lançamento para abrir sem conexão
+    e mantém a fila de notas a sincronizar
+    """
+    context = {
+        # Páginas que ficam disponíveis offline (lançamento de notas das turmas)
+        'prefixo_paginas': request.path.rsplit('/', 1)[0] + '/turma/',
+    }
+    return render(request, 'teacher_portal/sw.js', context, content_type='application/javascript')
+
+
 class CustomLoginView(LoginView):
     """View customizada de login com variáveis de suporte."""
     template_name = 'teacher_portal/login.html'
@@ -355,7 +454,7 @@ def detalhes_turma_view(request, turma_id):
         
         # Estatísticas da turma
         total_alunos = alunos_da_turma.count()
-        competencias_da_turma = turma.competencias.all() if turma.competencias else []
+        competencias_da_turma = list(turma.competencias)
         total_competencias = len(competencias_da_turma)
         
         # Problemas relatados desta turma